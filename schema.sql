@@ -84,8 +84,25 @@ CREATE TABLE exercise
     similar_words JSON,
     source_sentence_id INTEGER NOT NULL,
     target_sentence_id INTEGER NOT NULL,
+    -- languages of the source and target sentence, copied from the sentences table to look up exercises by
+    -- translation pair without joining the sentences
+    source_language VARCHAR(255) NOT NULL,
+    target_language VARCHAR(255) NOT NULL,
     FOREIGN KEY (translation_id) REFERENCES translations(id),
     FOREIGN KEY (source_sentence_id) REFERENCES sentences(id),
     FOREIGN KEY (target_sentence_id) REFERENCES sentences(id)
 );
-CREATE INDEX idx_exercise_target_word ON exercise (target_word);
+-- covers the learnable words of a translation pair and the exercise ids of a word, in the order they are served
+CREATE INDEX idx_exercise_translation_pair_word ON exercise (source_language, target_language, target_word, id);
+
+-- Version of the exercise data, increased by every run of scripts/populate_exercise_table.py. The single row lets the
+-- API server tell cheaply whether the exercises changed.
+CREATE TABLE IF NOT EXISTS data_version
+(
+    id         INTEGER PRIMARY KEY CHECK (id = 1),
+    version    INTEGER NOT NULL,
+    updated_at TEXT    NOT NULL
+);
+
+-- Version of this schema. Upgrade existing databases with scripts/migrate_exercise_schema.py
+PRAGMA user_version = 1;
@@ -0,0 +1,195 @@
+#!/usr/bin/env python
+
+"""
+Builds the vocabulary and the lemmata of the sentences in `data-generated/sentences.tsv`.
+
+This is the scriptable counterpart of the "Create vocabulary" and "Lemmatize" steps of `generate_data.ipynb`. The
+sentences of every language are lemmatised with `nlp.pipe` in batches, optionally by several processes per language,
+with the pipeline components which do not contribute to lemmas disabled. Words and lemmata get their ids in the order
+in which they first appear in `sentences.tsv`, no matter how the work was split, so that the outputs are identical to
+those of the notebook:
+
+- `vocabulary.tsv` and `sentence-vocabulary.tsv`
+- `lemmata.tsv` and `sentence-lemma.tsv`
+
+Usage:
+    python3 build_vocabulary.py [--processes 4] [--batch-size 1000] [--skip-lemmata]
+                                [--model DE=de_dep_news_trf ...]
+"""
+
+import argparse
+import os
+import re
+import time
+from typing import Dict, Hashable, Iterable, Iterator, List, Set, Tuple
+
+import pandas as pd
+
+from ingest_tatoeba import Throughput
+
+OUTPUT_DIR = "data-generated"
+SENTENCES_FILE = "data-generated/sentences.tsv"
+
+# lightweight models, the transformer models (e.g. de_dep_news_trf) are more accurate but much slower
+LEMMA_MODELS = {
+    "DE": "de_core_news_sm",
+    "EN": "en_core_web_sm",
+    "FR": "fr_core_news_sm",
+    "UK": "uk_core_news_sm",
+}
+# components whose annotations the lemmatizers do not use
+UNUSED_COMPONENTS = ["parser", "ner", "senter"]
+
+BATCH_SIZE = 1_000
+
+r_nonalpha = re.compile(r"[^\w\-']")
+r_whitespace = re.compile(r"\s+")
+
+
+class Interner:
+    """Assigns consecutive ids to keys in the order in which they are first seen."""
+
+    def __init__(self):
+        self.ids: Dict[Hashable, int] = {}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def id(self, key: Hashable) -> int:
+        key_id = self.ids.get(key)
+        if key_id is None:
+            key_id = self.ids[key] = len(self.ids)
+        return key_id
+
+
+def read_sentences(sentences_path: str) -> pd.DataFrame:
+    """The id, language and text of the sentences, in the order of the file."""
+    return pd.read_csv(sentences_path, sep="\t", usecols=["id", "language", "text"], keep_default_na=False,
+                       dtype={"id": "int64", "language": str, "text": str})
+
+
+def split_words(text: str) -> List[str]:
+    return [r_nonalpha.sub("", x) for x in r_whitespace.split(text)]
+
+
+def write_vocabulary(sentences: pd.DataFrame, output_dir: str = OUTPUT_DIR) -> int:
+    """Writes `vocabulary.tsv` and `sentence-vocabulary.tsv`, returns the number of words."""
+    words = Interner()
+    # a set like in the notebook, whose iteration order is the order of the written links
+    links: Set[Tuple[int, int]] = set()
+    progress = Throughput("vocabulary")
+    for sentence_id, language, text in zip(sentences["id"].tolist(), sentences["language"].tolist(),
+                                           sentences["text"].tolist()):
+        for word in split_words(text):
+            links.add((sentence_id, words.id((language, word))))
+        progress.add(1)
+    progress.done()
+    print("  {} words".format(len(words)))
+
+    pd.DataFrame(links, columns=["sentence_id", "vocabulary_id"]) \
+        .to_csv(os.path.join(output_dir, "sentence-vocabulary.tsv"), sep="\t", index=False)
+    pd.DataFrame({"language": [language for language, _ in words.ids],
+                  "word": [word for _, word in words.ids],
+                  "length": [len(word) for _, word in words.ids]}, index=list(words.ids.values())) \
+        .rename_axis("id") \
+        .to_csv(os.path.join(output_dir, "vocabulary.tsv"), sep="\t", index=True)
+    return len(words)
+
+
+def load_models(languages: Iterable[str], models: Dict[str, str]) -> dict:
+    import spacy
+
+    missing = sorted(set(languages) - set(models))
+    if len(missing) > 0:
+        raise ValueError("No spaCy model configured for {}".format(", ".join(missing)))
+    nlp_models = {}
+    for language in languages:
+        nlp = spacy.load(models[language])
+        nlp.select_pipes(disable=[name for name in UNUSED_COMPONENTS if name in nlp.pipe_names])
+        nlp_models[language] = nlp
+    return nlp_models
+
+
+def lemmatize(sentences: pd.DataFrame, nlp_models: dict, batch_size: int = BATCH_SIZE,
+              processes: int = 1) -> Iterator[Tuple[int, str, List[str]]]:
+    """
+    Yields the id, language and lower case lemmas of the alphabetic tokens of every sentence, in the order of
+    `sentences`. Every language has its own `nlp.pipe` whose documents are consumed in step with the sentences.
+    """
+    docs = {}
+    for language, nlp in nlp_models.items():
+        texts = sentences["text"][sentences["language"] == language].tolist()
+        docs[language] = nlp.pipe(texts, batch_size=batch_size, n_process=processes)
+    for sentence_id, language in zip(sentences["id"].tolist(), sentences["language"].tolist()):
+        doc = next(docs[language])
+        yield sentence_id, language, [token.lemma_.lower() for token in doc if token.is_alpha]
+
+
+def write_lemmata(lemmatized: Iterable[Tuple[int, str, List[str]]], output_dir: str = OUTPUT_DIR) -> int:
+    """Writes `lemmata.tsv` and `sentence-lemma.tsv`, returns the number of lemmata."""
+    lemmata = Interner()
+    links: Set[Tuple[int, int]] = set()
+    progress = Throughput("lemmata")
+    for sentence_id, language, lemmas in lemmatized:
+        for lemma in lemmas:
+            links.add((sentence_id, lemmata.id((language, lemma))))
+        progress.add(1)
+    progress.done()
+    print("  {} lemmata".format(len(lemmata)))
+
+    pd.DataFrame(links, columns=["sentence_id", "lemma_id"]) \
+        .to_csv(os.path.join(output_dir, "sentence-lemma.tsv"), sep="\t", index=False)
+    pd.DataFrame({"language": [language for language, _ in lemmata.ids],
+                  "word": [word for _, word in lemmata.ids]}, index=list(lemmata.ids.values())) \
+        .rename_axis("id") \
+        .to_csv(os.path.join(output_dir, "lemmata.tsv"), sep="\t", index=True)
+    return len(lemmata)
+
+
+def build_lemmata(sentences: pd.DataFrame, output_dir: str = OUTPUT_DIR, models: Dict[str, str] = LEMMA_MODELS,
+                  batch_size: int = BATCH_SIZE, processes: int = 1) -> int:
+    nlp_models = load_models(sentences["language"].unique().tolist(), models)
+    return write_lemmata(lemmatize(sentences, nlp_models, batch_size, processes), output_dir)
+
+
+def parse_models(values: List[str]) -> Dict[str, str]:
+    models = dict(LEMMA_MODELS)
+    for value in values:
+        language, _, model = value.partition("=")
+        if not model:
+            raise ValueError("expected LANGUAGE=MODEL, got {}".format(value))
+        models[language.upper()] = model
+    return models
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Builds the vocabulary and lemmata of the generated sentences")
+    parser.add_argument("--sentences", default=SENTENCES_FILE)
+    parser.add_argument("--output-dir", default=OUTPUT_DIR)
+    parser.add_argument("--processes", type=int, default=1, help="spaCy processes per language")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="sentences per nlp.pipe batch")
+    parser.add_argument("--model", action="append", default=[], metavar="LANGUAGE=MODEL",
+                        help="spaCy model of a language, e.g. DE=de_dep_news_trf")
+    parser.add_argument("--skip-lemmata", action="store_true", help="only build the vocabulary")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.sentences):
+        print("cannot find", args.sentences)
+        exit(1)
+    try:
+        models = parse_models(args.model)
+    except ValueError as e:
+        parser.error(str(e))
+
+    started = time.perf_counter()
+    sentences = read_sentences(args.sentences)
+    print("Building the vocabulary of {} sentences".format(len(sentences)))
+    write_vocabulary(sentences, args.output_dir)
+    if not args.skip_lemmata:
+        print("Lemmatizing with {} process(es) per language".format(args.processes))
+        build_lemmata(sentences, args.output_dir, models, args.batch_size, args.processes)
+    print("Done in {:.1f}s".format(time.perf_counter() - started))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,288 @@
+#!/usr/bin/env python
+
+"""
+Generates the audio clips of the exercise sentences, the scriptable counterpart of `generate_sentence_audio.ipynb`.
+
+Clips are synthesised by a pool of workers whose requests are limited to `--rate` per second. Failed requests are
+retried with exponential backoff, and every clip is written to a temporary file which is moved into place once it is
+complete. `tts-manifest.json` in the output directory records the text, voice and backend of every clip, so that a
+run only synthesises the clips which are missing or whose sentence changed, and an interrupted run continues where it
+stopped. Clips which exist without an entry in the manifest, e.g. from the notebook, are kept and added to it.
+
+The text-to-speech engine is a `TtsBackend`: AWS Polly by default, or `--backend stub`, which writes placeholder
+clips without any network access.
+
+Usage:
+    python3 generate_sentence_audio.py [--input data-import/exercise-import.tsv] [--output-dir ../audio-generated]
+                                       [--workers 8] [--rate 8] [--backend polly|stub]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional
+
+import pandas as pd
+
+from ingest_tatoeba import Throughput
+
+INPUT_FILE = "data-import/exercise-import.tsv"
+AUDIO_DIR = "../audio-generated"
+MANIFEST_FILE = "tts-manifest.json"
+AUDIO_EXTENSION = ".mp3"
+
+AWS_REGION = "eu-central-1"
+AWS_POLLY_PROFILE = "taskpool-polly"
+WANTED_VOICES = {
+    "DE": "Daniel",
+    "EN": "Matthew",
+    "FR": "Lea",
+}
+# Map sentence language codes to AWS language codes
+LANGUAGE_CODES = {"DE": "de-DE", "EN": "en-US", "FR": "fr-FR", "UK": None}
+
+WORKERS = 8
+# requests per second, the default transactions per second quota of Polly
+RATE = 8.0
+RETRIES = 5
+BACKOFF_SECONDS = 0.5
+MAX_BACKOFF_SECONDS = 30.0
+# seconds between writes of the manifest while clips are generated
+MANIFEST_INTERVAL = 10.0
+
+
+class TtsBackend(ABC):
+    """A text-to-speech engine which synthesises mp3 audio."""
+
+    name = "backend"
+
+    @abstractmethod
+    def synthesize(self, text: str, voice: str, language_code: str) -> bytes:
+        pass
+
+    def is_retryable(self, error: Exception) -> bool:
+        """Whether a failed request may succeed when it is sent again."""
+        return True
+
+
+class PollyBackend(TtsBackend):
+    name = "polly"
+
+    # errors of invalid requests, which fail again when retried
+    PERMANENT_ERRORS = {"InvalidSsmlException", "TextLengthExceededException", "InvalidSampleRateException",
+                        "LanguageNotSupportedException", "EngineNotSupportedException", "ValidationException",
+                        "AccessDeniedException", "UnrecognizedClientException"}
+
+    def __init__(self, region: str = AWS_REGION, profile: Optional[str] = AWS_POLLY_PROFILE, engine: str = "neural"):
+        import boto3
+
+        self.engine = engine
+        # clients are thread safe, sessions are not
+        self.polly = boto3.Session(region_name=region, profile_name=profile).client("polly")
+
+    def synthesize(self, text: str, voice: str, language_code: str) -> bytes:
+        result = self.polly.synthesize_speech(Engine=self.engine, OutputFormat="mp3", Text=text, VoiceId=voice,
+                                              LanguageCode=language_code)
+        try:
+            return result["AudioStream"].read()
+        finally:
+            result["AudioStream"].close()
+
+    def is_retryable(self, error: Exception) -> bool:
+        code = getattr(error, "response", {}).get("Error", {}).get("Code")
+        return code not in self.PERMANENT_ERRORS
+
+
+class StubBackend(TtsBackend):
+    """Writes the request instead of audio, for tests and runs without network access."""
+
+    name = "stub"
+
+    def synthesize(self, text: str, voice: str, language_code: str) -> bytes:
+        return "{}|{}|{}".format(language_code, voice, text).encode("utf-8")
+
+
+class Clip:
+    def __init__(self, filename: str, text: str, voice: str, language_code: str):
+        self.filename = filename
+        self.text = text
+        self.voice = voice
+        self.language_code = language_code
+
+    def fingerprint(self, backend: TtsBackend) -> str:
+        """Changes whenever the clip would sound different."""
+        return hashlib.md5("\n".join([backend.name, self.voice, self.language_code, self.text])
+                           .encode("utf-8")).hexdigest()
+
+
+class RateLimiter:
+    """Spaces out acquisitions by 1 / rate seconds across all threads."""
+
+    def __init__(self, rate: float):
+        self.interval = 1 / rate if rate > 0 else 0.0
+        self.next_slot = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        with self.lock:
+            now = time.monotonic()
+            slot = max(self.next_slot, now)
+            self.next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class Manifest:
+    """The fingerprints of the generated clips, by file name."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.fingerprints: Dict[str, str] = {}
+        self.lock = threading.Lock()
+        self.last_save = time.monotonic()
+        if os.path.exists(path):
+            with open(path, "r") as f:
+                self.fingerprints = json.load(f)["clips"]
+
+    def get(self, filename: str) -> Optional[str]:
+        return self.fingerprints.get(filename)
+
+    def add(self, filename: str, fingerprint: str):
+        with self.lock:
+            self.fingerprints[filename] = fingerprint
+            if time.monotonic() - self.last_save >= MANIFEST_INTERVAL:
+                self._save()
+
+    def save(self):
+        with self.lock:
+            self._save()
+
+    def _save(self):
+        write_atomic(self.path, json.dumps({"version": 1, "clips": self.fingerprints}, indent=1,
+                                           sort_keys=True).encode("utf-8"))
+        self.last_save = time.monotonic()
+
+
+def write_atomic(path: str, data: bytes):
+    # the temporary name does not end with .mp3, so it is never mistaken for a clip
+    tmp_path = os.path.join(os.path.dirname(path), ".{}.tmp".format(os.path.basename(path)))
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def read_clips(input_path: str, voices: Dict[str, str] = WANTED_VOICES,
+               language_codes: Dict[str, Optional[str]] = LANGUAGE_CODES) -> List[Clip]:
+    """The distinct target sentence clips of the exercises, in languages with a voice."""
+    df_sentences = pd.read_csv(input_path, sep="\t",
+                               usecols=["target_language", "target_sentence_id", "target_sentence"])
+    clips = {}
+    for language, sentence_id, text in df_sentences.itertuples(index=False):
+        if language_codes.get(language) is None or language not in voices:
+            continue
+        filename = "{}-{}{}".format(language, sentence_id, AUDIO_EXTENSION)
+        clips.setdefault(filename, Clip(filename, text, voices[language], language_codes[language]))
+    return list(clips.values())
+
+
+def pending_clips(clips: Iterable[Clip], output_dir: str, manifest: Manifest, backend: TtsBackend) -> List[Clip]:
+    """The clips which have to be synthesised. Existing clips unknown to the manifest are added to it."""
+    pending = []
+    for clip in clips:
+        fingerprint = clip.fingerprint(backend)
+        exists = os.path.exists(os.path.join(output_dir, clip.filename))
+        recorded = manifest.get(clip.filename)
+        if exists and recorded is None:
+            manifest.add(clip.filename, fingerprint)
+        elif not exists or recorded != fingerprint:
+            pending.append(clip)
+    return pending
+
+
+def synthesize_with_retries(backend: TtsBackend, clip: Clip, limiter: RateLimiter, retries: int,
+                            backoff: float) -> bytes:
+    attempt = 0
+    while True:
+        limiter.acquire()
+        try:
+            return backend.synthesize(clip.text, clip.voice, clip.language_code)
+        except Exception as e:
+            attempt += 1
+            if attempt > retries or not backend.is_retryable(e):
+                raise
+            # exponential backoff with full jitter
+            time.sleep(random.uniform(0, min(MAX_BACKOFF_SECONDS, backoff * 2 ** (attempt - 1))))
+
+
+def generate_audio(clips: List[Clip], output_dir: str, backend: TtsBackend, workers: int = WORKERS,
+                   rate: float = RATE, retries: int = RETRIES, backoff: float = BACKOFF_SECONDS) -> Dict[str, int]:
+    """Synthesises the missing and changed clips, returns the number of generated, skipped and failed clips."""
+    os.makedirs(output_dir, exist_ok=True)
+    manifest = Manifest(os.path.join(output_dir, MANIFEST_FILE))
+    pending = pending_clips(clips, output_dir, manifest, backend)
+    limiter = RateLimiter(rate)
+    progress = Throughput("clips")
+    failed = []
+
+    def generate(clip: Clip):
+        try:
+            audio = synthesize_with_retries(backend, clip, limiter, retries, backoff)
+        except Exception as e:
+            print("  failed {}: {}".format(clip.filename, e))
+            failed.append(clip.filename)
+            return
+        write_atomic(os.path.join(output_dir, clip.filename), audio)
+        manifest.add(clip.filename, clip.fingerprint(backend))
+        progress.add(1)
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="tts") as executor:
+            # consumed to propagate unexpected errors of the workers
+            list(executor.map(generate, pending))
+    finally:
+        manifest.save()
+    progress.done()
+    return {"generated": len(pending) - len(failed), "skipped": len(clips) - len(pending), "failed": len(failed)}
+
+
+def create_backend(name: str, region: str, profile: Optional[str]) -> TtsBackend:
+    if name == "stub":
+        return StubBackend()
+    return PollyBackend(region, profile)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generates the audio clips of the exercise sentences")
+    parser.add_argument("--input", default=INPUT_FILE, help="exercises with the target sentences")
+    parser.add_argument("--output-dir", default=AUDIO_DIR)
+    parser.add_argument("--backend", choices=["polly", "stub"], default="polly")
+    parser.add_argument("--workers", type=int, default=WORKERS, help="concurrent requests")
+    parser.add_argument("--rate", type=float, default=RATE, help="maximum requests per second")
+    parser.add_argument("--retries", type=int, default=RETRIES, help="retries of a failed request")
+    parser.add_argument("--region", default=AWS_REGION)
+    parser.add_argument("--profile", default=AWS_POLLY_PROFILE, help="AWS profile of the Polly credentials")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.input):
+        print("cannot find", args.input)
+        exit(1)
+
+    started = time.perf_counter()
+    clips = read_clips(args.input)
+    print("Generating {} clips into {} with {}".format(len(clips), args.output_dir, args.backend))
+    counts = generate_audio(clips, args.output_dir, create_backend(args.backend, args.region, args.profile),
+                            args.workers, args.rate, args.retries)
+    print("{generated} generated, {skipped} skipped, {failed} failed".format(**counts),
+          "in {:.1f}s".format(time.perf_counter() - started))
+    if counts["failed"] > 0:
+        exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+#!/usr/bin/env python
+
+"""
+Streaming ingest of the Tatoeba dumps into `data-generated/sentences.tsv` and `data-generated/translations.tsv`.
+
+This is the scriptable counterpart of the "Generate data: Tatoeba" and "Create translation relations" steps of
+`generate_data.ipynb`. The dumps are read in chunks whose size adapts to the configured memory ceiling, sentences
+are filtered by `WANTED_LANGS` (or the sentence pair files) while streaming and the outputs are written
+incrementally. Only the ids of the kept sentences are held in memory.
+
+Usage:
+    python3 ingest_tatoeba.py [--memory-limit-mb 256] [--pairs data-tatoeba/sentences_uk_de.tsv ...]
+"""
+
+import argparse
+import csv
+import os
+import re
+import time
+from typing import Dict, Iterator, Optional, Set
+
+import numpy as np
+import pandas as pd
+
+# Maps 3-letter ISO language codes used by Tatoeba to 2-letter used by Taskbase.
+WANTED_LANGS = dict(
+    deu="DE",
+    ukr="UK",
+)
+
+SENTENCE_PAIR_FILES = [
+    "./data-tatoeba/sentences_uk_de.tsv"
+]
+
+TATOEBA_DIR = "./data-tatoeba"
+OUTPUT_DIR = "data-generated"
+
+DEFAULT_MEMORY_LIMIT_MB = 256
+# rows of the first chunk, before the size of a row is known
+INITIAL_CHUNK_ROWS = 10_000
+# lower bound of the rows of a chunk, however large its rows are
+MIN_CHUNK_ROWS = 1_000
+
+re_quote = re.compile("[\u201c\u201d\u201e\u201f]")
+r_whitespace = re.compile(r"\s+")
+
+
+class Throughput:
+    """Counts processed rows of a stage and periodically prints rows per second."""
+
+    def __init__(self, stage: str, report_every: float = 5.0):
+        self.stage = stage
+        self.report_every = report_every
+        self.rows = 0
+        self.started = time.perf_counter()
+        self.last_report = self.started
+
+    def add(self, rows: int):
+        self.rows += rows
+        now = time.perf_counter()
+        if now - self.last_report >= self.report_every:
+            self.last_report = now
+            print(f"  {self.stage}: {self.rows} rows, {self.rate():.0f} rows/s")
+
+    def rate(self) -> float:
+        elapsed = time.perf_counter() - self.started
+        return self.rows / elapsed if elapsed > 0 else 0.0
+
+    def done(self, kept: Optional[int] = None):
+        elapsed = time.perf_counter() - self.started
+        suffix = f", {kept} rows kept" if kept is not None else ""
+        print(f"  {self.stage}: {self.rows} rows in {elapsed:.1f}s ({self.rate():.0f} rows/s){suffix}")
+
+
+def read_chunks(path: str, memory_limit_mb: int, **read_csv_kwargs) -> Iterator[pd.DataFrame]:
+    """
+    Reads a TSV file in chunks. The chunk size is recomputed from the memory footprint of the previous chunk, so that
+    a single chunk stays within the given memory limit.
+    """
+    budget = memory_limit_mb * 1024 * 1024
+    rows = INITIAL_CHUNK_ROWS
+    with pd.read_csv(path, sep="\t", iterator=True, **read_csv_kwargs) as reader:
+        while True:
+            try:
+                chunk = reader.get_chunk(rows)
+            except StopIteration:
+                return
+            bytes_per_row = max(1, chunk.memory_usage(deep=True).sum() // max(1, len(chunk)))
+            # half of the budget, the other half is left for the filtered copy of the chunk
+            rows = max(MIN_CHUNK_ROWS, int(budget // 2 // bytes_per_row))
+            yield chunk
+
+
+def in_set(index: pd.Index, ids: Set[int]) -> np.ndarray:
+    # Index.isin would hash all of `ids` again for every chunk
+    return np.fromiter((i in ids for i in index), dtype=bool, count=len(index))
+
+
+def read_sentence_chunks(memory_limit_mb: int) -> Iterator[pd.DataFrame]:
+    for chunk in read_chunks(os.path.join(TATOEBA_DIR, "sentences_detailed.csv"), memory_limit_mb,
+                             usecols=range(4), names=["id", "language", "text", "author"],
+                             index_col="id", quoting=csv.QUOTE_NONE):
+        yield chunk.dropna()
+
+
+def read_pair_ids(pair_files) -> Set[int]:
+    ids = set()
+    for pair_file in pair_files:
+        with open(pair_file, "r") as f:
+            for line in f:
+                fields = line.split("\t")
+                ids.add(int(fields[0]))
+                ids.add(int(fields[2]))
+    return ids
+
+
+def collect_sentence_ids(wanted_langs: Dict[str, str], pair_files, memory_limit_mb: int) -> Set[int]:
+    """First pass: determines the ids of all sentences which will be kept."""
+    progress = Throughput("sentences_detailed.csv (ids)")
+    if len(pair_files) > 0:
+        # Sentence pair files and the master list are updated at different times. Only pairs whose sentences are
+        # both present in the master list are kept.
+        print("Filtering sentences by wanted pairs...")
+        pair_ids = read_pair_ids(pair_files)
+        present = set()
+        for chunk in read_sentence_chunks(memory_limit_mb):
+            progress.add(len(chunk))
+            present.update(chunk.index[in_set(chunk.index, pair_ids)])
+        del pair_ids
+
+        ids_to_keep = set()
+        for pair_file in pair_files:
+            with open(pair_file, "r") as f:
+                for line in f:
+                    fields = line.split("\t")
+                    id1, id2 = int(fields[0]), int(fields[2])
+                    if id1 in present and id2 in present:
+                        ids_to_keep.update([id1, id2])
+    else:
+        print("Filtering sentences by language...")
+        ids_to_keep = set()
+        for chunk in read_sentence_chunks(memory_limit_mb):
+            progress.add(len(chunk))
+            ids_to_keep.update(chunk.index[chunk.language.isin(wanted_langs.keys())])
+    progress.done(len(ids_to_keep))
+    return ids_to_keep
+
+
+def collect_translated_from(sentence_ids: Set[int], memory_limit_mb: int) -> Dict[int, int]:
+    """
+    Second pass: the "translated_from" field of the kept sentences.
+    -1 means the base sentences was marked as null in the source dataset.
+    """
+    progress = Throughput("sentences_base.csv")
+    translated_from = {}
+    for chunk in read_chunks(os.path.join(TATOEBA_DIR, "sentences_base.csv"), memory_limit_mb,
+                             names=["id", "translated_from"], index_col="id", dtype={"translated_from": "object"}):
+        progress.add(len(chunk))
+        chunk = chunk[in_set(chunk.index, sentence_ids)]
+        translated_from.update(chunk.translated_from.replace("\\N", -1).astype("int64").items())
+    progress.done(len(translated_from))
+    return translated_from
+
+
+def build_tatoeba_sentences(wanted_langs: Dict[str, str], pair_files, memory_limit_mb: int) -> Set[int]:
+    print("Tatoeba: building sentences...")
+    sentence_ids = collect_sentence_ids(wanted_langs, pair_files, memory_limit_mb)
+    translated_from = collect_translated_from(sentence_ids, memory_limit_mb)
+
+    # Third pass: clean up and write out the kept sentences.
+    progress = Throughput("sentences.tsv")
+    written = 0
+    with open(os.path.join(OUTPUT_DIR, "sentences.tsv"), "w", newline="") as f:
+        for chunk in read_sentence_chunks(memory_limit_mb):
+            progress.add(len(chunk))
+            chunk = chunk[in_set(chunk.index, sentence_ids)].copy()
+            if len(chunk) == 0:
+                continue
+            chunk.text = chunk.text.map(lambda text: re_quote.sub("\"", text))
+            chunk.language = chunk.language.map(wanted_langs)
+            # -2 means the base sentence was missing in the source dataset.
+            chunk["translated_from"] = chunk.index.map(lambda i: translated_from.get(i, -2)).astype("int64")
+            chunk["word_count"] = chunk.text.map(lambda text: len(r_whitespace.split(text)))
+            chunk.to_csv(f, sep="\t", header=written == 0)
+            written += len(chunk)
+    progress.done(written)
+    return sentence_ids
+
+
+def build_translations(sentence_ids: Set[int], dedup=True):
+    print("Tatoeba: building translations...")
+    progress = Throughput("links.csv")
+    written = 0
+    with open(os.path.join(TATOEBA_DIR, "links.csv"), "r") as links, \
+            open(os.path.join(OUTPUT_DIR, "translations.tsv"), "w", newline="") as out:
+        out.write("s1\ts2\n")
+        for line in links:
+            s1, s2 = [int(x.strip()) for x in line.strip().split("\t")]
+            progress.add(1)
+            if s1 in sentence_ids and s2 in sentence_ids and (not dedup or s1 < s2):
+                out.write(f"{s1}\t{s2}\n")
+                written += 1
+    progress.done(written)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Streams the Tatoeba dumps into sentences.tsv and translations.tsv")
+    parser.add_argument("--memory-limit-mb", type=int, default=DEFAULT_MEMORY_LIMIT_MB,
+                        help="upper bound for the size of a single chunk read from the dumps")
+    parser.add_argument("--pairs", nargs="*", default=SENTENCE_PAIR_FILES,
+                        help="sentence pair files to whitelist sentences by. Pass no file to keep all sentences "
+                             "of WANTED_LANGS")
+    args = parser.parse_args()
+
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    sentence_ids = build_tatoeba_sentences(WANTED_LANGS, args.pairs, args.memory_limit_mb)
+    build_translations(sentence_ids)
+    print("Done")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+
+"""
+Upgrades the exercise table of an existing taskpool database in place to the definition in `schema.sql`.
+
+Version 1 stores the languages of the source and target sentence on every exercise and indexes them together with
+the target word, so that the API server looks up exercises and learnable words of a translation pair with the index
+only. The table is rebuilt, which also restores the primary key, foreign keys and indexes of tables that were
+created by an older `populate_exercise_table.py` through pandas.
+
+Usage:
+    python3 migrate_exercise_schema.py [path/to/taskpool.db]
+"""
+
+import os
+import re
+import sqlite3
+import sys
+import time
+from typing import List
+
+DB_FILE = "../taskpool.db"
+SCHEMA_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "schema.sql")
+
+SCHEMA_VERSION = 1
+
+
+def table_statements(table: str, schema_file: str = SCHEMA_FILE) -> List[str]:
+    """The statements of schema.sql which create a table and its indexes."""
+    with open(schema_file, "r") as f:
+        # drop comments before splitting, they may contain semicolons
+        schema = re.sub(r"[ \t]*--[^\n]*\n?", "", f.read())
+    statements = [statement.strip() for statement in schema.split(";")]
+    return [statement for statement in statements
+            if re.match(r"CREATE TABLE (IF NOT EXISTS )?{}\b".format(table), statement)
+            or re.search(r"\bON {}\b".format(table), statement)]
+
+
+def exercise_statements(schema_file: str = SCHEMA_FILE) -> List[str]:
+    """The statements of schema.sql which create the exercise table and its indexes."""
+    return table_statements("exercise", schema_file)
+
+
+def get_schema_version(conn: sqlite3.Connection) -> int:
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn: sqlite3.Connection, schema_file: str = SCHEMA_FILE):
+    """Rebuilds the exercise table with the languages of its sentences. The caller commits."""
+    conn.execute("ALTER TABLE exercise RENAME TO exercise_old")
+    # indexes move with the renamed table, drop them to free their names
+    for (index,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'exercise_old' "
+                                 "AND sql IS NOT NULL").fetchall():
+        conn.execute("DROP INDEX {}".format(index))
+
+    create_table, *create_indexes = exercise_statements(schema_file)
+    conn.execute(create_table)
+    conn.execute("""
+    INSERT INTO exercise (id, translation_id, target_word, similar_words, source_sentence_id, target_sentence_id,
+                          source_language, target_language)
+    SELECT e.id, e.translation_id, e.target_word, e.similar_words, e.source_sentence_id, e.target_sentence_id,
+           s1.language, s2.language
+    FROM exercise_old as e
+    JOIN sentences s1 ON s1.id = e.source_sentence_id
+    JOIN sentences s2 on s2.id = e.target_sentence_id
+    """)
+    conn.execute("DROP TABLE exercise_old")
+    for create_index in create_indexes:
+        conn.execute(create_index)
+    conn.execute("PRAGMA user_version = {:d}".format(SCHEMA_VERSION))
+
+
+def main():
+    db_file = sys.argv[1] if len(sys.argv) >= 2 else DB_FILE
+    if not os.path.exists(db_file):
+        print("cannot find", db_file)
+        exit(1)
+
+    conn = sqlite3.connect(db_file, isolation_level=None)
+    version = get_schema_version(conn)
+    if version >= SCHEMA_VERSION:
+        print("{} is already at schema version {}".format(db_file, version))
+        return
+
+    print("Migrating {} from schema version {} to {}...".format(db_file, version, SCHEMA_VERSION))
+    started = time.perf_counter()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        migrate(conn)
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("ANALYZE")
+    conn.execute("VACUUM")
+    conn.close()
+    print("Done in {:.1f}s".format(time.perf_counter() - started))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+
+"""
+Packs the sentence audio clips of `audio-generated/` into a single bundle file with an offset index.
+
+The bundle is the concatenation of all clips, followed by its index: a JSON document which maps every clip name to its
+offset, size and MD5 hash, the length of the document as 8 byte little endian integer and the magic bytes `TPAUDIO2`.
+Keeping the index in the same file means that replacing the file switches clips and offsets at once. Serving the
+bundle (`TASKPOOL_AUDIO_BUNDLE=path/to/audio.bundle`) replaces thousands of small files by one
+memory-mapped file, while the URLs of the clips stay the same.
+
+Usage:
+    python3 pack_audio.py [--audio-dir ../audio-generated] [--output ../audio.bundle]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import struct
+import time
+from typing import Dict, List, Tuple
+
+AUDIO_DIR = "../audio-generated"
+BUNDLE_FILE = "../audio.bundle"
+
+AUDIO_EXTENSION = ".mp3"
+BUNDLE_FORMAT_VERSION = 2
+BUNDLE_MAGIC = b"TPAUDIO2"
+
+
+def list_clips(audio_dir: str) -> List[str]:
+    # sorted, so that packing the same clips twice gives the same bundle
+    return sorted(entry.name for entry in os.scandir(audio_dir)
+                  if entry.is_file() and entry.name.endswith(AUDIO_EXTENSION))
+
+
+def pack(audio_dir: str, bundle_file: str) -> Dict[str, Tuple[int, int, str]]:
+    """
+    Writes the bundle and returns its index entries. The bundle is written next to its destination and then moved
+    into place, a server which opens it at any time reads either the previous or the new clips with their own index.
+    """
+    clips = {}
+    offset = 0
+    with open(bundle_file + ".tmp", "wb") as bundle:
+        for name in list_clips(audio_dir):
+            with open(os.path.join(audio_dir, name), "rb") as f:
+                content = f.read()
+            bundle.write(content)
+            clips[name] = (offset, len(content), hashlib.md5(content).hexdigest())
+            offset += len(content)
+        index = json.dumps({"version": BUNDLE_FORMAT_VERSION, "size": offset, "clips": clips}).encode("utf-8")
+        bundle.write(index)
+        bundle.write(struct.pack("<Q", len(index)) + BUNDLE_MAGIC)
+
+    os.replace(bundle_file + ".tmp", bundle_file)
+    return clips
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Packs audio clips into a bundle served by the API server")
+    parser.add_argument("--audio-dir", default=AUDIO_DIR, help="directory of the audio clips")
+    parser.add_argument("--output", default=BUNDLE_FILE, help="path of the bundle")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.audio_dir):
+        print("cannot find", args.audio_dir)
+        exit(1)
+
+    started = time.perf_counter()
+    clips = pack(args.audio_dir, args.output)
+    size = sum(size for _, size, _ in clips.values())
+    print("Packed {} clips ({:.1f} MiB) into {} in {:.1f}s".format(
+        len(clips), size / 1024 / 1024, args.output, time.perf_counter() - started))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,605 @@
+#!/usr/bin/env python
+
+"""
+Runs the exercise generation pipeline of the notebooks as a DAG of cached stages.
+
+Every stage declares the files it reads, the files or directories it writes and the configuration parameters it
+depends on. Stages which read the outputs of another stage depend on it. Before a stage runs, its key is computed
+from its name, version, parameters and the content hashes of its inputs. The outputs of every run are stored in
+`pipeline-cache/<stage>/<key>/`, so a stage whose key was seen before is skipped, and its cached outputs are restored
+if the files on disk differ. Changing a parameter therefore only reruns the stages which depend on it and the ones
+downstream of them whose inputs changed.
+
+Content hashes are remembered by path, size and modification time in `pipeline-cache/hashes.json`, so that large
+inputs like the Tatoeba dumps are only hashed again after they changed.
+
+Usage:
+    python3 pipeline.py [populate] [--set IN_MIN_WORDS=5] [--config pipeline.json] [--dry-run]
+    python3 pipeline.py audio_bundle
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Union
+
+import pandas as pd
+
+CACHE_DIR = "pipeline-cache"
+# bump when the hashing of stages changes
+CACHE_VERSION = 1
+
+DEFAULT_CONFIG = {
+    # generate_data.ipynb
+    "WANTED_LANGS": {"deu": "DE", "ukr": "UK"},
+    "SENTENCE_PAIR_FILES": ["./data-tatoeba/sentences_uk_de.tsv"],
+    "MEMORY_LIMIT_MB": 256,
+    "LEMMA_MODELS": {"DE": "de_core_news_sm", "EN": "en_core_web_sm", "FR": "fr_core_news_sm",
+                     "UK": "uk_core_news_sm"},
+    "LEMMA_PROCESSES": 1,
+    # generate_exercise_precursors.ipynb
+    "IN_SOURCE_LANG": "UK",
+    "IN_TARGET_LANG": "DE",
+    "IN_WORDS": "data-import/in-words.tsv",
+    "IN_NUM_TRANSLATIONS": 5,
+    "IN_MIN_WORDS": 4,
+    "IN_MAX_WORDS": 9,
+    "DEFAULT_N_WORDS": 10,
+    "DEFAULT_MIN_WORDS_SIZE": 4,
+    "SEED": 0,
+    # similar_words.ipynb
+    "SIMILAR_WORDS_MODEL": "de_core_news_lg",
+    "SIMILAR_WORDS_LENGTH_DIFFERENCE": 10,
+    "SIMILAR_WORDS_MIN_SIMILARITY": 0.0,
+    "SIMILAR_WORDS_STOP_AFTER": 5,
+    "SIMILAR_WORDS_INDEX": "brute",
+    # populate_exercise_table.py, reviewed files replace the generated ones if set
+    "EXERCISE_IMPORT": None,
+    "SIMILAR_WORDS_IMPORT": None,
+    "DB_FILE": "../taskpool.db",
+    # import the other exercises if some precursors have unknown sentences or duplicate ids, instead of failing
+    "SKIP_INVALID_EXERCISES": False,
+    # generate_sentence_audio.ipynb and pack_audio.py
+    "AUDIO_BACKEND": "polly",
+    "AUDIO_WORKERS": 8,
+    "AUDIO_RATE": 8.0,
+    "AWS_REGION": "eu-central-1",
+    "AWS_POLLY_PROFILE": "taskpool-polly",
+    "AUDIO_VOICES": {"DE": "Daniel", "EN": "Matthew", "FR": "Lea"},
+    "AUDIO_LANGUAGE_CODES": {"DE": "de-DE", "EN": "en-US", "FR": "fr-FR"},
+    "AUDIO_DIR": "../audio-generated",
+    "AUDIO_BUNDLE": "../audio.bundle",
+}
+
+Paths = Union[Sequence[str], Callable[[dict], Sequence[str]]]
+
+
+class Stage:
+    """
+    A step of the pipeline. `inputs` and `outputs` are paths or functions of the configuration returning paths,
+    `params` are the configuration keys which change the outputs of `run(config)`. Stages which are not `cached` run
+    every time, for outputs which are too large to copy into the cache and which the stage updates incrementally
+    itself.
+    """
+
+    def __init__(self, name: str, run: Callable[[dict], None], inputs: Paths, outputs: Paths,
+                 params: Sequence[str] = (), version: int = 1, cached: bool = True):
+        self.name = name
+        self.run = run
+        self._inputs = inputs
+        self._outputs = outputs
+        self.params = list(params)
+        self.version = version
+        self.cached = cached
+
+    def inputs(self, config: dict) -> List[str]:
+        return list(self._inputs(config) if callable(self._inputs) else self._inputs)
+
+    def outputs(self, config: dict) -> List[str]:
+        return list(self._outputs(config) if callable(self._outputs) else self._outputs)
+
+
+class StageResult:
+    def __init__(self, stage: str, status: str, seconds: float, run_seconds: Optional[float] = None):
+        self.stage = stage
+        # "ran", "cached", "restored" or "would run"
+        self.status = status
+        self.seconds = seconds
+        # how long the run which created the cached outputs took
+        self.run_seconds = run_seconds if run_seconds is not None else seconds
+
+
+class HashCache:
+    """Content hashes of files, computed again only if the size or modification time of a file changed."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.entries: Dict[str, list] = {}
+        if os.path.exists(path):
+            with open(path, "r") as f:
+                self.entries = json.load(f)
+
+    def file_hash(self, path: str) -> str:
+        stat = os.stat(path)
+        key = os.path.abspath(path)
+        entry = self.entries.get(key)
+        if entry is not None and entry[0] == stat.st_size and entry[1] == stat.st_mtime_ns:
+            return entry[2]
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        self.entries[key] = [stat.st_size, stat.st_mtime_ns, digest.hexdigest()]
+        return digest.hexdigest()
+
+    def hash(self, path: str) -> str:
+        """The hash of a file or of the relative paths and hashes of all files in a directory."""
+        if not os.path.isdir(path):
+            return self.file_hash(path)
+        digest = hashlib.sha256()
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for name in sorted(files):
+                file_path = os.path.join(root, name)
+                digest.update("{}\t{}\n".format(os.path.relpath(file_path, path),
+                                                self.file_hash(file_path)).encode("utf-8"))
+        return "dir:" + digest.hexdigest()
+
+    def save(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.entries, f)
+        os.replace(tmp_path, self.path)
+
+
+def copy_path(source: str, target: str):
+    """Replaces the file or directory `target` by a copy of `source`, files are replaced atomically."""
+    parent = os.path.dirname(os.path.abspath(target))
+    os.makedirs(parent, exist_ok=True)
+    if os.path.isdir(source):
+        if os.path.isdir(target):
+            shutil.rmtree(target)
+        elif os.path.exists(target):
+            os.remove(target)
+        shutil.copytree(source, target)
+        return
+    tmp_path = os.path.join(parent, ".{}.tmp".format(os.path.basename(target)))
+    shutil.copyfile(source, tmp_path)
+    if os.path.isdir(target):
+        shutil.rmtree(target)
+    os.replace(tmp_path, target)
+
+
+class Pipeline:
+    def __init__(self, stages: Sequence[Stage], config: dict, cache_dir: str = CACHE_DIR):
+        self.stages = {stage.name: stage for stage in stages}
+        self.config = config
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+        self.hashes = HashCache(os.path.join(cache_dir, "hashes.json"))
+
+        self.producers: Dict[str, str] = {}
+        for stage in stages:
+            for output in stage.outputs(config):
+                self.producers[os.path.abspath(output)] = stage.name
+        self.dependencies = {stage.name: self._dependencies(stage) for stage in stages}
+
+    def _dependencies(self, stage: Stage) -> List[str]:
+        dependencies = []
+        for path in stage.inputs(self.config):
+            producer = self.producers.get(os.path.abspath(path))
+            if producer is not None and producer != stage.name and producer not in dependencies:
+                dependencies.append(producer)
+        return dependencies
+
+    def plan(self, targets: Sequence[str]) -> List[str]:
+        """The targets and all stages they depend on, every stage after its dependencies."""
+        order: List[str] = []
+        visiting = set()
+
+        def visit(name: str):
+            if name in order:
+                return
+            if name not in self.stages:
+                raise ValueError("Unknown stage {}".format(name))
+            if name in visiting:
+                raise ValueError("Stage {} depends on itself".format(name))
+            visiting.add(name)
+            for dependency in self.dependencies[name]:
+                visit(dependency)
+            visiting.discard(name)
+            order.append(name)
+
+        for target in targets:
+            visit(target)
+        return order
+
+    def key(self, stage: Stage) -> str:
+        inputs = {}
+        for path in stage.inputs(self.config):
+            if not os.path.exists(path):
+                raise FileNotFoundError("Input {} of stage {} does not exist".format(path, stage.name))
+            inputs[path] = self.hashes.hash(path)
+        description = {
+            "cache": CACHE_VERSION,
+            "stage": stage.name,
+            "version": stage.version,
+            "params": {param: self.config[param] for param in stage.params},
+            "inputs": inputs,
+            "outputs": stage.outputs(self.config),
+        }
+        return hashlib.sha256(json.dumps(description, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def entry_dir(self, stage: Stage, key: str) -> str:
+        return os.path.join(self.cache_dir, stage.name, key[:32])
+
+    def restore(self, stage: Stage, entry: str) -> bool:
+        """Restores the outputs which differ from the cached ones, returns whether any was restored."""
+        with open(os.path.join(entry, "manifest.json"), "r") as f:
+            manifest = json.load(f)
+        restored = False
+        for i, (output, output_hash) in enumerate(zip(stage.outputs(self.config), manifest["hashes"])):
+            if os.path.exists(output) and self.hashes.hash(output) == output_hash:
+                continue
+            copy_path(os.path.join(entry, "outputs", str(i)), output)
+            restored = True
+        return restored
+
+    def store(self, stage: Stage, entry: str, seconds: float):
+        outputs = stage.outputs(self.config)
+        missing = [output for output in outputs if not os.path.exists(output)]
+        if len(missing) > 0:
+            raise RuntimeError("Stage {} did not write {}".format(stage.name, ", ".join(missing)))
+        tmp_entry = entry + ".tmp"
+        if os.path.exists(tmp_entry):
+            shutil.rmtree(tmp_entry)
+        for i, output in enumerate(outputs):
+            copy_path(output, os.path.join(tmp_entry, "outputs", str(i)))
+        with open(os.path.join(tmp_entry, "manifest.json"), "w") as f:
+            json.dump({"stage": stage.name, "outputs": outputs, "seconds": seconds,
+                       "hashes": [self.hashes.hash(output) for output in outputs]}, f, indent=2)
+        if os.path.exists(entry):
+            shutil.rmtree(entry)
+        os.replace(tmp_entry, entry)
+
+    def run(self, targets: Sequence[str], force: Sequence[str] = (), dry_run: bool = False) -> List[StageResult]:
+        results = []
+        pending = set()
+        for name in self.plan(targets):
+            stage = self.stages[name]
+            started = time.perf_counter()
+            if dry_run and any(dependency in pending for dependency in self.dependencies[name]):
+                pending.add(name)
+                results.append(StageResult(name, "would run", 0.0))
+                continue
+            if not stage.cached:
+                # its outputs only change if its inputs did, the stages after it are planned by their keys
+                if dry_run:
+                    results.append(StageResult(name, "would run", 0.0))
+                    continue
+                print("Running {}...".format(name))
+                stage.run(self.config)
+                results.append(StageResult(name, "ran", time.perf_counter() - started))
+                continue
+            entry = self.entry_dir(stage, self.key(stage))
+            if name not in force and os.path.exists(os.path.join(entry, "manifest.json")):
+                if dry_run:
+                    results.append(StageResult(name, "cached", 0.0))
+                    continue
+                status = "restored" if self.restore(stage, entry) else "cached"
+                with open(os.path.join(entry, "manifest.json"), "r") as f:
+                    run_seconds = json.load(f)["seconds"]
+                results.append(StageResult(name, status, time.perf_counter() - started, run_seconds))
+            elif dry_run:
+                pending.add(name)
+                results.append(StageResult(name, "would run", 0.0))
+                continue
+            else:
+                print("Running {}...".format(name))
+                stage.run(self.config)
+                seconds = time.perf_counter() - started
+                self.store(stage, entry, seconds)
+                results.append(StageResult(name, "ran", seconds))
+            self.hashes.save()
+        return results
+
+
+def format_results(results: Sequence[StageResult]) -> str:
+    lines = ["{:<20} {:<10} {:>10} {:>10}".format("stage", "status", "seconds", "run")]
+    for result in results:
+        lines.append("{:<20} {:<10} {:>10.1f} {:>10.1f}".format(result.stage, result.status, result.seconds,
+                                                               result.run_seconds))
+    lines.append("{:<20} {:<10} {:>10.1f}".format("total", "", sum(result.seconds for result in results)))
+    return "\n".join(lines)
+
+
+# Stages of the notebooks
+
+GENERATED_DIR = "data-generated"
+TATOEBA_DIR = "data-tatoeba"
+SCHEMA_FILE = "../schema.sql"
+BASE_DB_FILE = "data-generated/taskpool-base.db"
+SENTENCES = "data-generated/sentences.tsv"
+TRANSLATIONS = "data-generated/translations.tsv"
+VOCABULARY = "data-generated/vocabulary.tsv"
+SENTENCE_VOCABULARY = "data-generated/sentence-vocabulary.tsv"
+LEMMATA = "data-generated/lemmata.tsv"
+SENTENCE_LEMMA = "data-generated/sentence-lemma.tsv"
+PRECURSORS = "data-generated/exercise-precursors.tsv"
+SIMILAR_WORDS = "data-generated/similar-words.tsv"
+
+# tables of import_sql.ipynb, with the column used as their index
+SQL_IMPORTS = [
+    ("sentences", SENTENCES, "id"),
+    ("translations", TRANSLATIONS, None),
+    ("vocabulary", VOCABULARY, "id"),
+    ("sentence_vocabulary", SENTENCE_VOCABULARY, None),
+    ("lemmata", LEMMATA, "id"),
+    ("sentence_lemma", SENTENCE_LEMMA, None),
+]
+
+TRANSLATIONS_QUERY = """
+SELECT
+    word,
+    t.id as translation_id,
+    source.id as sourceId,
+    source.text as sourceText,
+    source.language as sourceLanguage,
+    target.id as targetId,
+    target.text as targetText,
+    target.word_count as twc,
+    target.language as targetLanguage FROM vocabulary v
+                                               JOIN sentence_vocabulary sv on v.id = sv.vocabulary_id
+                                               JOIN sentences target on sv.sentence_id = target.id
+                                               JOIN translations t on target.id = t.s1 or target.id = t.s2
+                                               JOIN sentences source on source.id = t.s1 or source.id = t.s2
+WHERE v.language = :target_lang and word = :word and :min_words <= twc and twc <= :max_words
+"""
+
+
+def replace_database(path: str, build: Callable[[str], None]):
+    """Builds a database next to `path` and moves it into place, so that readers never see a partial one."""
+    tmp_path = os.path.join(os.path.dirname(os.path.abspath(path)), ".{}.tmp".format(os.path.basename(path)))
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    build(tmp_path)
+    os.replace(tmp_path, path)
+
+
+def run_tatoeba(config: dict):
+    import ingest_tatoeba
+
+    os.makedirs(GENERATED_DIR, exist_ok=True)
+    sentence_ids = ingest_tatoeba.build_tatoeba_sentences(config["WANTED_LANGS"], config["SENTENCE_PAIR_FILES"],
+                                                          config["MEMORY_LIMIT_MB"])
+    ingest_tatoeba.build_translations(sentence_ids)
+
+
+def run_vocabulary(config: dict):
+    import build_vocabulary
+
+    build_vocabulary.write_vocabulary(build_vocabulary.read_sentences(SENTENCES), GENERATED_DIR)
+
+
+def run_lemmata(config: dict):
+    import build_vocabulary
+
+    build_vocabulary.build_lemmata(build_vocabulary.read_sentences(SENTENCES), GENERATED_DIR,
+                                   config["LEMMA_MODELS"], processes=config["LEMMA_PROCESSES"])
+
+
+def run_import_sql(config: dict):
+    def build(path: str):
+        conn = sqlite3.connect(path)
+        with open(SCHEMA_FILE, "r") as f:
+            conn.executescript(f.read())
+        for table, tsv, index in SQL_IMPORTS:
+            print("Importing {}...".format(table))
+            pd.read_csv(tsv, sep="\t", index_col=index) \
+                .to_sql(table, conn, index=index is not None, if_exists="append")
+        conn.commit()
+        conn.close()
+
+    replace_database(BASE_DB_FILE, build)
+
+
+def read_words(path: str) -> List[str]:
+    return pd.read_csv(path, sep="\t").word.tolist()
+
+
+def words_by_frequency(config: dict) -> List[str]:
+    """Samples of the most common words of the target language, if no words were given."""
+    import random
+    import re
+
+    r_nonword = re.compile(r"""[.,?!:;()"]""")
+    r_whitespace = re.compile(r"[/\s]+")
+    word_counts = {}
+    df_sentences = pd.read_csv(SENTENCES, sep="\t", index_col="id")
+    for sentence in df_sentences[df_sentences.language == config["IN_TARGET_LANG"]].text:
+        for word in (r_nonword.sub("", w.lower()) for w in r_whitespace.split(sentence)):
+            if len(word) >= config["DEFAULT_MIN_WORDS_SIZE"]:
+                word_counts[word] = word_counts.get(word, 0) + 1
+    most_common_words = [word for word, _ in sorted(word_counts.items(), key=lambda x: x[1], reverse=True)]
+    most_common_words = most_common_words[0:config["DEFAULT_N_WORDS"] * 10]
+    return random.Random(config["SEED"]).sample(most_common_words, min(config["DEFAULT_N_WORDS"],
+                                                                       len(most_common_words)))
+
+
+def run_precursors(config: dict):
+    words = read_words(config["IN_WORDS"])
+    if len(words) == 0:
+        words = words_by_frequency(config)
+
+    all_results = []
+    with sqlite3.connect(BASE_DB_FILE) as conn:
+        for word in words:
+            results = conn.execute(TRANSLATIONS_QUERY, {"target_lang": config["IN_TARGET_LANG"], "word": word,
+                                                        "min_words": config["IN_MIN_WORDS"],
+                                                        "max_words": config["IN_MAX_WORDS"]})
+            added = 0
+            for x in results:
+                if x[4] != config["IN_SOURCE_LANG"]:
+                    continue
+                added += 1
+                all_results.append({
+                    "translation_id": x[1],
+                    "word": word,
+                    "source_sentence_id": x[2],
+                    "source_sentence": x[3],
+                    "target_language": config["IN_TARGET_LANG"],
+                    "target_sentence_id": x[5],
+                    "target_sentence": x[6],
+                    "difficulty": 0,
+                })
+                if added >= config["IN_NUM_TRANSLATIONS"]:
+                    break
+    print("  {} precursors of {} words".format(len(all_results), len(words)))
+    pd.DataFrame(all_results).to_csv(PRECURSORS, sep="\t", index=False)
+
+
+def run_similar_words(config: dict):
+    import similar_words
+
+    language = config["IN_TARGET_LANG"]
+    model = config["SIMILAR_WORDS_MODEL"]
+    vocabulary = similar_words.load_or_export_vectors(
+        os.path.join(GENERATED_DIR, "vectors-{}.npz".format(language.lower())), model,
+        similar_words.load_vocabulary(VOCABULARY, language))
+    targets = [str(word) for word in read_words(config["IN_WORDS"])]
+    words = similar_words.lookup_words(vocabulary, targets, lambda: similar_words.load_spacy(model))
+    if config["SIMILAR_WORDS_INDEX"] == "hnsw":
+        index = similar_words.HnswIndex(vocabulary.vectors)
+    else:
+        index = similar_words.BruteForceIndex(vocabulary.vectors)
+    results = similar_words.find_similar_words(vocabulary, words, index,
+                                               config["SIMILAR_WORDS_LENGTH_DIFFERENCE"],
+                                               config["SIMILAR_WORDS_MIN_SIMILARITY"],
+                                               config["SIMILAR_WORDS_STOP_AFTER"])
+    similar_words.write_similar_words(results, targets, SIMILAR_WORDS)
+
+
+def exercise_file(config: dict) -> str:
+    return config["EXERCISE_IMPORT"] or PRECURSORS
+
+
+def similar_words_file(config: dict) -> str:
+    return config["SIMILAR_WORDS_IMPORT"] or SIMILAR_WORDS
+
+
+def run_populate(config: dict):
+    from populate_exercise_table import bump_data_version, populate
+
+    def build(path: str):
+        shutil.copyfile(BASE_DB_FILE, path)
+        conn = sqlite3.connect(path, isolation_level=None)
+        conn.execute("BEGIN IMMEDIATE")
+        populate(conn, exercise_file(config), similar_words_file(config), config["SKIP_INVALID_EXERCISES"])
+        bump_data_version(conn)
+        conn.execute("COMMIT")
+        conn.execute("ANALYZE")
+        conn.close()
+
+    # a running server can swap to the new file, see TASKPOOL_DB_WATCH_INTERVAL
+    replace_database(config["DB_FILE"], build)
+
+
+def run_audio(config: dict):
+    from generate_sentence_audio import create_backend, generate_audio, read_clips
+
+    clips = read_clips(exercise_file(config), config["AUDIO_VOICES"], config["AUDIO_LANGUAGE_CODES"])
+    backend = create_backend(config["AUDIO_BACKEND"], config["AWS_REGION"], config["AWS_POLLY_PROFILE"])
+    # clips which already exist in AUDIO_DIR are kept, only missing and changed ones are synthesised
+    counts = generate_audio(clips, config["AUDIO_DIR"], backend, config["AUDIO_WORKERS"], config["AUDIO_RATE"])
+    if counts["failed"] > 0:
+        raise RuntimeError("{} clips could not be generated".format(counts["failed"]))
+
+
+def run_audio_bundle(config: dict):
+    from pack_audio import pack
+
+    pack(config["AUDIO_DIR"], config["AUDIO_BUNDLE"])
+
+
+STAGES = [
+    Stage("tatoeba", run_tatoeba,
+          inputs=lambda config: [os.path.join(TATOEBA_DIR, name) for name in
+                                 ["sentences_detailed.csv", "sentences_base.csv", "links.csv"]]
+          + config["SENTENCE_PAIR_FILES"],
+          outputs=[SENTENCES, TRANSLATIONS],
+          params=["WANTED_LANGS", "SENTENCE_PAIR_FILES"]),
+    Stage("vocabulary", run_vocabulary,
+          inputs=[SENTENCES], outputs=[VOCABULARY, SENTENCE_VOCABULARY]),
+    Stage("lemmata", run_lemmata,
+          inputs=[SENTENCES], outputs=[LEMMATA, SENTENCE_LEMMA], params=["LEMMA_MODELS"]),
+    Stage("import_sql", run_import_sql,
+          inputs=[SCHEMA_FILE] + [tsv for _, tsv, _ in SQL_IMPORTS], outputs=[BASE_DB_FILE]),
+    Stage("precursors", run_precursors,
+          inputs=lambda config: [BASE_DB_FILE, SENTENCES, config["IN_WORDS"]], outputs=[PRECURSORS],
+          params=["IN_SOURCE_LANG", "IN_TARGET_LANG", "IN_NUM_TRANSLATIONS", "IN_MIN_WORDS", "IN_MAX_WORDS",
+                  "DEFAULT_N_WORDS", "DEFAULT_MIN_WORDS_SIZE", "SEED"]),
+    Stage("similar_words", run_similar_words,
+          inputs=lambda config: [VOCABULARY, config["IN_WORDS"]], outputs=[SIMILAR_WORDS],
+          params=["IN_TARGET_LANG", "SIMILAR_WORDS_MODEL", "SIMILAR_WORDS_LENGTH_DIFFERENCE",
+                  "SIMILAR_WORDS_MIN_SIMILARITY", "SIMILAR_WORDS_STOP_AFTER", "SIMILAR_WORDS_INDEX"]),
+    Stage("populate", run_populate,
+          inputs=lambda config: [BASE_DB_FILE, exercise_file(config), similar_words_file(config)],
+          outputs=lambda config: [config["DB_FILE"]], params=["SKIP_INVALID_EXERCISES"]),
+    # not cached: the clips would be copied into every cache entry, generate_sentence_audio.py keeps its own manifest
+    # and only synthesises missing and changed clips
+    Stage("audio", run_audio,
+          inputs=lambda config: [exercise_file(config)], outputs=lambda config: [config["AUDIO_DIR"]],
+          params=["AUDIO_VOICES", "AUDIO_LANGUAGE_CODES", "AUDIO_BACKEND"], cached=False),
+    Stage("audio_bundle", run_audio_bundle,
+          inputs=lambda config: [config["AUDIO_DIR"]], outputs=lambda config: [config["AUDIO_BUNDLE"]], version=2),
+]
+
+DEFAULT_TARGETS = ["populate"]
+
+
+def load_config(config_path: Optional[str], overrides: Sequence[str]) -> dict:
+    config = dict(DEFAULT_CONFIG)
+    if config_path is not None:
+        with open(config_path, "r") as f:
+            config.update(json.load(f))
+    for override in overrides:
+        name, _, value = override.partition("=")
+        if name not in DEFAULT_CONFIG:
+            raise ValueError("Unknown parameter {}".format(name))
+        try:
+            config[name] = json.loads(value)
+        except json.JSONDecodeError:
+            # plain strings do not need JSON quotes
+            config[name] = value
+    return config
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Runs the exercise generation pipeline with cached stages")
+    parser.add_argument("targets", nargs="*", default=DEFAULT_TARGETS,
+                        help="stages to bring up to date, with all stages they depend on: {}".format(
+                            ", ".join(stage.name for stage in STAGES)))
+    parser.add_argument("--config", help="JSON file with parameters overriding the defaults")
+    parser.add_argument("--set", action="append", default=[], metavar="NAME=VALUE",
+                        help="overrides a parameter, the value is parsed as JSON if possible")
+    parser.add_argument("--force", nargs="*", default=[], metavar="STAGE", help="stages to run even if cached")
+    parser.add_argument("--dry-run", action="store_true", help="only show which stages would run")
+    parser.add_argument("--cache-dir", default=CACHE_DIR)
+    args = parser.parse_args()
+
+    try:
+        config = load_config(args.config, args.set)
+        pipeline = Pipeline(STAGES, config, args.cache_dir)
+        results = pipeline.run(args.targets, args.force, args.dry_run)
+    except (ValueError, FileNotFoundError) as e:
+        print(e)
+        exit(1)
+    print(format_results(results))
+
+
+if __name__ == "__main__":
+    main()
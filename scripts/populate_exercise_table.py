@@ -1,33 +1,128 @@
 #!/usr/bin/env python
 
-import os
-import sys
+"""
+Imports the exercise precursors and their similar words into the exercise table of `taskpool.db`.
+
+The precursors are streamed in chunks, ids and similar word lists are computed per chunk with pandas and the rows are
+bulk inserted into the exercise table defined in `schema.sql`, which keeps its primary key, foreign keys and indexes.
+The whole import runs in a single transaction, so the previous exercises stay in place if it fails.
+
+With `--incremental`, the precursors are compared with the existing exercises by id instead: new and changed
+exercises are upserted and removed ones deleted, so that the database only changes as much as the exercises did.
+Every import which changes the exercises increases the version in the data_version table.
+
+Exercise ids are the md5 of their sentence pair. The import fails if precursors refer to sentences which do not exist
+or share an id, which happens when a sentence pair was generated for several words. With `--skip-invalid`, only the
+first precursor of an id is imported and every skipped precursor is logged with its word and id.
+
+Usage:
+    python3 populate_exercise_table.py [--incremental] [--skip-invalid] [data-import/exercise-import.tsv]
+                                       [data-import/similar-words-import.tsv]
+"""
+
+import argparse
 import hashlib
-import pandas as pd
-import numpy as np
-import sqlite3
 import json
+import os
+import sqlite3
+import time
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Tuple
+
+import pandas as pd
+
+from ingest_tatoeba import Throughput
+from migrate_exercise_schema import SCHEMA_VERSION, exercise_statements, get_schema_version, table_statements
 
 DB_FILE = "../taskpool.db"
+EXERCISE_FILE = "data-import/exercise-import.tsv"
+SIMILAR_WORDS_FILE = "data-import/similar-words-import.tsv"
+
+CHUNK_ROWS = 50_000
+
+EXERCISE_COLUMNS = ["id", "translation_id", "target_word", "similar_words", "source_sentence_id",
+                    "target_sentence_id"]
+TABLE_COLUMNS = EXERCISE_COLUMNS + ["source_language", "target_language"]
+
+# precursors are staged as they are, so that those which cannot be imported can be reported before anything changes
+STAGE_PRECURSOR = """
+INSERT INTO temp.exercise_precursor (id, translation_id, target_word, similar_words, source_sentence_id,
+                                     target_sentence_id)
+VALUES (:id, :translation_id, :target_word, :similar_words, :source_sentence_id, :target_sentence_id)
+"""
+
+# ids are the md5 of the sentence pair, so a pair generated for several words gives every word after the first the
+# same id. Only the first precursor of an id is imported
+INVALID_PRECURSORS = """
+SELECT p.target_word, p.id, 'unknown sentence'
+FROM temp.exercise_precursor p
+WHERE NOT EXISTS (SELECT 1 FROM sentences s WHERE s.id = p.source_sentence_id)
+   OR NOT EXISTS (SELECT 1 FROM sentences s WHERE s.id = p.target_sentence_id)
+UNION ALL
+SELECT p.target_word, p.id, 'duplicate id'
+FROM temp.exercise_precursor p
+WHERE p.rowid NOT IN (SELECT MIN(rowid) FROM temp.exercise_precursor GROUP BY id)
+"""
+
+# the languages are taken from the sentences
+INSERT_EXERCISES = """
+INSERT OR IGNORE INTO {} (id, translation_id, target_word, similar_words, source_sentence_id, target_sentence_id,
+                          source_language, target_language)
+SELECT p.id, p.translation_id, p.target_word, p.similar_words, p.source_sentence_id, p.target_sentence_id,
+       s1.language, s2.language
+FROM temp.exercise_precursor p
+JOIN sentences s1 ON s1.id = p.source_sentence_id
+JOIN sentences s2 ON s2.id = p.target_sentence_id
+ORDER BY p.rowid
+"""
+
+# reasons are listed for at most this many precursors in the error of a failed import
+MAX_REPORTED_PRECURSORS = 20
+
+
+class InvalidPrecursors(ValueError):
+    """Precursors which would be left out of the import: their sentences do not exist or their id is taken."""
 
+    def __init__(self, rows: List[Tuple[str, str, str]]):
+        self.rows = rows
+        lines = ["{} {}: {}".format(word, exercise_id, reason)
+                 for word, exercise_id, reason in rows[:MAX_REPORTED_PRECURSORS]]
+        if len(rows) > MAX_REPORTED_PRECURSORS:
+            lines.append("... and {} more".format(len(rows) - MAX_REPORTED_PRECURSORS))
+        super().__init__("{} exercise precursors cannot be imported, pass --skip-invalid to import the others:\n"
+                         "  {}".format(len(rows), "\n  ".join(lines)))
 
-def load_similar_words_data(similar_words_path: str):
-    df = pd.read_csv(similar_words_path, sep='\t')
 
-    def remove_nans(similar_words):
-        return list(filter(lambda x: isinstance(x, str), similar_words))
+# staged exercises of an incremental import which are new or differ from the stored exercise with the same id
+CHANGED_EXERCISES = """
+FROM temp.exercise_import i
+LEFT JOIN exercise e ON e.id = i.id
+WHERE e.id IS NULL OR {}
+""".format(" OR ".join("e.{0} IS NOT i.{0}".format(column) for column in TABLE_COLUMNS[1:]))
 
-    result = []
-    for i in range(len(df.index)):
-        row = df.iloc[i]
-        filtered = remove_nans(row.to_list()[1:])
-        result.append([row["word"], json.dumps(filtered)])
 
-    return pd.DataFrame(result, columns=["word", "similar_words"])
+def load_similar_words_data(similar_words_path: str) -> Dict[str, str]:
+    """Maps every word to the JSON list of its similar words."""
+    df = pd.read_csv(similar_words_path, sep="\t", dtype="string").dropna(subset=["word"])
+    df = df.drop_duplicates(subset="word").set_index("word")
+    # one row per similar word, without the empty cells of words with fewer similar words
+    similar_words = df.stack().dropna().groupby(level=0, sort=False).agg(list)
+    similar_words = similar_words.reindex(df.index).map(lambda words: words if isinstance(words, list) else [])
+    return dict(zip(similar_words.index, similar_words.map(json.dumps)))
 
 
-def load_exercise_data(exercise_path: str) -> pd.DataFrame:
-    df = pd.read_csv(exercise_path,
+def generate_ids(df: pd.DataFrame) -> pd.Series:
+    keys = df["source_sentence_id"].astype("string") + "_" + df["target_sentence_id"].astype("string")
+    return pd.Series([hashlib.md5(key.encode("utf-8")).hexdigest() for key in keys], index=df.index, dtype="string")
+
+
+def load_exercise_data(exercise_path: str, similar_words: Dict[str, str],
+                       chunk_rows: int = CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+    """
+    Yields the exercises of the precursor file in chunks, with the columns of the exercise table. Precursors of words
+    without an entry in the similar words file are left out.
+    """
+    with pd.read_csv(exercise_path,
                      usecols=[
                          "word",
                          "translation_id",
@@ -35,20 +130,122 @@ def load_exercise_data(exercise_path: str) -> pd.DataFrame:
                          "source_sentence_id"
                      ],
                      dtype={
-                         "word": 'string',
-                         "translation_id": np.int64,
-                         "target_sentence_id": np.int64,
-                         "source_sentence_id": np.int64
-                     }, sep='\t', skiprows=0)
+                         "word": "string",
+                         "translation_id": "int64",
+                         "target_sentence_id": "int64",
+                         "source_sentence_id": "int64"
+                     }, sep="\t", chunksize=chunk_rows) as reader:
+        for chunk in reader:
+            chunk = chunk.dropna(subset=["word"]).rename(columns={"word": "target_word"})
+            chunk["similar_words"] = chunk["target_word"].map(similar_words)
+            chunk = chunk.dropna(subset=["similar_words"])
+            chunk["id"] = generate_ids(chunk)
+            yield chunk[EXERCISE_COLUMNS]
+
+
+def to_records(chunk: pd.DataFrame) -> Iterator[dict]:
+    # plain Python values, sqlite3 cannot bind numpy integers
+    columns = [chunk[column].tolist() for column in EXERCISE_COLUMNS]
+    return (dict(zip(EXERCISE_COLUMNS, row)) for row in zip(*columns))
+
+
+def prepare_exercise_table(conn: sqlite3.Connection):
+    """
+    Empties the exercise table and drops its secondary indexes, which are cheaper to build once after the import
+    than to update with every row. Tables of an older schema are replaced by the current definition.
+    """
+    exists = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'exercise'").fetchone()
+    if exists is None or get_schema_version(conn) < SCHEMA_VERSION:
+        conn.execute("DROP TABLE IF EXISTS exercise")
+        conn.execute(exercise_statements()[0])
+        conn.execute("PRAGMA user_version = {:d}".format(SCHEMA_VERSION))
+        return
+    conn.execute("DELETE FROM exercise")
+    for (index,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'exercise' "
+                                 "AND sql IS NOT NULL").fetchall():
+        conn.execute("DROP INDEX {}".format(index))
+
+
+def create_exercise_indexes(conn: sqlite3.Connection):
+    for create_index in exercise_statements()[1:]:
+        conn.execute(create_index)
+
+
+def stage_precursors(conn: sqlite3.Connection, exercise_path: str, similar_words_path: str,
+                     skip_invalid: bool) -> Throughput:
+    """
+    Reads the precursors into temp.exercise_precursor. Raises InvalidPrecursors if some cannot be imported, unless
+    `skip_invalid` is set, in which case every skipped precursor is logged.
+    """
+    similar_words = load_similar_words_data(similar_words_path)
+    conn.execute("CREATE TEMP TABLE exercise_precursor ({})".format(", ".join(EXERCISE_COLUMNS)))
+    progress = Throughput("exercises")
+    for chunk in load_exercise_data(exercise_path, similar_words):
+        conn.executemany(STAGE_PRECURSOR, to_records(chunk))
+        progress.add(len(chunk))
+    conn.execute("CREATE INDEX temp.idx_exercise_precursor_id ON exercise_precursor (id)")
+
+    invalid = conn.execute(INVALID_PRECURSORS).fetchall()
+    if len(invalid) > 0 and not skip_invalid:
+        conn.execute("DROP TABLE temp.exercise_precursor")
+        raise InvalidPrecursors(invalid)
+    for word, exercise_id, reason in invalid:
+        print("  skipped {} {}: {}".format(word, exercise_id, reason))
+    return progress
 
-    def generate_id(row):
-        return hashlib.md5("{}_{}".format(row["source_sentence_id"], row["target_sentence_id"]).encode("utf-8")) \
-            .hexdigest()
 
-    # add id
-    df['id'] = pd.Series([generate_id(df.iloc[i]) for i in range(len(df.index))], dtype='string')
+def populate(conn: sqlite3.Connection, exercise_path: str, similar_words_path: str,
+             skip_invalid: bool = False) -> int:
+    """Replaces all exercises, returns the number of imported exercises. The caller manages the transaction."""
+    progress = stage_precursors(conn, exercise_path, similar_words_path, skip_invalid)
+    prepare_exercise_table(conn)
+    conn.execute(INSERT_EXERCISES.format("exercise"))
+    conn.execute("DROP TABLE temp.exercise_precursor")
 
-    return df
+    create_exercise_indexes(conn)
+    imported = conn.execute("SELECT COUNT(*) FROM exercise").fetchone()[0]
+    progress.done(imported)
+    if imported < progress.rows:
+        print("  skipped {} exercises with unknown sentences or duplicate ids".format(progress.rows - imported))
+    return imported
+
+
+def populate_incremental(conn: sqlite3.Connection, exercise_path: str, similar_words_path: str,
+                         skip_invalid: bool = False) -> Tuple[int, int, int]:
+    """
+    Applies the difference between the precursors and the stored exercises, returns the number of inserted, updated
+    and deleted exercises. The caller manages the transaction.
+    """
+    exists = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'exercise'").fetchone()
+    if exists is None or get_schema_version(conn) < SCHEMA_VERSION:
+        raise ValueError("The exercise table is missing or outdated, run a full import first")
+    progress = stage_precursors(conn, exercise_path, similar_words_path, skip_invalid)
+
+    # the precursors are staged with the columns of the exercise table, including their languages
+    conn.execute("CREATE TEMP TABLE exercise_import AS SELECT * FROM exercise WHERE 0")
+    conn.execute("CREATE UNIQUE INDEX temp.idx_exercise_import_id ON exercise_import (id)")
+    conn.execute(INSERT_EXERCISES.format("temp.exercise_import"))
+    conn.execute("DROP TABLE temp.exercise_precursor")
+    progress.done(conn.execute("SELECT COUNT(*) FROM temp.exercise_import").fetchone()[0])
+
+    deleted = conn.execute("DELETE FROM exercise WHERE id NOT IN (SELECT id FROM temp.exercise_import)").rowcount
+    inserted, changed = conn.execute("SELECT COUNT(*) - COUNT(e.id), COUNT(*) " + CHANGED_EXERCISES).fetchone()
+    columns = ", ".join(TABLE_COLUMNS)
+    conn.execute("INSERT INTO exercise ({}) SELECT {} {} ON CONFLICT (id) DO UPDATE SET {}".format(
+        columns, ", ".join("i." + column for column in TABLE_COLUMNS), CHANGED_EXERCISES,
+        ", ".join("{0} = excluded.{0}".format(column) for column in TABLE_COLUMNS[1:])))
+    conn.execute("DROP TABLE temp.exercise_import")
+    return inserted, changed - inserted, deleted
+
+
+def bump_data_version(conn: sqlite3.Connection) -> int:
+    for statement in table_statements("data_version"):
+        conn.execute(statement)
+    conn.execute("""
+    INSERT INTO data_version (id, version, updated_at) VALUES (1, 1, :now)
+    ON CONFLICT (id) DO UPDATE SET version = version + 1, updated_at = :now
+    """, {"now": datetime.now(timezone.utc).isoformat(timespec="seconds")})
+    return conn.execute("SELECT version FROM data_version").fetchone()[0]
 
 
 def find_or_exit(path):
@@ -58,36 +255,49 @@ def find_or_exit(path):
 
 
 def main():
-    print("Preparing data...")
-    # default path
-    exercise_path = "data-import/exercise-import.tsv"
-    similar_words_path = "data-import/similar-words-import.tsv"
-
-    if len(sys.argv) >= 2:
-        exercise_path = sys.argv[1]
-
-    if len(sys.argv) >= 3:
-        similar_words_path = sys.argv[2]
-
-    find_or_exit(exercise_path)
-    find_or_exit(similar_words_path)
-
-    print("Reading exercise data from ", exercise_path)
-    print("Reading similar words data from", similar_words_path)
+    parser = argparse.ArgumentParser(description="Imports exercise precursors into the exercise table")
+    parser.add_argument("exercise_path", nargs="?", default=EXERCISE_FILE)
+    parser.add_argument("similar_words_path", nargs="?", default=SIMILAR_WORDS_FILE)
+    parser.add_argument("--db", default=DB_FILE, help="database to import into")
+    parser.add_argument("--incremental", action="store_true",
+                        help="only apply the difference to the exercises in the database")
+    parser.add_argument("--skip-invalid", action="store_true",
+                        help="import the other exercises if some precursors have unknown sentences or duplicate ids, "
+                             "and log the skipped ones")
+    args = parser.parse_args()
 
-    df1 = load_similar_words_data(similar_words_path)
-    df2 = load_exercise_data(exercise_path)
+    find_or_exit(args.exercise_path)
+    find_or_exit(args.similar_words_path)
+    find_or_exit(args.db)
 
-    print("Merging tables together")
-    df = pd.merge(df1, df2, on="word").dropna(subset=["word"])
-    df = df.rename(columns={
-        "word": "target_word"
-    })
+    print("Reading exercise data from", args.exercise_path)
+    print("Reading similar words data from", args.similar_words_path)
 
-    with sqlite3.connect(DB_FILE) as conn:
-        print("Uploading {0} values to exercise table...".format(df.shape[0]))
-        df.to_sql("exercise", conn, if_exists="replace", index=False)
-        print('Done')
+    started = time.perf_counter()
+    conn = sqlite3.connect(args.db, isolation_level=None)
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        if args.incremental:
+            inserted, updated, deleted = populate_incremental(conn, args.exercise_path, args.similar_words_path,
+                                                                   args.skip_invalid)
+            print("  {} inserted, {} updated, {} deleted".format(inserted, updated, deleted))
+            changed = inserted + updated + deleted > 0
+        else:
+            populate(conn, args.exercise_path, args.similar_words_path, args.skip_invalid)
+            changed = True
+        # an unchanged data version keeps the caches of running servers valid
+        version = bump_data_version(conn) if changed else None
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    if version is not None:
+        print("Data version is now", version)
+    if not args.incremental:
+        print("Analyzing...")
+        conn.execute("ANALYZE")
+    conn.close()
+    print("Done in {:.1f}s".format(time.perf_counter() - started))
 
 
 if __name__ == "__main__":
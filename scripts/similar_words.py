@@ -0,0 +1,332 @@
+#!/usr/bin/env python
+
+"""
+Finds similar words for the target words, the scriptable counterpart of `similar_words.ipynb`.
+
+Instead of comparing every target word with every vocabulary word through spaCy, the vectors and attributes of the
+vocabulary are exported once into a NumPy matrix which is cached on disk. The similar words of a batch of target words
+are then found with a single matrix product of unit vectors, which yields their cosine similarities. The filters of the
+notebook (length difference, capitalisation, part of speech, tag, lemma, words containing each other) are applied to
+the candidates and the most similar remaining ones are kept. Ranking the candidates replaces the notebook's retries with
+a threshold lowered in steps of 0.05, `--min-similarity` is the lowest similarity which is still accepted.
+
+With `--index hnsw`, candidates are looked up in an approximate nearest neighbour index (requires `hnswlib`), which
+is faster for large vocabularies but may miss some of the exact results.
+
+The output has the format of `similar-words.tsv`, which `populate_exercise_table.py` imports.
+
+Usage:
+    python3 similar_words.py [--words data-import/in-words.tsv] [--output data-generated/similar-words.tsv]
+"""
+
+import argparse
+import csv
+import hashlib
+import os
+import time
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from ingest_tatoeba import Throughput
+
+try:
+    import hnswlib
+except ImportError:  # pragma: no cover
+    hnswlib = None
+
+MODEL = "de_core_news_lg"
+LANGUAGE = "DE"
+VOCABULARY_FILE = "data-generated/vocabulary.tsv"
+WORDS_FILE = "data-import/in-words.tsv"
+VECTORS_FILE = "data-generated/vectors-de.npz"
+OUTPUT_FILE = "data-generated/similar-words.tsv"
+
+MIN_WORD_LENGTH = 3
+LENGTH_DIFFERENCE = 10
+MIN_SIMILARITY = 0.0
+STOP_AFTER = 5
+BATCH_SIZE = 256
+# candidates looked up in the approximate index per word, before the filters are applied
+ANN_CANDIDATES = 200
+
+NO_CODE = -1
+
+
+def case_of(word: str) -> int:
+    """1 for a capitalised word, -1 for a lower case word and 0 for words starting with neither."""
+    return 1 if word[0].isupper() else -1 if word[0].islower() else 0
+
+
+class VectorTable:
+    """
+    Unit length vectors of words together with the attributes compared by the filters. Strings are encoded as
+    integer codes, so that the filters compare whole arrays at once. Tables built with the codes of another table
+    (the target words with the codes of the vocabulary) can be compared with it.
+    """
+
+    def __init__(self, words: Sequence[str], vectors: np.ndarray, pos: Sequence[str], tags: Sequence[str],
+                 lemmas: Sequence[str], codes: Optional[Dict[str, int]] = None):
+        self.words = list(words)
+        self.pos_names = list(pos)
+        self.tag_names = list(tags)
+        self.lemma_names = list(lemmas)
+        norms = np.linalg.norm(vectors, axis=1) if len(vectors) > 0 else np.zeros(0)
+        self.has_vector = norms > 0
+        self.vectors = (vectors / np.where(self.has_vector, norms, 1)[:, None]).astype(np.float32)
+        self.lengths = np.array([len(word) for word in self.words], dtype=np.int32)
+        self.cases = np.array([case_of(word) for word in self.words], dtype=np.int8)
+
+        # a new code for every string of the vocabulary, strings unknown to the vocabulary get NO_CODE
+        extend = codes is None
+        self.codes = {} if codes is None else codes
+
+        def encode(values: Iterable[str]) -> np.ndarray:
+            if extend:
+                return np.array([self.codes.setdefault(value, len(self.codes)) for value in values], dtype=np.int32)
+            return np.array([self.codes.get(value, NO_CODE) for value in values], dtype=np.int32)
+
+        self.lowered = encode(word.lower() for word in self.words)
+        self.pos = encode(self.pos_names)
+        self.tags = encode(self.tag_names)
+        self.lemmas = encode(self.lemma_names)
+
+    def __len__(self):
+        return len(self.words)
+
+    def subset(self, rows: Sequence[int], codes: Dict[str, int]) -> "VectorTable":
+        return VectorTable([self.words[row] for row in rows], self.vectors[list(rows)],
+                           [self.pos_names[row] for row in rows], [self.tag_names[row] for row in rows],
+                           [self.lemma_names[row] for row in rows], codes)
+
+    def concat(self, other: "VectorTable") -> "VectorTable":
+        return VectorTable(self.words + other.words, np.concatenate([self.vectors, other.vectors]),
+                           self.pos_names + other.pos_names, self.tag_names + other.tag_names,
+                           self.lemma_names + other.lemma_names, self.codes)
+
+    def save(self, path: str, model: str, digest: str):
+        tmp_path = path + ".tmp.npz"
+        np.savez(tmp_path, words=np.array(self.words, dtype=str), vectors=self.vectors,
+                 pos=np.array(self.pos_names, dtype=str), tags=np.array(self.tag_names, dtype=str),
+                 lemmas=np.array(self.lemma_names, dtype=str), model=np.array(model),
+                 digest=np.array(digest))
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def load(path: str, codes: Optional[Dict[str, int]] = None) -> Tuple["VectorTable", str, str]:
+        """Returns the table and the model and vocabulary digest it was exported with."""
+        with np.load(path) as data:
+            table = VectorTable(data["words"].tolist(), data["vectors"], data["pos"].tolist(), data["tags"].tolist(),
+                                data["lemmas"].tolist(), codes)
+            return table, str(data["model"]), str(data["digest"])
+
+
+def vocabulary_digest(words: Sequence[str]) -> str:
+    return hashlib.md5("\n".join(words).encode("utf-8")).hexdigest()
+
+
+def load_vocabulary(vocabulary_path: str, language: str) -> List[str]:
+    """The distinct words of a language in the vocabulary, in their order of appearance."""
+    df = pd.read_csv(vocabulary_path, sep="\t", usecols=["word", "language"], dtype="string")
+    words = df[df["language"] == language]["word"].dropna().astype(str)
+    return list(dict.fromkeys(word for word in words if len(word) >= MIN_WORD_LENGTH))
+
+
+def export_vectors(nlp, words: Sequence[str], codes: Optional[Dict[str, int]] = None,
+                   batch_size: int = 1_000) -> VectorTable:
+    """Runs the spaCy pipeline `nlp` over the words and collects their vectors and first token attributes."""
+    kept, vectors, pos, tags, lemmas = [], [], [], [], []
+    progress = Throughput("vectors")
+    for word, doc in zip(words, nlp.pipe(words, batch_size=batch_size)):
+        progress.add(1)
+        if len(doc) == 0:
+            continue
+        kept.append(word)
+        vectors.append(doc.vector)
+        pos.append(doc[0].pos_)
+        tags.append(doc[0].tag_)
+        lemmas.append(doc[0].lemma_)
+    progress.done(len(kept))
+    width = nlp.vocab.vectors_length
+    return VectorTable(kept, np.array(vectors, dtype=np.float32).reshape(len(kept), width), pos, tags, lemmas, codes)
+
+
+def load_spacy(model: str):
+    import spacy
+    return spacy.load(model)
+
+
+def load_or_export_vectors(vectors_path: str, model: str, words: Sequence[str]) -> VectorTable:
+    """The cached vectors of the vocabulary, which are exported again if the model or the vocabulary changed."""
+    if os.path.exists(vectors_path):
+        table, cached_model, digest = VectorTable.load(vectors_path)
+        if cached_model == model and digest == vocabulary_digest(words):
+            return table
+        print("Vocabulary or model changed, exporting the vectors again")
+    print("Exporting vectors of {} words with {}".format(len(words), model))
+    table = export_vectors(load_spacy(model), words)
+    table.save(vectors_path, model, vocabulary_digest(words))
+    return table
+
+
+def lookup_words(vocabulary: VectorTable, words: Sequence[str], nlp_loader) -> VectorTable:
+    """
+    The distinct target words with the codes of the vocabulary. Words of the vocabulary are taken from it, the
+    pipeline returned by `nlp_loader()` is only loaded for the others.
+    """
+    rows = {word: row for row, word in enumerate(vocabulary.words)}
+    distinct = list(dict.fromkeys(words))
+    known = vocabulary.subset([rows[word] for word in distinct if word in rows], vocabulary.codes)
+    missing = [word for word in distinct if word not in rows]
+    if len(missing) == 0:
+        return known
+    return known.concat(export_vectors(nlp_loader(), missing, vocabulary.codes))
+
+
+class BruteForceIndex:
+    """Exact cosine similarities of the queries with every vector."""
+
+    def __init__(self, vectors: np.ndarray):
+        self.vectors = vectors
+
+    def search(self, queries: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Returns the candidate rows, which are all rows, and their similarities with every query."""
+        return np.arange(len(self.vectors))[None, :], queries @ self.vectors.T
+
+
+class HnswIndex:
+    """Approximate nearest neighbours of the queries in an HNSW graph."""
+
+    def __init__(self, vectors: np.ndarray, candidates: int = ANN_CANDIDATES, ef_construction: int = 200, m: int = 16):
+        if hnswlib is None:
+            raise RuntimeError("The hnsw index requires hnswlib, install it with pip install hnswlib")
+        self.candidates = min(candidates, len(vectors))
+        self.index = hnswlib.Index(space="cosine", dim=vectors.shape[1])
+        self.index.init_index(max_elements=len(vectors), ef_construction=ef_construction, M=m)
+        self.index.add_items(vectors, np.arange(len(vectors)))
+        self.index.set_ef(max(self.candidates, 50))
+
+    def search(self, queries: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        rows, distances = self.index.knn_query(queries, k=self.candidates)
+        return rows.astype(np.int64), 1 - distances
+
+
+def candidate_mask(vocabulary: VectorTable, words: VectorTable, batch: slice, rows: np.ndarray,
+                   length_difference: int) -> np.ndarray:
+    """
+    The filters of the notebook for the candidate `rows` (one row per word or one shared row) of the words in
+    `batch`, except for words containing each other, which needs the strings.
+    """
+    def word(values: np.ndarray) -> np.ndarray:
+        return values[batch][:, None]
+
+    case = vocabulary.cases[rows]
+    return (vocabulary.has_vector[rows]
+            & (np.abs(vocabulary.lengths[rows] - word(words.lengths)) <= length_difference)
+            & ((word(words.cases) == 0) | (case == word(words.cases)))
+            & (vocabulary.pos[rows] == word(words.pos))
+            & (vocabulary.tags[rows] == word(words.tags))
+            & (vocabulary.lemmas[rows] != word(words.lemmas))
+            & (vocabulary.lowered[rows] != word(words.lowered)))
+
+
+def select(word: str, candidates: Sequence[str], stop_after: int) -> List[str]:
+    """The first `stop_after` candidates which neither contain the word nor are contained in it."""
+    lowered = word.lower()
+    selected = []
+    for candidate in candidates:
+        candidate_lowered = candidate.lower()
+        if lowered in candidate_lowered or candidate_lowered in lowered:
+            continue
+        selected.append(candidate)
+        if len(selected) == stop_after:
+            break
+    return selected
+
+
+def find_similar_words(vocabulary: VectorTable, words: VectorTable, index=None,
+                       length_difference: int = LENGTH_DIFFERENCE, min_similarity: float = MIN_SIMILARITY,
+                       stop_after: int = STOP_AFTER, batch_size: int = BATCH_SIZE) -> Dict[str, List[str]]:
+    """Maps every word to its most similar vocabulary words, most similar first."""
+    if len(vocabulary) == 0:
+        return {word: [] for word in words.words}
+    index = index if index is not None else BruteForceIndex(vocabulary.vectors)
+    results = {}
+    progress = Throughput("words")
+    for start in range(0, len(words), batch_size):
+        batch = slice(start, min(start + batch_size, len(words)))
+        rows, similarities = index.search(words.vectors[batch])
+        mask = candidate_mask(vocabulary, words, batch, rows, length_difference) & (similarities >= min_similarity)
+        similarities = np.where(mask, similarities, -np.inf)
+        similarities[~words.has_vector[batch]] = -np.inf
+
+        # a few more than needed, some of them may still contain the word
+        k = min(similarities.shape[1], max(1, stop_after * 4))
+        top = np.argpartition(-similarities, k - 1, axis=1)[:, :k]
+        for i, word in enumerate(words.words[batch]):
+            row_rows = rows[0] if rows.shape[0] == 1 else rows[i]
+            order = top[i][np.argsort(-similarities[i, top[i]], kind="stable")]
+            order = order[np.isfinite(similarities[i, order])]
+            selected = select(word, [vocabulary.words[row_rows[j]] for j in order], stop_after)
+            if len(selected) < stop_after and np.isfinite(similarities[i]).sum() > len(order):
+                order = np.argsort(-similarities[i], kind="stable")
+                order = order[np.isfinite(similarities[i, order])]
+                selected = select(word, [vocabulary.words[row_rows[j]] for j in order], stop_after)
+            results[word] = selected
+        progress.add(batch.stop - batch.start)
+    progress.done()
+    return results
+
+
+def write_similar_words(results: Dict[str, List[str]], words: Sequence[str], output_path: str):
+    """Writes one row per word with its similar words in the columns similar_0, similar_1, ..."""
+    columns = max((len(similar) for similar in results.values()), default=0)
+    with open(output_path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f, delimiter="\t", lineterminator="\n")
+        writer.writerow(["word"] + ["similar_{}".format(i) for i in range(columns)])
+        for word in words:
+            similar = results.get(word, [])
+            writer.writerow([word] + similar + [""] * (columns - len(similar)))
+
+
+def find_or_exit(path):
+    if not os.path.exists(path):
+        print("cannot find", path)
+        exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Finds similar words of the target words with word vectors")
+    parser.add_argument("--words", default=WORDS_FILE, help="TSV file with the target words in a word column")
+    parser.add_argument("--vocabulary", default=VOCABULARY_FILE, help="TSV file with the candidate words")
+    parser.add_argument("--language", default=LANGUAGE)
+    parser.add_argument("--model", default=MODEL, help="spaCy model with word vectors")
+    parser.add_argument("--vectors", default=VECTORS_FILE, help="cache of the exported vocabulary vectors")
+    parser.add_argument("--output", default=OUTPUT_FILE)
+    parser.add_argument("--index", choices=["brute", "hnsw"], default="brute")
+    parser.add_argument("--length-difference", type=int, default=LENGTH_DIFFERENCE)
+    parser.add_argument("--min-similarity", type=float, default=MIN_SIMILARITY)
+    parser.add_argument("--stop-after", type=int, default=STOP_AFTER, help="similar words per word")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="words compared per matrix product")
+    args = parser.parse_args()
+
+    find_or_exit(args.words)
+    find_or_exit(args.vocabulary)
+
+    started = time.perf_counter()
+    vocabulary = load_or_export_vectors(args.vectors, args.model,
+                                        load_vocabulary(args.vocabulary, args.language))
+    targets = pd.read_csv(args.words, sep="\t", usecols=["word"], dtype="string")["word"].dropna().astype(str).tolist()
+    words = lookup_words(vocabulary, targets, lambda: load_spacy(args.model))
+    index = HnswIndex(vocabulary.vectors) if args.index == "hnsw" else BruteForceIndex(vocabulary.vectors)
+
+    print("Finding similar words of {} words among {} words".format(len(words), len(vocabulary)))
+    results = find_similar_words(vocabulary, words, index, args.length_difference, args.min_similarity,
+                                 args.stop_after, args.batch_size)
+    write_similar_words(results, targets, args.output)
+    print("Written to {} in {:.1f}s".format(args.output, time.perf_counter() - started))
+
+
+if __name__ == "__main__":
+    main()
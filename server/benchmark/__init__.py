@@ -0,0 +1,9 @@
+"""
+Load and regression benchmarks of the API server on synthetic databases.
+
+Usage, from the `server` directory:
+    python -m benchmark generate --exercises 100000 --output benchmark-100k.db
+    python -m benchmark run --database benchmark-100k.db --concurrency 8 --output report.json
+    python -m benchmark startup --database benchmark-100k.db --runs 10 --output startup.json
+    python -m benchmark compare baseline.json report.json
+"""
@@ -0,0 +1,202 @@
+import argparse
+import asyncio
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+from .driver import load_app, run_scenario, subprocess_env, ScenarioResult
+from .generate import generate_database
+from .report import build_report, compare, format_comparisons, load_report, new_report, save_report
+from .scenarios import SCENARIOS, sample_words
+from .startup import PHASES, measure_startup, startup_results
+
+DEFAULT_THRESHOLD = 0.10
+
+
+async def run_benchmark(app, words: List[str], scenarios: List[str], requests: int, concurrency: int,
+                        warmup: int) -> Dict[str, ScenarioResult]:
+    await app.router.startup()
+    results = {}
+    try:
+        for name in scenarios:
+            results[name] = await run_scenario(app, SCENARIOS[name](words), requests, concurrency, warmup)
+            print("  {}: {:.0f} requests/s".format(name, results[name].throughput))
+    finally:
+        await app.router.shutdown()
+    return results
+
+
+def generate_command(args):
+    started = time.perf_counter()
+    generate_database(args.output, args.exercises, args.words, args.seed)
+    print("Generated {} with {} exercises in {:.1f}s".format(args.output, args.exercises,
+                                                             time.perf_counter() - started))
+
+
+def run_in_subprocess(args, scenario: str) -> dict:
+    """
+    Runs a single scenario in a fresh process and returns its summary. The peak RSS of a process is the high-water
+    mark of everything it ran so far, only a process of its own measures that of the scenario.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        output = os.path.join(directory, "report.json")
+        command = [sys.executable, "-m", "benchmark", "run", "--in-process", "--scenarios", scenario,
+                   "--database", os.path.abspath(args.database), "--requests", str(args.requests),
+                   "--warmup", str(args.warmup), "--concurrency", str(args.concurrency), "--seed", str(args.seed),
+                   "--output", output]
+        if args.in_memory_index:
+            command.append("--in-memory-index")
+        if args.response_cache:
+            command.append("--response-cache")
+        completed = subprocess.run(command, env=subprocess_env(), stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                   text=True)
+        if completed.returncode != 0:
+            raise RuntimeError("The scenario {} failed:\n{}".format(scenario, completed.stderr))
+        return load_report(output)["scenarios"][scenario]
+
+
+def run_command(args) -> int:
+    if not os.path.exists(args.database):
+        print("cannot find", args.database)
+        return 1
+    scenarios = args.scenarios or list(SCENARIOS)
+    with sqlite3.connect(args.database) as conn:
+        exercises = conn.execute("SELECT COUNT(*) FROM exercise").fetchone()[0]
+    config = {
+        "database": args.database,
+        "exercises": exercises,
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "warmup": args.warmup,
+        "in_memory_index": args.in_memory_index,
+        "response_cache": args.response_cache,
+        "seed": args.seed,
+    }
+
+    if not args.in_process:
+        print("Benchmarking {} ({} exercises) with {} concurrent clients, one process per scenario, response cache {}..."
+              .format(args.database, exercises, args.concurrency, "on" if args.response_cache else "off"))
+        summaries = {}
+        for name in scenarios:
+            summaries[name] = run_in_subprocess(args, name)
+            print("  {}: {:.0f} requests/s".format(name, summaries[name]["throughput"]))
+        report = new_report(config, summaries)
+    else:
+        words = sample_words(args.database, args.requests + args.warmup, args.seed)
+        app = load_app(args.database, args.in_memory_index, args.response_cache)
+        print("Benchmarking {} ({} exercises) with {} concurrent clients, response cache {}...".format(
+            args.database, exercises, args.concurrency, "on" if args.response_cache else "off"))
+        results = asyncio.run(run_benchmark(app, words, scenarios, args.requests, args.concurrency, args.warmup))
+        if len(results) > 1:
+            # the high-water mark of the process, not of a scenario
+            for result in results.values():
+                result.peak_rss_mb = None
+        report = build_report(config, results)
+    save_report(report, args.output)
+    print("Report written to", args.output)
+
+    if args.baseline is not None:
+        return compare_reports(load_report(args.baseline), report, args.threshold)
+    return 0
+
+
+def startup_command(args) -> int:
+    if not os.path.exists(args.database):
+        print("cannot find", args.database)
+        return 1
+    word = sample_words(args.database, 1, args.seed)[0]
+    print("Starting the API server {} times on {}...".format(args.runs, args.database))
+    samples = measure_startup(args.database, args.runs, args.in_memory_index, word, args.openapi_cache_dir)
+    results = startup_results(samples)
+    for name, result in results.items():
+        print("  {}: {:.1f} ms".format(name, sorted(result.latencies)[len(result.latencies) // 2] * 1000))
+    report = build_report({
+        "database": args.database,
+        "runs": args.runs,
+        "in_memory_index": args.in_memory_index,
+        "openapi_cache_dir": args.openapi_cache_dir,
+        "phases": PHASES,
+    }, results)
+    save_report(report, args.output)
+    print("Report written to", args.output)
+
+    if args.baseline is not None:
+        return compare_reports(load_report(args.baseline), report, args.threshold)
+    return 0
+
+
+def compare_reports(baseline: dict, current: dict, threshold: float) -> int:
+    comparisons = compare(baseline, current)
+    print(format_comparisons(comparisons, threshold))
+    regressions = [comparison for comparison in comparisons if comparison.is_regression(threshold)]
+    if len(regressions) > 0:
+        print("{} regression(s) of more than {:.0f}%".format(len(regressions), threshold * 100))
+        return 1
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmark",
+                                     description="Load and regression benchmarks of the API server")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    generate = commands.add_parser("generate", help="generate a synthetic taskpool database")
+    generate.add_argument("--exercises", type=int, default=10_000, help="number of exercises")
+    generate.add_argument("--words", type=int, default=None,
+                          help="number of distinct target words, one per 20 exercises by default")
+    generate.add_argument("--seed", type=int, default=0)
+    generate.add_argument("--output", default="benchmark.db")
+
+    run = commands.add_parser("run", help="benchmark the API server on a database and write a JSON report")
+    run.add_argument("--database", default="benchmark.db")
+    run.add_argument("--scenarios", nargs="*", choices=list(SCENARIOS), help="all scenarios by default")
+    run.add_argument("--requests", type=int, default=1000, help="measured requests per scenario")
+    run.add_argument("--warmup", type=int, default=50, help="requests per scenario sent before measuring")
+    run.add_argument("--concurrency", type=int, default=8, help="number of concurrent clients")
+    run.add_argument("--in-memory-index", action="store_true", help="serve from the in-memory exercise index")
+    run.add_argument("--response-cache", action="store_true",
+                     help="keep the response cache enabled, repeated /exercises requests are then mostly cache hits")
+    run.add_argument("--seed", type=int, default=0, help="seed of the sampled words")
+    run.add_argument("--in-process", action="store_true",
+                     help="run all scenarios in this process instead of one process each, the peak RSS is then only "
+                          "reported for a single scenario")
+    run.add_argument("--output", default="benchmark-report.json")
+    run.add_argument("--baseline", help="report to compare the results with")
+    run.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                     help="relative change which counts as a regression")
+
+    startup = commands.add_parser("startup", help="measure the cold start of the API server in fresh processes")
+    startup.add_argument("--database", default="benchmark.db")
+    startup.add_argument("--runs", type=int, default=10, help="number of processes started")
+    startup.add_argument("--in-memory-index", action="store_true", help="serve from the in-memory exercise index")
+    startup.add_argument("--openapi-cache-dir", help="cache the OpenAPI document there, every run after the first "
+                                                     "reads it")
+    startup.add_argument("--seed", type=int, default=0, help="seed of the word requested from /exercises")
+    startup.add_argument("--output", default="startup-report.json")
+    startup.add_argument("--baseline", help="report to compare the results with")
+    startup.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                         help="relative change which counts as a regression")
+
+    compare_parser = commands.add_parser("compare", help="compare a report with a baseline report")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("report")
+    compare_parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                                help="relative change which counts as a regression")
+
+    args = parser.parse_args()
+    if args.command == "generate":
+        generate_command(args)
+        return 0
+    if args.command == "run":
+        return run_command(args)
+    if args.command == "startup":
+        return startup_command(args)
+    return compare_reports(load_report(args.baseline), load_report(args.report), args.threshold)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,164 @@
+"""
+Drives an ASGI application in-process, without a server or sockets in between, so that the measured latency is the
+time spent in the application itself.
+"""
+
+import asyncio
+import os
+import sys
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlencode
+from starlette.types import ASGIApp, Message
+
+try:
+    import resource
+except ImportError:  # pragma: no cover
+    resource = None
+
+SERVER_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+SRC_DIR = os.path.join(SERVER_DIR, "src")
+
+
+def load_app(database: str, in_memory_index: bool, response_cache: bool = False):
+    """
+    Imports the app configured for `database`. The response cache is disabled unless `response_cache` is set, repeated
+    requests would otherwise measure cache hits instead of the queries and the rendering.
+    """
+    # settings are read when the server modules are imported, the database has to be configured before
+    os.environ["TASKPOOL_DB_PATH"] = database
+    os.environ["TASKPOOL_IN_MEMORY_INDEX"] = "true" if in_memory_index else "false"
+    if not response_cache:
+        os.environ["TASKPOOL_RESPONSE_CACHE_BYTES"] = "0"
+    sys.path.insert(0, SRC_DIR)
+    from main import taskpool_app
+    return taskpool_app
+
+
+class Request:
+    def __init__(self, method: str, path: str, query: Optional[Dict[str, str]] = None, body: bytes = b"",
+                 headers: Optional[Dict[str, str]] = None):
+        self.method = method
+        self.path = path
+        self.query = query or {}
+        self.body = body
+        self.headers = headers or {}
+
+
+class Response:
+    def __init__(self, status: int, body: bytes, headers: List[Tuple[bytes, bytes]]):
+        self.status = status
+        self.body = body
+        self.headers = headers
+
+
+async def call(app: ASGIApp, request: Request) -> Response:
+    """Sends a single request to the application and collects the whole response."""
+    headers = {"host": "benchmark", **{name.lower(): value for name, value in request.headers.items()}}
+    if request.body:
+        headers["content-length"] = str(len(request.body))
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": request.method,
+        "scheme": "http",
+        "path": request.path,
+        "raw_path": request.path.encode(),
+        "query_string": urlencode(request.query).encode(),
+        "root_path": "",
+        "headers": [(name.encode(), value.encode()) for name, value in headers.items()],
+        "client": ("127.0.0.1", 50000),
+        "server": ("benchmark", 80),
+    }
+
+    request_sent = False
+    response_complete = asyncio.Event()
+    status = 500
+    response_headers = []
+    body = bytearray()
+
+    async def receive() -> Message:
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": request.body, "more_body": False}
+        # streaming responses listen for a disconnect, the client only goes away once the response is complete
+        await response_complete.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message: Message):
+        nonlocal status, response_headers
+        if message["type"] == "http.response.start":
+            status = message["status"]
+            response_headers = message.get("headers", [])
+        elif message["type"] == "http.response.body":
+            body.extend(message.get("body", b""))
+            if not message.get("more_body", False):
+                response_complete.set()
+
+    await app(scope, receive, send)
+    response_complete.set()
+    return Response(status, bytes(body), response_headers)
+
+
+def subprocess_env() -> Dict[str, str]:
+    """The environment of a benchmark process started by this one, which can import the benchmark package."""
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [SERVER_DIR, env.get("PYTHONPATH")]))
+    return env
+
+
+def peak_rss_mb() -> Optional[float]:
+    """The peak resident set size of this process so far."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macOS, kilobytes on Linux and the BSDs
+    return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+
+
+class ScenarioResult:
+    def __init__(self, latencies: List[float], errors: int, seconds: float, peak_rss: Optional[float]):
+        self.latencies = latencies
+        self.errors = errors
+        self.seconds = seconds
+        self.peak_rss_mb = peak_rss
+
+    @property
+    def requests(self) -> int:
+        return len(self.latencies)
+
+    @property
+    def throughput(self) -> float:
+        return self.requests / self.seconds if self.seconds > 0 else 0.0
+
+
+async def run_scenario(app: ASGIApp, make_request: Callable[[int], Request], requests: int, concurrency: int,
+                       warmup: int = 0) -> ScenarioResult:
+    """
+    Sends `requests` requests built by `make_request(i)` from `concurrency` concurrent clients. The first `warmup`
+    requests are sent sequentially beforehand and not measured.
+    """
+    for i in range(warmup):
+        await call(app, make_request(i))
+
+    latencies = []
+    errors = 0
+    # shared by all clients, every index is taken by exactly one of them
+    indexes = iter(range(warmup, warmup + requests))
+
+    async def client():
+        nonlocal errors
+        for i in indexes:
+            request = make_request(i)
+            started = time.perf_counter()
+            response = await call(app, request)
+            latencies.append(time.perf_counter() - started)
+            if response.status >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    seconds = time.perf_counter() - started
+    return ScenarioResult(latencies, errors, seconds, peak_rss_mb())
@@ -0,0 +1,111 @@
+"""
+Generates synthetic taskpool databases of any size with the schema of `schema.sql`.
+
+Words follow a Zipf distribution like in real sentences, so that a few words have many exercises and most words only
+a few. Sentences, translations and exercises are linked the same way as in a database created by the scripts.
+"""
+
+import hashlib
+import json
+import os
+import random
+import sqlite3
+from itertools import accumulate
+from typing import Iterator, List, Sequence, Tuple
+
+SCHEMA_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "schema.sql")
+
+# (source language, target language) of the translation pairs served by the API
+TRANSLATION_PAIRS = (("UK", "DE"), ("DE", "EN"))
+SIMILAR_WORDS = 3
+BATCH_SIZE = 10_000
+
+# no "ß", it changes to "Ss" when a sentence starts with it
+LETTERS = "abcdefghijklmnopqrstuvwxyzäöü"
+
+
+def make_vocabulary(rng: random.Random, size: int) -> List[str]:
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choice(LETTERS) for _ in range(rng.randint(3, 10))))
+    # sorted before shuffling, sets are not ordered deterministically
+    vocabulary = sorted(words)
+    rng.shuffle(vocabulary)
+    return vocabulary
+
+
+def make_sentence(rng: random.Random, vocabulary: Sequence[str], word: str = None) -> Tuple[str, int]:
+    """A sentence of random words, which contains `word` if given, and its word count."""
+    words = rng.choices(vocabulary, k=rng.randint(3, 12))
+    if word is not None:
+        words.insert(rng.randrange(len(words) + 1), word)
+    return " ".join(words).capitalize() + ".", len(words)
+
+
+def exercise_id(source_sentence_id: int, target_sentence_id: int) -> str:
+    # the same ids as scripts/populate_exercise_table.py
+    return hashlib.md5("{}_{}".format(source_sentence_id, target_sentence_id).encode("utf-8")).hexdigest()
+
+
+def generate_rows(exercises: int, words: int, seed: int) -> Iterator[Tuple[tuple, tuple, tuple, tuple]]:
+    """Yields the source sentence, target sentence, translation and exercise of every exercise."""
+    rng = random.Random(seed)
+    vocabulary = make_vocabulary(rng, words)
+    # the n-th most frequent word occurs with a probability proportional to 1 / n
+    cum_weights = list(accumulate(1 / rank for rank in range(1, words + 1)))
+
+    for i in range(exercises):
+        source_language, target_language = TRANSLATION_PAIRS[i % len(TRANSLATION_PAIRS)]
+        word = rng.choices(vocabulary, cum_weights=cum_weights)[0]
+        source_sentence_id = 2 * i + 1
+        target_sentence_id = 2 * i + 2
+        translation_id = i + 1
+        similar_words = rng.sample(vocabulary, SIMILAR_WORDS + 1)
+        if word in similar_words:
+            similar_words.remove(word)
+        yield (
+            (source_sentence_id, source_language, *make_sentence(rng, vocabulary), "benchmark", -1),
+            (target_sentence_id, target_language, *make_sentence(rng, vocabulary, word), "benchmark",
+             source_sentence_id),
+            (translation_id, source_sentence_id, target_sentence_id),
+            (exercise_id(source_sentence_id, target_sentence_id), translation_id, word,
+             json.dumps(similar_words[:SIMILAR_WORDS]), source_sentence_id, target_sentence_id, source_language,
+             target_language)
+        )
+
+
+def insert_batch(conn: sqlite3.Connection, batch: List[Tuple[tuple, tuple, tuple, tuple]]):
+    conn.executemany("INSERT INTO sentences (id, language, text, word_count, author, translated_from) "
+                     "VALUES (?, ?, ?, ?, ?, ?)", [sentence for row in batch for sentence in row[:2]])
+    conn.executemany("INSERT INTO translations (id, s1, s2) VALUES (?, ?, ?)", [row[2] for row in batch])
+    conn.executemany("INSERT INTO exercise (id, translation_id, target_word, similar_words, source_sentence_id, "
+                     "target_sentence_id, source_language, target_language) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                     [row[3] for row in batch])
+
+
+def generate_database(path: str, exercises: int, words: int = None, seed: int = 0, schema_file: str = SCHEMA_FILE):
+    """
+    Writes a database with `exercises` exercises about `words` distinct words (by default one word per 20
+    exercises). The same arguments always produce the same database.
+    """
+    if words is None:
+        words = max(10, exercises // 20)
+    if os.path.exists(path):
+        os.remove(path)
+
+    conn = sqlite3.connect(path, isolation_level=None)
+    with open(schema_file, "r") as f:
+        conn.executescript(f.read())
+    conn.execute("PRAGMA journal_mode = OFF")
+    conn.execute("PRAGMA synchronous = OFF")
+    conn.execute("BEGIN")
+    batch = []
+    for row in generate_rows(exercises, words, seed):
+        batch.append(row)
+        if len(batch) == BATCH_SIZE:
+            insert_batch(conn, batch)
+            batch = []
+    insert_batch(conn, batch)
+    conn.execute("COMMIT")
+    conn.execute("ANALYZE")
+    conn.close()
@@ -0,0 +1,132 @@
+"""
+JSON reports of benchmark runs and their comparison against a saved baseline.
+"""
+
+import json
+import math
+import platform
+import sys
+from datetime import datetime, timezone
+from typing import Dict, List, Sequence
+
+from .driver import ScenarioResult
+
+REPORT_VERSION = 1
+
+# metrics compared against the baseline and whether a higher value is better
+COMPARED_METRICS = {
+    "throughput": True,
+    "latency_ms.p50": False,
+    "latency_ms.p99": False,
+    "peak_rss_mb": False,
+}
+
+
+def percentile(sorted_values: Sequence[float], p: float) -> float:
+    """Nearest-rank percentile of already sorted values."""
+    if len(sorted_values) == 0:
+        return 0.0
+    rank = max(1, math.ceil(p / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize(result: ScenarioResult) -> dict:
+    latencies = sorted(latency * 1000 for latency in result.latencies)
+    return {
+        "requests": result.requests,
+        "errors": result.errors,
+        "seconds": round(result.seconds, 4),
+        "throughput": round(result.throughput, 2),
+        "latency_ms": {
+            "mean": round(sum(latencies) / len(latencies), 4) if latencies else 0.0,
+            "p50": round(percentile(latencies, 50), 4),
+            "p90": round(percentile(latencies, 90), 4),
+            "p99": round(percentile(latencies, 99), 4),
+            "max": round(latencies[-1], 4) if latencies else 0.0,
+        },
+        "peak_rss_mb": round(result.peak_rss_mb, 1) if result.peak_rss_mb is not None else None,
+    }
+
+
+def build_report(config: dict, results: Dict[str, ScenarioResult]) -> dict:
+    return new_report(config, {name: summarize(result) for name, result in results.items()})
+
+
+def new_report(config: dict, scenarios: Dict[str, dict]) -> dict:
+    """A report of already summarised scenarios, e.g. taken from the reports of other processes."""
+    return {
+        "version": REPORT_VERSION,
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "environment": {
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+        },
+        "config": config,
+        "scenarios": scenarios,
+    }
+
+
+def load_report(path: str) -> dict:
+    with open(path, "r") as f:
+        report = json.load(f)
+    if report.get("version") != REPORT_VERSION:
+        raise ValueError("Unsupported benchmark report version {} of {}".format(report.get("version"), path))
+    return report
+
+
+def save_report(report: dict, path: str):
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
+        f.write("\n")
+
+
+def get_metric(scenario: dict, metric: str):
+    value = scenario
+    for key in metric.split("."):
+        value = value.get(key) if isinstance(value, dict) else None
+    return value
+
+
+class Comparison:
+    def __init__(self, scenario: str, metric: str, baseline: float, current: float, higher_is_better: bool):
+        self.scenario = scenario
+        self.metric = metric
+        self.baseline = baseline
+        self.current = current
+        self.higher_is_better = higher_is_better
+
+    @property
+    def change(self) -> float:
+        """Relative change, positive if the current run is worse than the baseline."""
+        if self.baseline == 0:
+            return 0.0
+        change = (self.current - self.baseline) / self.baseline
+        return -change if self.higher_is_better else change
+
+    def is_regression(self, threshold: float) -> bool:
+        return self.change > threshold
+
+
+def compare(baseline: dict, current: dict) -> List[Comparison]:
+    """Compares the scenarios which are in both reports."""
+    comparisons = []
+    for name, scenario in current["scenarios"].items():
+        baseline_scenario = baseline["scenarios"].get(name)
+        if baseline_scenario is None:
+            continue
+        for metric, higher_is_better in COMPARED_METRICS.items():
+            baseline_value = get_metric(baseline_scenario, metric)
+            current_value = get_metric(scenario, metric)
+            if baseline_value is None or current_value is None:
+                continue
+            comparisons.append(Comparison(name, metric, baseline_value, current_value, higher_is_better))
+    return comparisons
+
+
+def format_comparisons(comparisons: List[Comparison], threshold: float) -> str:
+    lines = ["{:<20} {:<16} {:>12} {:>12} {:>8}".format("scenario", "metric", "baseline", "current", "worse")]
+    for comparison in comparisons:
+        lines.append("{:<20} {:<16} {:>12.3f} {:>12.3f} {:>+7.1f}%{}".format(
+            comparison.scenario, comparison.metric, comparison.baseline, comparison.current, comparison.change * 100,
+            "  REGRESSION" if comparison.is_regression(threshold) else ""))
+    return "\n".join(lines)
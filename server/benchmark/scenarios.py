@@ -0,0 +1,70 @@
+"""
+The requests sent by every scenario. Words are drawn uniformly from the learnable words, like learners who pick them
+from `/words`. The generated exercises follow a Zipf distribution, so a few of the drawn words have thousands of
+exercises.
+"""
+
+import json
+import random
+import sqlite3
+from typing import Callable, Dict, List
+
+from .driver import Request
+
+TRANSLATION_PAIR = "uk->de"
+BATCH_WORDS = 20
+PAGE_SIZE = 100
+
+
+def sample_words(database: str, count: int, seed: int = 0) -> List[str]:
+    """`count` learnable words of the benchmarked translation pair."""
+    conn = sqlite3.connect(database)
+    words = [word for (word,) in conn.execute("""
+    SELECT DISTINCT target_word
+    FROM exercise
+    WHERE source_language = 'UK' AND target_language = 'DE'
+    ORDER BY target_word
+    """)]
+    conn.close()
+    if len(words) == 0:
+        raise ValueError("{} has no exercises for {}".format(database, TRANSLATION_PAIR))
+    rng = random.Random(seed)
+    return rng.choices(words, k=count)
+
+
+def exercises(exercise_type: str, words: List[str]) -> Callable[[int], Request]:
+    return lambda i: Request("GET", "/exercises", {
+        "translationPair": TRANSLATION_PAIR,
+        "word": words[i % len(words)],
+        "exerciseType": exercise_type
+    })
+
+
+def exercises_batch(words: List[str]) -> Callable[[int], Request]:
+    def make_request(i: int) -> Request:
+        batch = [words[(i * BATCH_WORDS + j) % len(words)] for j in range(BATCH_WORDS)]
+        body = json.dumps({"translationPair": TRANSLATION_PAIR, "words": batch, "exerciseType": "all"})
+        return Request("POST", "/exercises/batch", body=body.encode(), headers={"content-type": "application/json"})
+
+    return make_request
+
+
+def words_list(words: List[str]) -> Callable[[int], Request]:
+    return lambda i: Request("GET", "/words", {"translationPair": TRANSLATION_PAIR})
+
+
+def words_page(words: List[str]) -> Callable[[int], Request]:
+    return lambda i: Request("GET", "/words", {
+        "translationPair": TRANSLATION_PAIR,
+        "limit": str(PAGE_SIZE),
+        "after": words[i % len(words)]
+    })
+
+
+SCENARIOS: Dict[str, Callable[[List[str]], Callable[[int], Request]]] = {
+    "exercises-essay": lambda words: exercises("bitmark.essay", words),
+    "exercises-all": lambda words: exercises("all", words),
+    "exercises-batch": exercises_batch,
+    "words-page": words_page,
+    "words": words_list,
+}
@@ -0,0 +1,97 @@
+"""
+Cold start benchmark. Every run starts a fresh interpreter which imports the app, runs its startup hooks and sends
+its first requests, like a replica which was just started or scaled up from zero. Each phase is reported as a scenario
+of the usual JSON report, so that startup times can be compared with a baseline like the load benchmark.
+"""
+
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional
+
+# phases timed in every process, in seconds
+PHASES = ["interpreter", "import", "startup", "first-healthcheck", "first-exercises", "first-openapi"]
+# the phases until the first request is answered
+FIRST_200 = ["interpreter", "import", "startup", "first-healthcheck"]
+
+
+async def probe(database: str, in_memory_index: bool, word: str, spawned: float) -> dict:
+    """Runs in the measured process and times its phases, starting with the interpreter launched at `spawned`."""
+    seconds = {"interpreter": time.time() - spawned}
+    started = time.perf_counter()
+    # imported here, the driver imports part of what the app imports and is counted with it
+    from .driver import Request, call, load_app, peak_rss_mb
+    app = load_app(database, in_memory_index)
+    seconds["import"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    await app.router.startup()
+    seconds["startup"] = time.perf_counter() - started
+
+    statuses = {}
+    for phase, request in [
+        ("first-healthcheck", Request("GET", "/healthcheck")),
+        ("first-exercises", Request("GET", "/exercises", {"translationPair": "uk->de", "word": word,
+                                                          "exerciseType": "all"})),
+        ("first-openapi", Request("GET", "/openapi.json")),
+    ]:
+        started = time.perf_counter()
+        response = await call(app, request)
+        seconds[phase] = time.perf_counter() - started
+        statuses[phase] = response.status
+
+    await app.router.shutdown()
+    return {"seconds": seconds, "statuses": statuses, "peak_rss_mb": peak_rss_mb()}
+
+
+def run_once(database: str, in_memory_index: bool, word: str, openapi_cache_dir: Optional[str] = None) -> dict:
+    """Starts a process which probes the app and returns what it measured."""
+    from .driver import subprocess_env
+
+    env = subprocess_env()
+    if openapi_cache_dir is not None:
+        env["TASKPOOL_OPENAPI_CACHE_DIR"] = openapi_cache_dir
+    command = [sys.executable, "-m", "benchmark.startup", os.path.abspath(database), word, repr(time.time())]
+    if in_memory_index:
+        command.append("--in-memory-index")
+    completed = subprocess.run(command, env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    if completed.returncode != 0:
+        raise RuntimeError("The startup probe failed:\n" + completed.stderr)
+    # the app may log to stdout as well, the measurements are the last line
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def measure_startup(database: str, runs: int, in_memory_index: bool, word: str,
+                    openapi_cache_dir: Optional[str] = None) -> List[dict]:
+    return [run_once(database, in_memory_index, word, openapi_cache_dir) for _ in range(runs)]
+
+
+def startup_results(samples: List[dict]) -> dict:
+    """The phases of all runs as scenario results, plus the time to the first 200 and the whole probe."""
+    # not imported at the top, the probe process imports this module before it starts measuring
+    from .driver import ScenarioResult
+
+    results: Dict[str, ScenarioResult] = {}
+    phases = {phase: [phase] for phase in PHASES}
+    phases["first-200"] = FIRST_200
+    phases["total"] = PHASES
+    for name, parts in phases.items():
+        latencies = [sum(sample["seconds"][part] for part in parts) for sample in samples]
+        errors = sum(1 for sample in samples if any(sample["statuses"].get(part, 200) != 200 for part in parts))
+        # the memory of the process once it answered all first requests
+        peak_rss = max((sample["peak_rss_mb"] or 0 for sample in samples), default=0) if name == "total" else None
+        results[name] = ScenarioResult(latencies, errors, sum(latencies), peak_rss or None)
+    return results
+
+
+def main():
+    database, word, spawned = sys.argv[1], sys.argv[2], float(sys.argv[3])
+    in_memory_index = "--in-memory-index" in sys.argv[4:]
+    print(json.dumps(asyncio.run(probe(database, in_memory_index, word, spawned))))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Content negotiation and compression of response bodies with gzip and, if the brotli package is installed, brotli.
+
+Responses are compressed with the same settings whether they are compressed on the fly by `CompressionMiddleware` or
+stored compressed in a response cache, so that a representation has the same bytes and the same ETag either way.
+"""
+
+import gzip
+import zlib
+from typing import Dict, List, Optional
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+GZIP = "gzip"
+BROTLI = "br"
+GZIP_LEVEL = 6
+# brotli's highest qualities are meant for static files, 5 compresses better than gzip at a similar speed
+BROTLI_QUALITY = 5
+
+# the media types of the API which are worth compressing, audio clips are compressed already
+COMPRESSIBLE_MEDIA_TYPES = ("application/json", "application/x-ndjson", "text/")
+
+
+def available_encodings() -> List[str]:
+    """The supported content codings, preferred ones first."""
+    return [BROTLI, GZIP] if brotli is not None else [GZIP]
+
+
+def is_compressible(content_type: str) -> bool:
+    return content_type.startswith(COMPRESSIBLE_MEDIA_TYPES)
+
+
+def parse_accept_encoding(header: str) -> Dict[str, float]:
+    """The quality of every coding listed in an Accept-Encoding header."""
+    qualities = {}
+    for item in header.split(","):
+        coding, _, parameters = item.partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        name, _, value = parameters.partition("=")
+        if name.strip().lower() == "q":
+            try:
+                quality = float(value)
+            except ValueError:
+                quality = 0.0
+        qualities[coding] = quality
+    return qualities
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """The available coding the client prefers, None if it does not accept any or prefers identity."""
+    if not accept_encoding:
+        return None
+    qualities = parse_accept_encoding(accept_encoding)
+    default = qualities.get("*", 0.0)
+    best, best_quality = None, 0.0
+    for encoding in available_encodings():
+        quality = qualities.get(encoding, default)
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    if best is not None and qualities.get("identity", 0.0) > best_quality:
+        return None
+    return best
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == BROTLI:
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    # without a modification time the output only depends on the body
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def compress_all(body: bytes, minimum_size: int) -> Dict[str, bytes]:
+    """The body in every available coding, or none if it is too small to be worth compressing."""
+    if len(body) < minimum_size:
+        return {}
+    return {encoding: compress(body, encoding) for encoding in available_encodings()}
+
+
+def encoded_etag(etag: str, encoding: str) -> str:
+    """
+    The ETag of the compressed representation of a response. It differs from the ETag of the identity response, so
+    that a strong ETag keeps identifying the exact bytes.
+    """
+    if not etag.endswith('"'):
+        return etag
+    return etag[:-1] + "-" + encoding + '"'
+
+
+class StreamCompressor:
+    """Compresses a streamed body chunk by chunk. Every chunk is flushed, so that the client can decode it at once."""
+
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == BROTLI:
+            self._brotli = brotli.Compressor(quality=BROTLI_QUALITY)
+        else:
+            # a window size of 16 + 15 writes the gzip header and trailer
+            self._zlib = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, chunk: bytes) -> bytes:
+        if self.encoding == BROTLI:
+            return self._brotli.process(chunk) + self._brotli.flush()
+        return self._zlib.compress(chunk) + self._zlib.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        if self.encoding == BROTLI:
+            return self._brotli.finish()
+        return self._zlib.flush()
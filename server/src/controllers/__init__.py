@@ -1,8 +1,9 @@
-from fastapi import APIRouter
+from .admin_controller import router as admin_router
+from .audio_controller import router as audio_router
 from .exercise_controller import router as exercise_router
 from .healthcheck_controller import router as healthcheck_router
+from .metrics_controller import router as metrics_router
 
-router = APIRouter()
-
-router.include_router(exercise_router)
-router.include_router(healthcheck_router)
+# included into the app one by one: including a router copies its routes and their response models, which is slow
+# enough to show in the startup time if it happens twice
+routers = [exercise_router, healthcheck_router, audio_router, metrics_router, admin_router]
@@ -0,0 +1,35 @@
+import hmac
+import time
+from typing import Optional
+from fastapi import APIRouter, Header, HTTPException
+from models.api_models import DatabaseReloadStatus
+from repositories import database_watcher
+from repositories.exercise_repository import get_data_version
+from settings import settings
+
+router = APIRouter()
+
+
+def check_admin_token(token: Optional[str]):
+    if settings.taskpool_admin_token is None:
+        # admin endpoints do not exist unless a token is configured
+        raise HTTPException(status_code=404)
+    if token is None or not hmac.compare_digest(token, settings.taskpool_admin_token):
+        raise HTTPException(status_code=403)
+
+
+@router.post(
+    "/admin/database/reload",
+    include_in_schema=False,
+    response_model=DatabaseReloadStatus
+)
+async def reload_database(x_admin_token: Optional[str] = Header(default=None)) -> DatabaseReloadStatus:
+    check_admin_token(x_admin_token)
+    started = time.perf_counter()
+    if not await database_watcher.reload_database():
+        raise HTTPException(status_code=503, detail="The database could not be reloaded, the previous one is still "
+                                                    "being served")
+    return DatabaseReloadStatus(
+        dataVersion=await get_data_version(),
+        seconds=time.perf_counter() - started
+    )
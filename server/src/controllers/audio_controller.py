@@ -0,0 +1,94 @@
+from typing import Any, Optional, Tuple
+from fastapi import APIRouter, HTTPException, Request, Response
+from starlette.concurrency import run_in_threadpool
+from repositories.audio_repository import get_audio_manifest
+from responses import etag_matches
+from settings import settings
+
+router = APIRouter()
+AUDIO_MEDIA_TYPE = "audio/mpeg"
+
+
+class AudioResponse(Response):
+    media_type = AUDIO_MEDIA_TYPE
+
+    def render(self, content: Any) -> Any:
+        # slices of a memory-mapped bundle are sent as they are, without copying them into bytes
+        if isinstance(content, memoryview):
+            return content
+        return super().render(content)
+
+
+class UnsatisfiableRange(Exception):
+    pass
+
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parses a Range header with a single byte range into its first and last byte position. Returns None for headers
+    which are ignored (other units, multiple ranges, invalid syntax), so that the whole clip is served.
+    """
+    unit, _, byte_range = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in byte_range:
+        return None
+    first, separator, last = byte_range.strip().partition("-")
+    if not separator:
+        return None
+    try:
+        if first == "":
+            # the last n bytes
+            suffix_length = int(last)
+            if suffix_length <= 0:
+                raise UnsatisfiableRange()
+            return max(0, size - suffix_length), size - 1
+        start = int(first)
+        end = int(last) if last != "" else size - 1
+    except ValueError:
+        return None
+    if start >= size:
+        raise UnsatisfiableRange()
+    if end < start:
+        return None
+    return start, min(end, size - 1)
+
+
+@router.api_route("/audio/{name}", methods=["GET", "HEAD"], include_in_schema=False)
+async def audio(name: str, request: Request) -> Response:
+    manifest = get_audio_manifest()
+    clip = manifest.get(name)
+    if clip is None:
+        raise HTTPException(status_code=404)
+
+    headers = {
+        "ETag": clip.etag,
+        "Cache-Control": settings.taskpool_audio_cache_control,
+        "Accept-Ranges": "bytes"
+    }
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None and etag_matches(if_none_match, clip.etag):
+        return Response(status_code=304, headers=headers)
+
+    status_code = 200
+    start, end = 0, clip.size - 1
+    range_header = request.headers.get("range")
+    # a Range with an outdated If-Range validator gets the whole clip
+    if range_header is not None and request.headers.get("if-range", clip.etag) == clip.etag:
+        try:
+            byte_range = parse_range(range_header, clip.size)
+        except UnsatisfiableRange:
+            headers["Content-Range"] = "bytes */{}".format(clip.size)
+            return Response(status_code=416, headers=headers)
+        if byte_range is not None:
+            status_code = 206
+            start, end = byte_range
+            headers["Content-Range"] = "bytes {}-{}/{}".format(start, end, clip.size)
+
+    length = end - start + 1
+    headers["Content-Length"] = str(length)
+    if request.method == "HEAD":
+        return AudioResponse(status_code=status_code, headers=headers)
+    if manifest.is_bundled:
+        content = manifest.read(clip, start, length)
+    else:
+        content = await run_in_threadpool(manifest.read, clip, start, length)
+    return AudioResponse(content, status_code=status_code, headers=headers)
@@ -1,8 +1,19 @@
-from fastapi import APIRouter, Query, Request
-from repositories.exercise_repository import get_exercises_by_translation_pair_and_word, get_learnable_words
+import hashlib
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from repositories.exercise_repository import get_learnable_words, find_internal_exercises_for_words, \
+    find_internal_exercises, stream_internal_exercises, stream_learnable_words, sample_internal_exercises, \
+    search_learnable_words, get_current_data_version, on_database_swap
+from repositories.audio_repository import get_audio_manifest
 from models.api_models import TranslationPair, LearnableWord, TranslationPairWrapper, Exercise, \
-    translation_pair_to_internal_translation_pair, ExerciseType
-from typing import List
+    translation_pair_to_internal_translation_pair, ExerciseType, ExerciseBatchRequest, WordExercises, \
+    has_random_choices
+from models.exercise_renderer import render_exercise
+from responses import FastJSONResponse, dumps, etag_matches, render_json
+from response_cache import ResponseCache, CachedResponse, register_cache
+from compression import compress_all, encoded_etag, negotiate_encoding
+from settings import settings
+from typing import Iterator, List, Optional
 
 router = APIRouter()
 
@@ -10,6 +21,60 @@ translation_pair_query_doc = 'The left side is the source language and the right
                              'learned. For example the pair <code>"uk->de"</code> should be used for learning German ' \
                              'for Ukrainians. '
 
+limit_query_doc = 'The maximum number of results to return. If there are more results, the cursor of the next page is ' \
+                  'returned in the <code>X-Next-Cursor</code> header.'
+
+after_query_doc = 'The cursor returned in the <code>X-Next-Cursor</code> header of the previous page.'
+
+seed_query_doc = 'Orders the choices of multiple choice exercises reproducibly.'
+
+caching_doc = 'Responses whose content only changes with the exercise data carry an <code>ETag</code> and can be ' \
+              'revalidated with <code>If-None-Match</code>. That is all responses except those with shuffled ' \
+              'multiple choice exercises, which are ordered reproducibly with a <code>seed</code>.'
+
+ndjson_doc = 'Send the header <code>Accept: application/x-ndjson</code> to receive the results as newline delimited ' \
+             'JSON, streamed while they are read from the database. Pages of a <code>limit</code> are read at once ' \
+             'and carry the same <code>X-Next-Cursor</code> header.'
+
+search_doc = 'With <code>prefix</code> or <code>fuzzy</code>, only the best matches are returned, at most ' \
+             '<code>limit</code> (by default 10). Upper and lower case as well as diacritics are ignored, e.g. ' \
+             '<code>hutte</code> finds <code>Hütte</code>.'
+
+# results of a word search unless a limit is given
+SEARCH_LIMIT = 10
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+# part of every ETag, increase it whenever the rendering of exercises changes
+ETAG_FORMAT = 1
+
+# serialised /exercises responses by ETag, which covers the data version and all parameters of the request
+exercises_cache = register_cache("exercises", ResponseCache(settings.taskpool_response_cache_bytes,
+                                                            settings.taskpool_response_cache_ttl))
+on_database_swap(exercises_cache.clear)
+
+
+def accepts_ndjson(request: Request) -> bool:
+    return NDJSON_MEDIA_TYPE in request.headers.get("accept", "")
+
+
+async def exercises_etag(request: Request) -> str:
+    """
+    Strong ETag of an /exercises response, the same for every request with the same parameters as long as neither
+    the exercise data nor the available audio change.
+    """
+    parts = [str(ETAG_FORMAT), str(await get_current_data_version()), get_audio_manifest().fingerprint,
+             str(settings.taskpool_deterministic_choices), str(request.base_url),
+             NDJSON_MEDIA_TYPE if accepts_ndjson(request) else "application/json"]
+    parts.extend("{}={}".format(key, value) for key, value in sorted(request.query_params.multi_items()))
+    return '"{}"'.format(hashlib.md5("\n".join(parts).encode("utf-8")).hexdigest())
+
+
+def to_ndjson(batches: Iterator[List[dict]]) -> Iterator[bytes]:
+    # one chunk per batch of rows, the same JSON encoding as the regular responses
+    for batch in batches:
+        yield b"".join(dumps(item) + b"\n" for item in batch)
+
 
 @router.get(
     "/translation-pairs",
@@ -31,6 +96,7 @@ async def translation_pairs() -> List[TranslationPairWrapper]:
     "/exercises",
     tags=["Exercise"],
     summary="Get a list of exercises",
+    description=caching_doc + ' ' + ndjson_doc,
     response_model=List[Exercise]
 )
 async def exercises(
@@ -44,20 +110,170 @@ async def exercises(
             ExerciseType.BITMARK_ESSAY,
             description='Specifies what type of exercise should be returned.'
         ),
+        limit: Optional[int] = Query(None, ge=1, le=1000, description=limit_query_doc),
+        after: Optional[str] = Query(None, description=after_query_doc),
+        seed: Optional[int] = Query(None, description=seed_query_doc),
 ) -> List[Exercise]:
     base_url = request.base_url
-    result = await get_exercises_by_translation_pair_and_word(base_url,
-        translation_pair_to_internal_translation_pair(translationPair), word, exerciseType)
-    return list(result)
+    audio_clips = get_audio_manifest()
+    translation_pair = translation_pair_to_internal_translation_pair(translationPair)
+
+    # the representation depends on the Accept header, and on Accept-Encoding once it is compressed
+    headers = {"Vary": "Accept"}
+    encoding = negotiate_encoding(request.headers.get("accept-encoding"))
+    if not has_random_choices(exerciseType, seed):
+        headers["ETag"] = await exercises_etag(request)
+        headers["Cache-Control"] = settings.taskpool_exercises_cache_control
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match is not None:
+            # the client may hold the compressed or the identity representation
+            for etag in [headers["ETag"]] + ([encoded_etag(headers["ETag"], encoding)] if encoding else []):
+                if etag_matches(if_none_match, etag):
+                    headers["ETag"] = etag
+                    headers["Vary"] = "Accept, Accept-Encoding"
+                    return Response(status_code=304, headers=headers)
+
+    if accepts_ndjson(request):
+        if limit is not None:
+            # a page is bounded by its limit, it is read at once so that its cursor is known for the header
+            internal_exercises = await find_internal_exercises(translation_pair, word, limit, after)
+            if len(internal_exercises) == limit:
+                headers[NEXT_CURSOR_HEADER] = internal_exercises[-1].id
+            batches = iter([internal_exercises])
+        else:
+            batches = stream_internal_exercises(translation_pair, word, after)
+        return StreamingResponse(
+            to_ndjson([render_exercise(e, exerciseType, base_url, audio_clips, seed) for e in batch]
+                      for batch in batches),
+            media_type=NDJSON_MEDIA_TYPE, headers=headers)
+
+    async def render() -> CachedResponse:
+        internal_exercises = await find_internal_exercises(translation_pair, word, limit, after)
+        cursor = {}
+        if limit is not None and len(internal_exercises) == limit:
+            cursor[NEXT_CURSOR_HEADER] = internal_exercises[-1].id
+        return CachedResponse(render_json([render_exercise(e, exerciseType, base_url, audio_clips, seed)
+                                           for e in internal_exercises]), cursor)
+
+    if "ETag" not in headers:
+        # compressed by the middleware, in the coding of this request only
+        response = await render()
+        headers.update(response.headers)
+        return Response(response.body, media_type=FastJSONResponse.media_type, headers=headers)
+
+    async def render_compressed() -> CachedResponse:
+        response = await render()
+        # stored compressed in every coding, so that hits are not compressed again
+        response.encoded = compress_all(response.body, settings.taskpool_compression_min_size)
+        return response
+
+    response = await exercises_cache.get_or_compute(headers["ETag"], render_compressed)
+    headers.update(response.headers)
+    body = response.body
+    if encoding in response.encoded:
+        body = response.encoded[encoding]
+        headers["Content-Encoding"] = encoding
+        headers["ETag"] = encoded_etag(headers["ETag"], encoding)
+        headers["Vary"] = "Accept, Accept-Encoding"
+    return Response(body, media_type=FastJSONResponse.media_type, headers=headers)
+
+
+@router.get(
+    "/exercises/random",
+    tags=["Exercise"],
+    summary="Get random exercises",
+    description="""Returns <code>n</code> distinct exercises of a translation pair, drawn at random from all of its 
+    words. Requests with the same <code>seed</code> return the same exercises in the same order, as long as the 
+    exercise pool does not change.""",
+    response_model=List[Exercise]
+)
+async def random_exercises(
+        request: Request,
+        translationPair: TranslationPair = Query(
+            description=translation_pair_query_doc),
+        n: int = Query(10, ge=1, le=100, description='The number of exercises to return. Fewer are returned if the '
+                                                     'translation pair has fewer exercises.'),
+        exerciseType: ExerciseType = Query(
+            ExerciseType.BITMARK_ESSAY,
+            description='Specifies what type of exercise should be returned.'
+        ),
+        seed: Optional[int] = Query(None, description='Draws a reproducible selection of exercises, whose multiple '
+                                                      'choices are also ordered reproducibly.'),
+) -> List[Exercise]:
+    base_url = request.base_url
+    audio_clips = get_audio_manifest()
+    internal_exercises = await sample_internal_exercises(
+        translation_pair_to_internal_translation_pair(translationPair), n, seed)
+    return FastJSONResponse([render_exercise(e, exerciseType, base_url, audio_clips, seed) for e in internal_exercises])
+
+
+@router.post(
+    "/exercises/batch",
+    tags=["Exercise"],
+    summary="Get exercises for a list of words",
+    description="""Returns the exercises of several target words in a single request. The result holds one entry per 
+    requested word, in the order of the request, with the same exercises as returned by <code>GET /exercises</code>.""",
+    response_model=List[WordExercises]
+)
+async def exercises_batch(request: Request, batch: ExerciseBatchRequest) -> List[WordExercises]:
+    base_url = request.base_url
+    audio_clips = get_audio_manifest()
+    result = await find_internal_exercises_for_words(
+        translation_pair_to_internal_translation_pair(batch.translationPair), batch.words)
+    return FastJSONResponse([
+        {
+            "word": word,
+            "exercises": [render_exercise(e, batch.exerciseType, base_url, audio_clips, batch.seed) for e in internal_exercises]
+        }
+        for word, internal_exercises in result.items()
+    ])
 
 
 @router.get(
     "/words",
     tags=["Exercise"],
     summary="Get a list of learnable words",
+    description=search_doc + ' ' + ndjson_doc,
     response_model=List[LearnableWord]
 )
-async def words(translationPair: TranslationPair = Query(
-    description=translation_pair_query_doc)
+async def words(
+        request: Request,
+        response: Response,
+        translationPair: TranslationPair = Query(
+            description=translation_pair_query_doc),
+        limit: Optional[int] = Query(None, ge=1, le=10000, description=limit_query_doc),
+        after: Optional[str] = Query(None, description=after_query_doc),
+        prefix: Optional[str] = Query(None, min_length=1, max_length=100,
+                                      description='Only returns words which start with this prefix.'),
+        fuzzy: Optional[str] = Query(None, min_length=1, max_length=100,
+                                     description='Returns the words which are spelled like this word, allowing for a '
+                                                 'few typos. Cannot be combined with <code>prefix</code>.'),
 ) -> List[LearnableWord]:
-    return await get_learnable_words(translation_pair_to_internal_translation_pair(translationPair))
+    translation_pair = translation_pair_to_internal_translation_pair(translationPair)
+
+    if prefix is not None or fuzzy is not None:
+        if prefix is not None and fuzzy is not None:
+            raise HTTPException(status_code=400, detail="prefix and fuzzy cannot be combined")
+        if after is not None:
+            raise HTTPException(status_code=400, detail="search results cannot be paginated with after")
+        found = [{"word": word} for word in await search_learnable_words(translation_pair, prefix, fuzzy,
+                                                                        limit or SEARCH_LIMIT)]
+        if accepts_ndjson(request):
+            return StreamingResponse(to_ndjson([found]), media_type=NDJSON_MEDIA_TYPE)
+        return FastJSONResponse(found)
+
+    if accepts_ndjson(request) and limit is None:
+        batches = stream_learnable_words(translation_pair, after)
+        return StreamingResponse(to_ndjson([word.dict() for word in batch] for batch in batches),
+                                 media_type=NDJSON_MEDIA_TYPE)
+
+    learnable_words = await get_learnable_words(translation_pair, limit, after)
+    cursor = {}
+    if limit is not None and len(learnable_words) == limit:
+        cursor[NEXT_CURSOR_HEADER] = learnable_words[-1].word
+    if accepts_ndjson(request):
+        # a page is bounded by its limit, it is read at once so that its cursor is known for the header
+        return StreamingResponse(to_ndjson([[word.dict() for word in learnable_words]]),
+                                 media_type=NDJSON_MEDIA_TYPE, headers=cursor)
+    response.headers.update(cursor)
+    return learnable_words
@@ -1,5 +1,8 @@
+from typing import List
 from fastapi import APIRouter
-from models.api_models import HealthStatus
+from models.api_models import HealthStatus, DatabasePoolStatus, ResponseCacheStatus
+from repositories.exercise_repository import get_pool, get_data_version
+from response_cache import caches
 
 router = APIRouter()
 
@@ -14,3 +17,47 @@ async def healthcheck() -> HealthStatus:
         healthy=True,
         status="Up and running!"
     )
+
+
+@router.get(
+    "/healthcheck/database",
+    tags=["Metadata"],
+    summary="Get the state of the database connection pool",
+    response_model=DatabasePoolStatus
+)
+async def database_pool_status() -> DatabasePoolStatus:
+    stats = get_pool().stats()
+    return DatabasePoolStatus(
+        size=stats.size,
+        idle=stats.idle,
+        inUse=stats.in_use,
+        acquisitions=stats.acquisitions,
+        waits=stats.waits,
+        waitSecondsTotal=stats.wait_seconds_total,
+        waitSecondsMax=stats.wait_seconds_max,
+        dataVersion=await get_data_version()
+    )
+
+
+@router.get(
+    "/healthcheck/cache",
+    tags=["Metadata"],
+    summary="Get the state of the response caches",
+    response_model=List[ResponseCacheStatus]
+)
+async def response_cache_status() -> List[ResponseCacheStatus]:
+    statuses = []
+    for name, cache in caches.items():
+        stats = cache.stats()
+        statuses.append(ResponseCacheStatus(
+            name=name,
+            entries=stats.entries,
+            bytes=stats.bytes,
+            maxBytes=stats.max_bytes,
+            hits=stats.hits,
+            misses=stats.misses,
+            coalesced=stats.coalesced,
+            evictions=stats.evictions,
+            expirations=stats.expirations
+        ))
+    return statuses
@@ -0,0 +1,9 @@
+from fastapi import APIRouter, Response
+from metrics import registry, PROMETHEUS_MEDIA_TYPE
+
+router = APIRouter()
+
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics() -> Response:
+    return Response(registry.render(), media_type=PROMETHEUS_MEDIA_TYPE)
@@ -1,8 +1,20 @@
-import uvicorn
+import json
+import logging
+import os
+import tempfile
+from typing import Optional
 from fastapi import FastAPI
-from fastapi.openapi.utils import get_openapi
-from fastapi.staticfiles import StaticFiles
-from controllers import router
+from controllers import routers
+from middleware import CompressionMiddleware, MetricsMiddleware
+from repositories.audio_repository import load_audio_manifest
+from repositories.database_watcher import start_database_watcher, stop_database_watcher
+from repositories.exercise_repository import open_database, close_database, start_background_build, \
+    stop_background_build
+from settings import settings
+
+logger = logging.getLogger(__name__)
+
+APP_VERSION = "0.0.2"
 
 description = '''
 Contact: kristian@taskbase.com | <a href="https://creativecommons.org/licenses/by/4.0/"> Creative Commons Attribution 4.0 </a> 
@@ -32,14 +44,13 @@ tags_metadata = [
 ]
 
 
-def initialize():
-    app = FastAPI()
-    app.include_router(router)
-    app.mount("/audio", StaticFiles(directory="audio-generated"), name="audio")
+def build_openapi(app: FastAPI) -> dict:
+    # imported here, the OpenAPI models take a while to import and are only needed for the first /openapi.json
+    from fastapi.openapi.utils import get_openapi
 
     openapi_schema = get_openapi(
         title="Open Taskpool API",
-        version="0.0.2",
+        version=APP_VERSION,
         description=description,
         tags=tags_metadata,
         routes=app.routes
@@ -49,7 +60,73 @@ def initialize():
         "url": "https://tb-open-taskpool.s3.eu-central-1.amazonaws.com/open-taskpool.png"
     }
 
-    app.openapi_schema = openapi_schema
+    return openapi_schema
+
+
+def openapi_cache_path() -> Optional[str]:
+    """The file the OpenAPI document of this version is cached in, None if it is not cached in a file."""
+    if settings.taskpool_openapi_cache_dir is None:
+        return None
+    return os.path.join(settings.taskpool_openapi_cache_dir, "openapi-{}.json".format(APP_VERSION))
+
+
+def read_cached_openapi(path: str) -> Optional[dict]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def write_cached_openapi(path: str, openapi_schema: dict):
+    """Writes the document atomically, processes which start at the same time never read half a file."""
+    try:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        fd, temporary_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(openapi_schema, f)
+        os.replace(temporary_path, path)
+    except OSError:
+        # the document is only cached for the next start, serving it does not depend on the file
+        logger.warning("Could not cache the OpenAPI document in %s", path, exc_info=True)
+
+
+def cached_openapi(app: FastAPI) -> dict:
+    """
+    Replaces `app.openapi`: the document is built on the first request of /openapi.json or the docs instead of at
+    import. It is read from the cache file of this version if an earlier process wrote one, the version has to be
+    increased whenever the API changes.
+    """
+    if app.openapi_schema is None:
+        path = openapi_cache_path()
+        openapi_schema = read_cached_openapi(path) if path is not None else None
+        if openapi_schema is None:
+            openapi_schema = build_openapi(app)
+            if path is not None:
+                write_cached_openapi(path, openapi_schema)
+        app.openapi_schema = openapi_schema
+    return app.openapi_schema
+
+
+def initialize():
+    app = FastAPI()
+    for router in routers:
+        app.include_router(router)
+    app.add_middleware(CompressionMiddleware, minimum_size=settings.taskpool_compression_min_size)
+    # added last to be the outermost middleware, the latency includes compressing the response
+    app.add_middleware(MetricsMiddleware)
+    # the database is opened before the hooks which read it
+    app.add_event_handler("startup", open_database)
+    app.add_event_handler("startup", load_audio_manifest)
+    app.add_event_handler("startup", start_database_watcher)
+    app.add_event_handler("shutdown", stop_database_watcher)
+    # the word search and the exercise index or sampler scan the exercise table, the first requests do not wait
+    app.add_event_handler("startup", start_background_build)
+    app.add_event_handler("shutdown", stop_background_build)
+    # after the watcher stopped, so that it does not swap in a database while it is closed
+    app.add_event_handler("shutdown", close_database)
+
+    app.openapi = lambda: cached_openapi(app)
 
     return app
 
@@ -57,4 +134,6 @@ def initialize():
 taskpool_app = initialize()
 
 if __name__ == "__main__":
+    import uvicorn
+
     uvicorn.run(taskpool_app, host="0.0.0.0", port=58000)
@@ -0,0 +1,208 @@
+import math
+import threading
+import time
+from bisect import bisect_left
+from functools import wraps
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple, TypeVar
+
+T = TypeVar("T")
+
+PROMETHEUS_MEDIA_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# seconds, from a lookup in the in-memory index to a slow scan of the database
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+ROW_BUCKETS = (0, 1, 5, 10, 50, 100, 500, 1000, 5000, 10000)
+
+Labels = Tuple[str, ...]
+
+
+def escape_label_value(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace("\"", "\\\"")
+
+
+def format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = ['{}="{}"'.format(name, escape_label_value(value)) for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Metric:
+    type = "untyped"
+
+    def __init__(self, name: str, description: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.description = description
+        self.label_names = tuple(label_names)
+        self._lock = threading.Lock()
+
+    def header(self) -> List[str]:
+        return ["# HELP {} {}".format(self.name, self.description), "# TYPE {} {}".format(self.name, self.type)]
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError()
+
+    def render(self) -> List[str]:
+        return self.header() + self.samples()
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def __init__(self, name: str, description: str, label_names: Sequence[str] = ()):
+        super().__init__(name, description, label_names)
+        self._values: Dict[Labels, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = list(self._values.items())
+        return ["{}{} {}".format(self.name, format_labels(self.label_names, labels), format_value(value))
+                for labels, value in values]
+
+
+class Gauge(Counter):
+    type = "gauge"
+
+    def dec(self, *labels: str, amount: float = 1):
+        self.inc(*labels, amount=-amount)
+
+    def set(self, value: float, *labels: str):
+        with self._lock:
+            self._values[labels] = value
+
+
+class HistogramValues:
+    """Bucket counts of one label combination. Counts are per bucket, they are only summed up when rendered."""
+
+    def __init__(self, buckets: Sequence[float]):
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, description: str, label_names: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, description, label_names)
+        self.buckets = tuple(sorted(buckets))
+        self._values: Dict[Labels, HistogramValues] = {}
+
+    def observe(self, value: float, *labels: str):
+        # bisect_left, an observation equal to an upper bound belongs into that bucket
+        bucket = bisect_left(self.buckets, value)
+        with self._lock:
+            values = self._values.get(labels)
+            if values is None:
+                values = self._values[labels] = HistogramValues(self.buckets)
+            values.counts[bucket] += 1
+            values.sum += value
+            values.count += 1
+
+    def count(self, *labels: str) -> int:
+        values = self._values.get(labels)
+        return values.count if values is not None else 0
+
+    def samples(self) -> List[str]:
+        lines = []
+        with self._lock:
+            snapshot = [(labels, list(values.counts), values.sum, values.count)
+                        for labels, values in self._values.items()]
+        for labels, counts, total, count in snapshot:
+            cumulative = 0
+            for upper_bound, bucket_count in zip(self.buckets + (math.inf,), counts):
+                cumulative += bucket_count
+                lines.append("{}_bucket{} {}".format(
+                    self.name, format_labels(self.label_names, labels, 'le="{}"'.format(format_value(upper_bound))),
+                    cumulative))
+            lines.append("{}_sum{} {}".format(self.name, format_labels(self.label_names, labels), format_value(total)))
+            lines.append("{}_count{} {}".format(self.name, format_labels(self.label_names, labels), count))
+        return lines
+
+    def time(self, *labels: str) -> Callable[[Callable[..., T]], Callable[..., T]]:
+        """Decorator which observes the duration of every call of the decorated function."""
+
+        def decorator(fn: Callable[..., T]) -> Callable[..., T]:
+            @wraps(fn)
+            def timed(*args, **kwargs) -> T:
+                started = time.perf_counter()
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    self.observe(time.perf_counter() - started, *labels)
+
+            return timed
+
+        return decorator
+
+
+class CallbackMetric(Metric):
+    """Metric whose samples are read from another component, e.g. the connection pool, when it is scraped."""
+
+    def __init__(self, name: str, description: str, type: str, label_names: Sequence[str],
+                 callback: Callable[[], Iterable[Tuple[Labels, float]]]):
+        super().__init__(name, description, label_names)
+        self.type = type
+        self.callback = callback
+
+    def samples(self) -> List[str]:
+        return ["{}{} {}".format(self.name, format_labels(self.label_names, labels), format_value(value))
+                for labels, value in self.callback()]
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        if metric.name in self._metrics:
+            raise ValueError("A metric named {} is already registered".format(metric.name))
+        self._metrics[metric.name] = metric
+        return metric
+
+    def get(self, name: str) -> Optional[Metric]:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format."""
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+
+def counter(name: str, description: str, label_names: Sequence[str] = ()) -> Counter:
+    return registry.register(Counter(name, description, label_names))
+
+
+def gauge(name: str, description: str, label_names: Sequence[str] = ()) -> Gauge:
+    return registry.register(Gauge(name, description, label_names))
+
+
+def histogram(name: str, description: str, label_names: Sequence[str] = (),
+              buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+    return registry.register(Histogram(name, description, label_names, buckets))
+
+
+def callback_metric(name: str, description: str, type: str, label_names: Sequence[str],
+                    callback: Callable[[], Iterable[Tuple[Labels, float]]]) -> CallbackMetric:
+    return registry.register(CallbackMetric(name, description, type, label_names, callback))
@@ -0,0 +1,153 @@
+import time
+from typing import Dict, Optional
+from urllib.parse import parse_qsl
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from compression import StreamCompressor, compress, encoded_etag, is_compressible, negotiate_encoding
+from metrics import counter, gauge, histogram
+from models.api_models import ExerciseType
+
+request_duration = histogram("taskpool_http_request_duration_seconds",
+                             "Time from receiving a request until its response body was sent.",
+                             ("method", "route", "status", "exercise_type"))
+requests_in_flight = gauge("taskpool_http_requests_in_flight", "Requests which are currently being served.")
+requests_in_flight.set(0)
+
+compressed_bytes = counter("taskpool_http_compressed_bytes_total",
+                           "Response body bytes compressed on the fly, before and after compression.",
+                           ("encoding", "stage"))
+
+EXERCISE_TYPES = frozenset(exercise_type.value for exercise_type in ExerciseType)
+# label of requests which did not match any route, so that unknown paths do not create new series
+UNMATCHED_ROUTE = "unmatched"
+
+
+class MetricsMiddleware:
+    """
+    Observes the latency of every request by route template and requested exerciseType. A plain ASGI middleware, so
+    that streamed responses are neither buffered nor cut short and the overhead stays at a few microseconds.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self._route_paths: Dict[object, str] = {}
+
+    def route_path(self, scope: Scope) -> str:
+        # the router stores the endpoint of the matching route in the scope
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return UNMATCHED_ROUTE
+        if endpoint not in self._route_paths:
+            for route in scope["app"].routes:
+                if getattr(route, "endpoint", None) is not None:
+                    self._route_paths[route.endpoint] = route.path
+        return self._route_paths.get(endpoint, UNMATCHED_ROUTE)
+
+    @staticmethod
+    def exercise_type(scope: Scope) -> str:
+        query_string = scope.get("query_string", b"")
+        if b"exerciseType" not in query_string:
+            return ""
+        exercise_type = dict(parse_qsl(query_string.decode("latin-1"))).get("exerciseType", "")
+        return exercise_type if exercise_type in EXERCISE_TYPES else ""
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_with_status(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        requests_in_flight.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            requests_in_flight.dec()
+            request_duration.observe(time.perf_counter() - started, scope["method"], self.route_path(scope),
+                                     str(status_code), self.exercise_type(scope))
+
+
+class CompressionMiddleware:
+    """
+    Compresses response bodies with the coding negotiated from Accept-Encoding. Bodies sent in a single message are
+    compressed if they have at least `minimum_size` bytes, streamed bodies chunk by chunk. Responses which already have
+    a Content-Encoding, e.g. from a response cache which stores them compressed, are passed through.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = 1024):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["method"] == "HEAD":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding"))
+        start: Optional[Message] = None
+        compressor: Optional[StreamCompressor] = None
+        passthrough = False
+
+        async def send_compressed(message: Message):
+            nonlocal start, compressor, passthrough
+            if passthrough:
+                await send(message)
+            elif message["type"] == "http.response.start":
+                # sent with the first part of the body, once it is known whether the body is compressed
+                start = message
+            elif compressor is not None:
+                await send_chunk(message)
+            else:
+                await send_first(message)
+
+        async def send_first(message: Message):
+            nonlocal compressor, passthrough
+            headers = MutableHeaders(scope=start)
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            compressible = start["status"] == 200 and "content-encoding" not in headers \
+                and is_compressible(headers.get("content-type", ""))
+            if compressible:
+                # caches must not hand out a compressed response to clients which did not ask for it, or vice versa
+                headers.add_vary_header("Accept-Encoding")
+            if not compressible or encoding is None or (not more_body and len(body) < self.minimum_size):
+                passthrough = True
+                await send(start)
+                await send(message)
+                return
+
+            headers["Content-Encoding"] = encoding
+            if "etag" in headers:
+                headers["ETag"] = encoded_etag(headers["etag"], encoding)
+            if more_body:
+                # the length of the streamed body is not known in advance
+                del headers["Content-Length"]
+                compressor = StreamCompressor(encoding)
+                await send(start)
+                await send_chunk(message)
+                return
+            compressed = compress(body, encoding)
+            headers["Content-Length"] = str(len(compressed))
+            compressed_bytes.inc(encoding, "in", amount=len(body))
+            compressed_bytes.inc(encoding, "out", amount=len(compressed))
+            await send(start)
+            await send({"type": "http.response.body", "body": compressed})
+
+        async def send_chunk(message: Message):
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            chunk = compressor.compress(body)
+            if not more_body:
+                chunk += compressor.finish()
+            compressed_bytes.inc(encoding, "in", amount=len(body))
+            compressed_bytes.inc(encoding, "out", amount=len(chunk))
+            await send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
+        await self.app(scope, receive, send_compressed)
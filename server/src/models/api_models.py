@@ -1,9 +1,9 @@
 import random
-import re
 from enum import Enum
-from typing import List, Optional, Callable, Dict
+from typing import List, Optional, Callable, Container, Dict
 from pydantic import BaseModel, Field
-from models.internal_models import TranslationPair, InternalExercise, InternalTranslationPair, Language
+from models.internal_models import TranslationPair, InternalExercise, InternalTranslationPair, Language, Segments
+from settings import settings
 
 
 class HealthStatus(BaseModel):
@@ -11,6 +11,35 @@ class HealthStatus(BaseModel):
     status: str
 
 
+class DatabasePoolStatus(BaseModel):
+    size: int = Field(description="Number of connections in the pool.")
+    idle: int = Field(description="Number of connections currently not in use.")
+    inUse: int = Field(description="Number of connections currently running a query.")
+    acquisitions: int = Field(description="Number of times a connection was taken from the pool.")
+    waits: int = Field(description="Number of acquisitions which had to wait for a free connection.")
+    waitSecondsTotal: float = Field(description="Total time spent waiting for a free connection.")
+    waitSecondsMax: float = Field(description="Longest time spent waiting for a free connection.")
+    dataVersion: int = Field(description="Version of the exercise data, increased by every import which changes the "
+                                         "exercises. 0 for databases without a data version.")
+
+
+class ResponseCacheStatus(BaseModel):
+    name: str = Field(description="Name of the cache, e.g. the endpoint whose responses it holds.")
+    entries: int = Field(description="Number of cached responses.")
+    bytes: int = Field(description="Size of the cached responses.")
+    maxBytes: int = Field(description="Size up to which responses are cached.")
+    hits: int = Field(description="Lookups which were answered from the cache.")
+    misses: int = Field(description="Lookups which computed the response.")
+    coalesced: int = Field(description="Lookups which waited for the response another lookup was computing.")
+    evictions: int = Field(description="Responses removed to make room for others.")
+    expirations: int = Field(description="Responses removed because they were older than the time to live.")
+
+
+class DatabaseReloadStatus(BaseModel):
+    dataVersion: int = Field(description="Version of the exercise data of the database which was swapped in.")
+    seconds: float = Field(description="Time spent opening and warming up the database.")
+
+
 def translation_pair_to_internal_translation_pair(pair: TranslationPair) -> InternalTranslationPair:
     match pair:
         case TranslationPair.UK_DE:
@@ -105,7 +134,16 @@ class EssayBit(BaseModel):
     type: str = "essay"
     sampleSolution: str = Field(description="The sample solution - i.e. the sentence in the target language.")
     answer: Answer = Field(description="The object holding the learners input. Needed for the feedback engine.")
-    resource: Resource = Field(description="The object holding information about the audio file.")
+    resource: Optional[Resource] = Field(
+        description="The object holding information about the audio file. Not set if there is no audio for the "
+                    "target sentence.")
+
+    def dict(self, **kwargs) -> dict:
+        # the key is left out instead of being null when there is no audio
+        result = super().dict(**kwargs)
+        if result.get("resource") is None:
+            result.pop("resource", None)
+        return result
 
 
 class ClozeBitType(str, Enum):
@@ -191,6 +229,28 @@ class Exercise(BaseModel):
     bitmark: BitMark = Field(description="The object holding the bitmark quizzes.")
 
 
+class ExerciseBatchRequest(BaseModel):
+    translationPair: TranslationPair = Field(
+        description='The left side is the source language and the right side the target language to be learned. For '
+                    'example the pair "uk->de" should be used for learning German for Ukrainians.')
+    words: List[str] = Field(
+        min_items=1,
+        max_items=100,
+        description='The target words for which to return exercises. The words are expected to be in the target '
+                    'language to be learned.')
+    exerciseType: ExerciseType = Field(
+        default=ExerciseType.BITMARK_ESSAY,
+        description='Specifies what type of exercise should be returned.')
+    seed: Optional[int] = Field(
+        default=None,
+        description='Orders the choices of multiple choice exercises reproducibly.')
+
+
+class WordExercises(BaseModel):
+    word: str = Field(description="The target word of the exercises.")
+    exercises: List[Exercise] = Field(description="The exercises for the target word.")
+
+
 def create_instruction(exerciseType: ExerciseType, source_sentence_text: str, language: Language) -> str:
     if exerciseType == ExerciseType.ALL:
         raise ValueError("ExerciseType.ALL is not a valid type to create an instruction. Use a specific type when "
@@ -217,9 +277,19 @@ def create_instruction(exerciseType: ExerciseType, source_sentence_text: str, la
     return instruction_map[exerciseType][language].format(source_sentence_text)
 
 
-def create_bitmark_essay(exercise: InternalExercise, exerciseType: ExerciseType, base_url: str) -> Optional[EssayBit]:
+def create_audio_src(exercise: InternalExercise, base_url: str, audio_clips: Container[str]) -> Optional[str]:
+    """The URL of the audio of the target sentence, None if `audio_clips` has no clip for it."""
+    name = "{}-{}.mp3".format(exercise.target_sentence_language.upper(), exercise.target_sentence_id)
+    if name not in audio_clips:
+        return None
+    return "{}{}{}".format(base_url, "audio/", name)
+
+
+def create_bitmark_essay(exercise: InternalExercise, exerciseType: ExerciseType, base_url: str,
+                        audio_clips: Container[str]) -> Optional[EssayBit]:
     if not (exerciseType == ExerciseType.BITMARK_ESSAY or exerciseType == ExerciseType.ALL):
         return None
+    audio_src = create_audio_src(exercise, base_url, audio_clips)
     return EssayBit(
         format="text",
         meta=Meta(
@@ -242,36 +312,37 @@ def create_bitmark_essay(exercise: InternalExercise, exerciseType: ExerciseType,
         },
         resource=Resource(
             audio=Audio(
-                src="{}{}{}-{}.mp3".format(base_url, "audio/", exercise.target_sentence_language.upper(),
-                                           exercise.target_sentence_id)
+                src=audio_src
             )
-        )
+        ) if audio_src is not None else None
     )
 
 
-def get_parts(exercise: InternalExercise) -> List[str]:
-    # split only if target word is not inside a word
-    # target word = "target", sentence="targeting the target?" -> "targeting the ", "target", "?"
-    return re.split(r'(?:^|)({})(|$|[,.;:"\'%?!])'.format(exercise.target_word), exercise.target_sentence_text)
-
-
 def build_body(
-        parts: List[str],
-        target_word: str,
+        segments: Segments,
         text_builder: Callable[[str], any],
         gap_builder: Callable[[str], any]
 ) -> List[any]:
-    gaps = []
+    return [gap_builder(text) if is_gap else text_builder(text) for text, is_gap in segments]
+
+
+def has_random_choices(exerciseType: ExerciseType, seed: Optional[int] = None) -> bool:
+    """Whether rendering exercises of this type shuffles choices differently on every request."""
+    if seed is not None or settings.taskpool_deterministic_choices:
+        return False
+    return exerciseType == ExerciseType.BITMARK_MULTIPLE_CHOICE_TEXT or exerciseType == ExerciseType.ALL
 
-    for part in parts:
-        if part.strip() == '':
-            continue
-        elif part == target_word:
-            gaps.append(gap_builder(part))
-        else:
-            gaps.append(text_builder(part))
 
-    return gaps
+def shuffle_choices(choices: List, exercise_id: str, seed: Optional[int] = None):
+    """
+    Shuffles the choices of a multiple choice exercise in place. Unless `has_random_choices`, the order only depends
+    on the exercise id and the seed.
+    """
+    if seed is None and not settings.taskpool_deterministic_choices:
+        random.shuffle(choices)
+        return
+    # string seeds are hashed with SHA-512, so the order is the same in every process
+    random.Random("{}:{}".format(exercise_id, "" if seed is None else seed)).shuffle(choices)
 
 
 def create_bitmark_cloze(exercise: InternalExercise, exerciseType: ExerciseType):
@@ -279,8 +350,7 @@ def create_bitmark_cloze(exercise: InternalExercise, exerciseType: ExerciseType)
         return None
 
     gaps = build_body(
-        parts=get_parts(exercise),
-        target_word=exercise.target_word,
+        segments=exercise.segments,
         text_builder=lambda x: ClozeBitBodyElementText(text=x),
         gap_builder=lambda x: ClozeBitBodyElementGap(solutions=[x], answer=Answer())
     )
@@ -307,7 +377,8 @@ def create_bitmark_cloze(exercise: InternalExercise, exerciseType: ExerciseType)
 
 def create_bitmark_multiple_choice(
         exercise: InternalExercise,
-        exerciseType: ExerciseType
+        exerciseType: ExerciseType,
+        seed: Optional[int] = None
 ) -> Optional[MultipleChoiceTextBit]:
     if not (exerciseType == ExerciseType.BITMARK_MULTIPLE_CHOICE_TEXT or exerciseType == ExerciseType.ALL):
         return None
@@ -328,11 +399,10 @@ def create_bitmark_multiple_choice(
             isSelected=False
         )
     )
-    random.shuffle(choices)
+    shuffle_choices(choices, exercise.id, seed)
 
     gaps = build_body(
-        parts=get_parts(exercise),
-        target_word=exercise.target_word,
+        segments=exercise.segments,
         text_builder=lambda x: MultipleChoiceTextBodyElementText(text=x),
         gap_builder=lambda x: MultipleChoiceTextBodyElementChoices(choices=choices)
     )
@@ -357,7 +427,8 @@ def create_bitmark_multiple_choice(
     )
 
 
-def internal_exercise_to_exercise(exercise: InternalExercise, exerciseType: ExerciseType, base_url: str) -> Exercise:
+def internal_exercise_to_exercise(exercise: InternalExercise, exerciseType: ExerciseType, base_url: str,
+                                  audio_clips: Container[str], seed: Optional[int] = None) -> Exercise:
     return Exercise(
         sourceSentence=SourceSentence(
             text=exercise.source_sentence_text
@@ -368,8 +439,9 @@ def internal_exercise_to_exercise(exercise: InternalExercise, exerciseType: Exer
             text=exercise.target_sentence_text
         ),
         bitmark=BitMark(
-            essay=create_bitmark_essay(exercise=exercise, exerciseType=exerciseType, base_url=base_url),
+            essay=create_bitmark_essay(exercise=exercise, exerciseType=exerciseType, base_url=base_url,
+                                      audio_clips=audio_clips),
             cloze=create_bitmark_cloze(exercise=exercise, exerciseType=exerciseType),
-            multipleChoiceText=create_bitmark_multiple_choice(exercise=exercise, exerciseType=exerciseType)
+            multipleChoiceText=create_bitmark_multiple_choice(exercise=exercise, exerciseType=exerciseType, seed=seed)
         )
     )
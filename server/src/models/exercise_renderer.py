@@ -0,0 +1,153 @@
+"""
+Renders exercises as plain dicts, without building the pydantic models of `api_models`.
+
+The output is the same as `jsonable_encoder(internal_exercise_to_exercise(...))`, the pydantic models remain the
+contract of the API and are used for the OpenAPI specification only. Keys have to be kept in the order of the fields
+of the corresponding models.
+"""
+
+import time
+from functools import wraps
+from typing import Callable, Container, Optional
+from metrics import histogram
+from models.api_models import ExerciseType, build_body, create_instruction, create_audio_src, shuffle_choices
+from models.internal_models import InternalExercise
+
+bit_build_duration = histogram("taskpool_bit_build_duration_seconds", "Time spent building a bit of an exercise.",
+                               ("bit_type",))
+
+
+def timed_bit(bit_type: str) -> Callable[[Callable[..., Optional[dict]]], Callable[..., Optional[dict]]]:
+    """Observes the time spent building bits of the given type. Bits which are not requested are not counted."""
+
+    def decorator(render: Callable[..., Optional[dict]]) -> Callable[..., Optional[dict]]:
+        @wraps(render)
+        def timed(*args, **kwargs) -> Optional[dict]:
+            started = time.perf_counter()
+            bit = render(*args, **kwargs)
+            if bit is not None:
+                bit_build_duration.observe(time.perf_counter() - started, bit_type)
+            return bit
+
+        return timed
+
+    return decorator
+
+
+def render_meta(exercise: InternalExercise) -> dict:
+    return {
+        "language": exercise.source_sentence_language,
+        "learningLanguage": exercise.target_sentence_language,
+        "subject": exercise.target_word
+    }
+
+
+def render_feedback_engine(exercise: InternalExercise, bit_type: str) -> dict:
+    return {
+        "feedbackId": exercise.id + "-" + bit_type,
+        "userId": "",
+        "timeOnTask": 0
+    }
+
+
+@timed_bit("essay")
+def render_bitmark_essay(exercise: InternalExercise, exerciseType: ExerciseType, base_url: str,
+                         audio_clips: Container[str]) -> Optional[dict]:
+    if not (exerciseType == ExerciseType.BITMARK_ESSAY or exerciseType == ExerciseType.ALL):
+        return None
+    essay = {
+        "format": "text",
+        "meta": render_meta(exercise),
+        "feedbackEngine": render_feedback_engine(exercise, "essay"),
+        "instruction": create_instruction(
+            exerciseType=ExerciseType.BITMARK_ESSAY,
+            source_sentence_text=exercise.source_sentence_text,
+            language=exercise.source_sentence_language
+        ),
+        "type": "essay",
+        "sampleSolution": exercise.target_sentence_text,
+        "answer": {
+            "text": ""
+        }
+    }
+    audio_src = create_audio_src(exercise, base_url, audio_clips)
+    if audio_src is not None:
+        essay["resource"] = {
+            "type": "audio",
+            "audio": {
+                "format": "mp3",
+                "src": audio_src
+            }
+        }
+    return essay
+
+
+@timed_bit("cloze")
+def render_bitmark_cloze(exercise: InternalExercise, exerciseType: ExerciseType) -> Optional[dict]:
+    if not (exerciseType == ExerciseType.BITMARK_CLOZE or exerciseType == ExerciseType.ALL):
+        return None
+    return {
+        "format": "text",
+        "meta": render_meta(exercise),
+        "feedbackEngine": render_feedback_engine(exercise, "cloze"),
+        "instruction": create_instruction(
+            exerciseType=ExerciseType.BITMARK_CLOZE,
+            source_sentence_text=exercise.source_sentence_text,
+            language=exercise.source_sentence_language
+        ),
+        "type": "cloze",
+        "body": build_body(
+            segments=exercise.segments,
+            text_builder=lambda x: {"type": "text", "text": x},
+            gap_builder=lambda x: {"type": "gap", "solutions": [x], "answer": {"text": ""}}
+        )
+    }
+
+
+@timed_bit("multiple-choice-text")
+def render_bitmark_multiple_choice(exercise: InternalExercise, exerciseType: ExerciseType,
+                                   seed: Optional[int] = None) -> Optional[dict]:
+    if not (exerciseType == ExerciseType.BITMARK_MULTIPLE_CHOICE_TEXT or exerciseType == ExerciseType.ALL):
+        return None
+
+    choices = [{"choice": word, "isCorrect": False, "isSelected": False} for word in exercise.similar_words]
+    choices.append({"choice": exercise.target_word, "isCorrect": True, "isSelected": False})
+    shuffle_choices(choices, exercise.id, seed)
+
+    return {
+        "format": "text",
+        "meta": render_meta(exercise),
+        "feedbackEngine": render_feedback_engine(exercise, "multiple-choice-text"),
+        "instruction": create_instruction(
+            exerciseType=ExerciseType.BITMARK_MULTIPLE_CHOICE_TEXT,
+            source_sentence_text=exercise.source_sentence_text,
+            language=exercise.source_sentence_language
+        ),
+        "type": "multiple-choice-text",
+        "body": build_body(
+            segments=exercise.segments,
+            text_builder=lambda x: {"type": "text", "text": x},
+            gap_builder=lambda x: {"type": "choices", "choices": choices}
+        )
+    }
+
+
+def render_exercise(exercise: InternalExercise, exerciseType: ExerciseType, base_url: str,
+                    audio_clips: Container[str], seed: Optional[int] = None) -> dict:
+    return {
+        "sourceSentence": {
+            "text": exercise.source_sentence_text
+        },
+        "targetSentence": {
+            "word": exercise.target_word,
+            "similarWords": exercise.similar_words,
+            "text": exercise.target_sentence_text
+        },
+        "bitmark": {
+            "essay": render_bitmark_essay(exercise=exercise, exerciseType=exerciseType, base_url=base_url,
+                                          audio_clips=audio_clips),
+            "cloze": render_bitmark_cloze(exercise=exercise, exerciseType=exerciseType),
+            "multipleChoiceText": render_bitmark_multiple_choice(exercise=exercise, exerciseType=exerciseType,
+                                                                 seed=seed)
+        }
+    }
@@ -1,6 +1,8 @@
 from enum import Enum
-from typing import List
+from functools import cached_property, lru_cache
+from typing import List, Tuple
 import json
+import re
 
 
 class TranslationPair(str, Enum):
@@ -20,6 +22,22 @@ class InternalTranslationPair:
         self.target_language = target_language
 
 
+# (text, is_gap) pairs of a target sentence
+Segments = Tuple[Tuple[str, bool], ...]
+
+
+@lru_cache(maxsize=16384)
+def segment_sentence(sentence: str, target_word: str) -> Segments:
+    """
+    Splits the sentence at every occurrence of the target word. The occurrences are the gaps of cloze and
+    multiple-choice exercises, whitespace-only text between them is dropped.
+    target word = "stark", sentence = "Es regnet sehr stark." -> ("Es regnet sehr ", False), ("stark", True), (".", False)
+    """
+    parts = re.split("({})".format(re.escape(target_word)), sentence)
+    # the captured occurrences are at the odd positions
+    return tuple((part, i % 2 == 1) for i, part in enumerate(parts) if part.strip() != '')
+
+
 class InternalExercise:
     def __init__(self, id: str, translation_id: int, target_word: str, similar_words: List[str],
                  source_sentence_id: int,
@@ -39,6 +57,10 @@ class InternalExercise:
         self.target_sentence_text = target_sentence_text
         self.target_sentence_language = target_sentence_language
 
+    @cached_property
+    def segments(self) -> Segments:
+        return segment_sentence(self.target_sentence_text, self.target_word)
+
 
 def tuple_to_internal_exercise(row: tuple) -> InternalExercise:
     return InternalExercise(
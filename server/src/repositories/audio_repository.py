@@ -0,0 +1,129 @@
+import hashlib
+import json
+import mmap
+import os
+import struct
+from typing import Dict, Optional, Union
+from settings import settings
+
+AUDIO_EXTENSION = ".mp3"
+BUNDLE_FORMAT_VERSION = 2
+BUNDLE_MAGIC = b"TPAUDIO2"
+# the length of the index and the magic bytes at the end of a bundle
+BUNDLE_TRAILER = struct.Struct("<Q8s")
+
+
+class AudioClip:
+    def __init__(self, name: str, path: str, size: int, content_hash: str, offset: int = 0):
+        self.name = name
+        self.path = path
+        self.size = size
+        self.content_hash = content_hash
+        # position of the clip inside an audio bundle, 0 for clips stored in their own file
+        self.offset = offset
+
+    @property
+    def etag(self) -> str:
+        # strong validator, the hash changes with every byte of the clip
+        return '"{}"'.format(self.content_hash)
+
+
+class AudioManifest:
+    """
+    The audio clips available to the server, with their sizes and content hashes.
+
+    Built once at startup, so that serving a clip needs no stat() and exercises can leave out audio which does not
+    exist. Clips are either files of a directory or slices of a memory-mapped bundle written by
+    `scripts/pack_audio.py`.
+    """
+
+    def __init__(self, clips: Dict[str, AudioClip], bundle: Optional[mmap.mmap] = None):
+        self._clips = clips
+        self._bundle = bundle
+        self._fingerprint: Optional[str] = None
+
+    def get(self, name: str) -> Optional[AudioClip]:
+        return self._clips.get(name)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._clips
+
+    def __len__(self) -> int:
+        return len(self._clips)
+
+    @property
+    def is_bundled(self) -> bool:
+        return self._bundle is not None
+
+    @property
+    def fingerprint(self) -> str:
+        """Changes whenever clips are added or removed, which changes the audio sources of rendered exercises."""
+        if self._fingerprint is None:
+            self._fingerprint = hashlib.md5("\n".join(sorted(self._clips)).encode("utf-8")).hexdigest()
+        return self._fingerprint
+
+    def read(self, clip: AudioClip, start: int, length: int) -> Union[bytes, memoryview]:
+        """
+        Reads `length` bytes of the clip starting at `start`. Slices of a bundle are views of the mapped file, they
+        neither copy nor block on a system call.
+        """
+        if self._bundle is not None:
+            offset = clip.offset + start
+            return memoryview(self._bundle)[offset:offset + length]
+        with open(clip.path, "rb") as f:
+            f.seek(start)
+            return f.read(length)
+
+    @staticmethod
+    def from_directory(directory: str) -> "AudioManifest":
+        clips = {}
+        if os.path.isdir(directory):
+            for entry in os.scandir(directory):
+                if not entry.is_file() or not entry.name.endswith(AUDIO_EXTENSION):
+                    continue
+                with open(entry.path, "rb") as f:
+                    content_hash = hashlib.md5(f.read()).hexdigest()
+                clips[entry.name] = AudioClip(entry.name, entry.path, entry.stat().st_size, content_hash)
+        return AudioManifest(clips)
+
+    @staticmethod
+    def from_bundle(path: str) -> "AudioManifest":
+        """Maps a bundle written by `scripts/pack_audio.py`, whose index is stored at its end."""
+        with open(path, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            file_size = f.tell()
+            if file_size < BUNDLE_TRAILER.size:
+                raise ValueError("{} is not an audio bundle".format(path))
+            f.seek(file_size - BUNDLE_TRAILER.size)
+            index_size, magic = BUNDLE_TRAILER.unpack(f.read(BUNDLE_TRAILER.size))
+            if magic != BUNDLE_MAGIC:
+                raise ValueError("{} is not an audio bundle".format(path))
+            f.seek(file_size - BUNDLE_TRAILER.size - index_size)
+            index = json.loads(f.read(index_size))
+            if index["version"] != BUNDLE_FORMAT_VERSION:
+                raise ValueError("Unsupported audio bundle version {} of {}".format(index["version"], path))
+            if file_size - BUNDLE_TRAILER.size - index_size != index["size"]:
+                raise ValueError("The audio bundle {} does not match its index".format(path))
+            clips = {name: AudioClip(name, path, size, content_hash, offset)
+                     for name, (offset, size, content_hash) in index["clips"].items()}
+            # the mapping stays valid after the file is closed
+            bundle = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return AudioManifest(clips, bundle)
+
+
+audio_manifest: Optional[AudioManifest] = None
+
+
+def load_audio_manifest() -> AudioManifest:
+    global audio_manifest
+    if settings.taskpool_audio_bundle is not None:
+        audio_manifest = AudioManifest.from_bundle(settings.taskpool_audio_bundle)
+    else:
+        audio_manifest = AudioManifest.from_directory(settings.taskpool_audio_directory)
+    return audio_manifest
+
+
+def get_audio_manifest() -> AudioManifest:
+    if audio_manifest is None:
+        return load_audio_manifest()
+    return audio_manifest
@@ -0,0 +1,137 @@
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterator, List, TypeVar
+from urllib.request import pathname2url
+from starlette.concurrency import run_in_threadpool
+
+T = TypeVar("T")
+
+
+class PoolStats:
+    def __init__(self, size: int, idle: int, acquisitions: int, waits: int, wait_seconds_total: float,
+                 wait_seconds_max: float):
+        self.size = size
+        self.idle = idle
+        self.in_use = size - idle
+        self.acquisitions = acquisitions
+        self.waits = waits
+        self.wait_seconds_total = wait_seconds_total
+        self.wait_seconds_max = wait_seconds_max
+
+
+class PooledConnection(sqlite3.Connection):
+    """
+    Connection of a `ConnectionPool`, which knows its pool and the schema version (PRAGMA user_version) of its
+    database.
+    """
+    pool: "ConnectionPool"
+    schema_version: int = 0
+
+
+class PoolClosedError(RuntimeError):
+    """Raised when a connection is taken from a pool which is closed or being closed."""
+
+
+class ConnectionPool:
+    """
+    Fixed size pool of read-only SQLite connections.
+
+    Queries are run in the threadpool through `run`, so that they do not block the event loop. Every connection is
+    used by a single thread at a time, hence `check_same_thread` can be disabled safely. Once `close` was called, no
+    connection can be taken anymore, also not by threads which were already waiting for one.
+    """
+
+    def __init__(self, path: str, size: int, immutable: bool = True, mmap_size: int = 0):
+        if size < 1:
+            raise ValueError("The connection pool needs at least one connection.")
+        self.path = path
+        self.size = size
+        self.immutable = immutable
+        self.mmap_size = mmap_size
+        self._idle: List[PooledConnection] = []
+        # guards the idle connections, the statistics and the closed flag
+        self._lock = threading.Condition()
+        self._in_use = 0
+        self._closed = False
+        self._acquisitions = 0
+        self._waits = 0
+        self._wait_seconds_total = 0.0
+        self._wait_seconds_max = 0.0
+        for _ in range(size):
+            self._idle.append(self._connect())
+
+    def _connect(self) -> PooledConnection:
+        uri = "file:{}?mode=ro".format(pathname2url(os.path.abspath(self.path)))
+        if self.immutable:
+            # the file is not changed while the server runs: skip locking and change detection
+            uri += "&immutable=1"
+        con = sqlite3.connect(uri, uri=True, check_same_thread=False, factory=PooledConnection)
+        con.execute("PRAGMA query_only = ON")
+        con.execute("PRAGMA mmap_size = {:d}".format(self.mmap_size))
+        con.schema_version = con.execute("PRAGMA user_version").fetchone()[0]
+        con.pool = self
+        return con
+
+    @contextmanager
+    def connection(self) -> Iterator[PooledConnection]:
+        """Takes an idle connection, waiting for one if all are in use. Raises `PoolClosedError` once closed."""
+        with self._lock:
+            waited = 0.0
+            if not self._idle and not self._closed:
+                started = time.perf_counter()
+                while not self._idle and not self._closed:
+                    self._lock.wait()
+                waited = time.perf_counter() - started
+            if self._closed:
+                raise PoolClosedError("The connection pool of {} is closed.".format(self.path))
+            con = self._idle.pop()
+            self._in_use += 1
+            self._acquisitions += 1
+            if waited > 0:
+                self._waits += 1
+                self._wait_seconds_total += waited
+                self._wait_seconds_max = max(self._wait_seconds_max, waited)
+
+        try:
+            yield con
+        finally:
+            with self._lock:
+                self._idle.append(con)
+                self._in_use -= 1
+                self._lock.notify_all()
+
+    def _run(self, fn: Callable[..., T], *args) -> T:
+        with self.connection() as con:
+            return fn(con, *args)
+
+    async def run(self, fn: Callable[..., T], *args) -> T:
+        """Runs `fn(connection, *args)` in the threadpool with a connection of this pool."""
+        return await run_in_threadpool(self._run, fn, *args)
+
+    def stats(self) -> PoolStats:
+        with self._lock:
+            return PoolStats(
+                size=self.size,
+                idle=len(self._idle),
+                acquisitions=self._acquisitions,
+                waits=self._waits,
+                wait_seconds_total=self._wait_seconds_total,
+                wait_seconds_max=self._wait_seconds_max
+            )
+
+    def close(self):
+        """
+        Closes the pool: threads waiting for a connection fail at once, connections in use are closed once they were
+        returned. Blocks until then.
+        """
+        with self._lock:
+            self._closed = True
+            self._lock.notify_all()
+            while self._in_use > 0:
+                self._lock.wait()
+            idle, self._idle = self._idle, []
+        for con in idle:
+            con.close()
@@ -0,0 +1,80 @@
+import asyncio
+import logging
+import os
+import signal
+from typing import Optional, Tuple
+from repositories.exercise_repository import swap_database
+from settings import settings
+
+logger = logging.getLogger(__name__)
+
+FileSignature = Tuple[int, int, int]
+
+watcher_task: Optional[asyncio.Task] = None
+
+
+def file_signature(path: str) -> Optional[FileSignature]:
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+
+async def reload_database() -> bool:
+    """Swaps in the database at the configured path, returns False if it could not be opened."""
+    try:
+        await swap_database()
+        logger.info("Swapped in the database %s", settings.taskpool_db_path)
+        return True
+    except Exception:
+        # the previous database keeps serving requests
+        logger.exception("Could not swap in the database %s", settings.taskpool_db_path)
+        return False
+
+
+async def watch_database(path: str, interval: float):
+    """
+    Swaps in the database whenever the file at `path` changes. A change is only acted upon once the file stayed the
+    same for a whole interval, so that a file which is still being copied is not opened.
+    """
+    current = file_signature(path)
+    pending = None
+    while True:
+        await asyncio.sleep(interval)
+        signature = file_signature(path)
+        if signature is None or signature == current:
+            pending = None
+            continue
+        if signature != pending:
+            pending = signature
+            continue
+        current, pending = signature, None
+        await reload_database()
+
+
+def reload_on_signal():
+    asyncio.ensure_future(reload_database())
+
+
+async def start_database_watcher():
+    global watcher_task
+    if settings.taskpool_db_watch_interval > 0:
+        watcher_task = asyncio.create_task(watch_database(settings.taskpool_db_path,
+                                                          settings.taskpool_db_watch_interval))
+    try:
+        asyncio.get_running_loop().add_signal_handler(signal.SIGHUP, reload_on_signal)
+    except (AttributeError, NotImplementedError, RuntimeError):
+        # no SIGHUP on Windows, and no signal handlers outside of the main thread
+        pass
+
+
+async def stop_database_watcher():
+    global watcher_task
+    if watcher_task is not None:
+        watcher_task.cancel()
+        watcher_task = None
+    try:
+        asyncio.get_running_loop().remove_signal_handler(signal.SIGHUP)
+    except (AttributeError, NotImplementedError, RuntimeError):
+        pass
@@ -0,0 +1,74 @@
+import random
+from bisect import bisect_right
+from typing import Dict, Iterable, List, Optional, Tuple
+from models.internal_models import InternalExercise, InternalTranslationPair
+
+
+def translation_pair_key(translation_pair: InternalTranslationPair) -> Tuple[str, str]:
+    # same representation as the sentences.language column
+    return translation_pair.source_language.name.upper(), translation_pair.target_language.name.upper()
+
+
+def page(items: List, start: int, limit: Optional[int]) -> List:
+    return items[start:] if limit is None else items[start:start + limit]
+
+
+def sample_positions(size: int, n: int, seed: Optional[int] = None) -> List[int]:
+    """
+    `n` distinct positions out of `size` in random order. The same seed draws the same positions from the same size,
+    the time taken only depends on `n`.
+    """
+    rng = random.Random(seed) if seed is not None else random
+    return rng.sample(range(size), min(n, size))
+
+
+class ExerciseIndex:
+    """
+    Read-only in-process copy of the exercise pool, keyed by translation pair and target word.
+
+    The pool rarely changes while the server runs, so the joined exercise rows are loaded once and served from memory
+    instead of querying SQLite on every request. The index is built again once the data version it was read at
+    changes. Words are kept in alphabetical order and the exercises of a word ordered by id, the same order as the
+    SQL queries of the repository use.
+    """
+
+    def __init__(self, exercises: Iterable[InternalExercise], data_version: int = 0):
+        self._exercises: Dict[Tuple[str, str], Dict[str, List[InternalExercise]]] = {}
+        for exercise in exercises:
+            # segment once, the exercise keeps the result
+            exercise.segments
+            key = (exercise.source_sentence_language.upper(), exercise.target_sentence_language.upper())
+            self._exercises.setdefault(key, {}).setdefault(exercise.target_word, []).append(exercise)
+
+        self._words: Dict[Tuple[str, str], List[str]] = {}
+        # all exercises of a translation pair ordered by id, in the order of the rowids of ExerciseSampler
+        self._by_id: Dict[Tuple[str, str], List[InternalExercise]] = {}
+        for key, exercises_by_word in self._exercises.items():
+            for word_exercises in exercises_by_word.values():
+                word_exercises.sort(key=lambda e: e.id)
+            self._words[key] = sorted(exercises_by_word)
+            self._by_id[key] = sorted((e for word_exercises in exercises_by_word.values() for e in word_exercises),
+                                      key=lambda e: e.id)
+        # the data version the exercises were read at
+        self.data_version = data_version
+
+    def get_exercises(self, translation_pair: InternalTranslationPair, word: str, limit: Optional[int] = None,
+                      after: Optional[str] = None) -> List[InternalExercise]:
+        exercises = self._exercises.get(translation_pair_key(translation_pair), {}).get(word, [])
+        start = 0 if after is None else bisect_right(exercises, after, key=lambda e: e.id)
+        return page(exercises, start, limit)
+
+    def get_words(self, translation_pair: InternalTranslationPair, limit: Optional[int] = None,
+                  after: Optional[str] = None) -> List[str]:
+        words = self._words.get(translation_pair_key(translation_pair), [])
+        start = 0 if after is None else bisect_right(words, after)
+        return page(words, start, limit)
+
+    def sample(self, translation_pair: InternalTranslationPair, n: int,
+               seed: Optional[int] = None) -> List[InternalExercise]:
+        """The same exercises as ExerciseSampler draws from the database for the same seed."""
+        exercises = self._by_id.get(translation_pair_key(translation_pair), [])
+        return [exercises[i] for i in sample_positions(len(exercises), n, seed)]
+
+    def __len__(self) -> int:
+        return sum(len(exercises) for words in self._exercises.values() for exercises in words.values())
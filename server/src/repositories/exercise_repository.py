@@ -1,18 +1,75 @@
+import asyncio
+import logging
 import sqlite3
-from itertools import starmap
-from typing import List
-from models.api_models import LearnableWord, tuple_to_learnable_word, Exercise, internal_exercise_to_exercise, \
-    ExerciseType
-from models.internal_models import TranslationPair, tuple_to_internal_exercise, InternalTranslationPair
+import threading
+import time
+from contextlib import contextmanager, ExitStack
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple, TypeVar
+from starlette.concurrency import run_in_threadpool
+from metrics import counter, histogram, callback_metric, Labels, ROW_BUCKETS
+from models.api_models import LearnableWord, tuple_to_learnable_word
+from models.internal_models import TranslationPair, tuple_to_internal_exercise, InternalTranslationPair, \
+    InternalExercise, segment_sentence
+from repositories.connection_pool import ConnectionPool, PooledConnection, PoolClosedError
+from repositories.exercise_index import ExerciseIndex
+from repositories.exercise_sampler import ExerciseSampler
+from repositories.word_search import WordSearchIndex
 from settings import settings
 
-con = sqlite3.connect(settings.taskpool_db_path, check_same_thread=False)
+logger = logging.getLogger(__name__)
 
+T = TypeVar("T")
 
-async def get_exercises_by_translation_pair_and_word(base_url: str, translation_pair: InternalTranslationPair,
-                                                     word: str, exerciseType: ExerciseType) -> List[Exercise]:
-    cursor = con.cursor()
-    results = cursor.execute("""
+
+def open_pool(path: str) -> ConnectionPool:
+    return ConnectionPool(
+        path,
+        size=settings.taskpool_db_pool_size,
+        immutable=settings.taskpool_db_immutable,
+        mmap_size=settings.taskpool_db_mmap_size
+    )
+
+
+# opened by the open_database startup hook, or on first use by get_pool
+pool: Optional[ConnectionPool] = None
+pool_lock = threading.Lock()
+
+exercise_index: Optional[ExerciseIndex] = None
+index_lock = threading.Lock()
+
+# rowids of the exercises by translation pair, to draw random exercises without the in-memory index
+exercise_sampler: Optional[ExerciseSampler] = None
+sampler_lock = threading.Lock()
+
+# prefix and typo tolerant search over the learnable words of /words
+word_search: Optional[WordSearchIndex] = None
+word_search_lock = threading.Lock()
+
+# builds the in-memory structures after startup, see start_background_build
+background_build: Optional[asyncio.Task] = None
+
+# the data version of an immutable database and the pool it was read from, see get_current_data_version
+data_version_cache: Optional[Tuple[ConnectionPool, int]] = None
+
+# called after the database was swapped, to drop everything which was derived from the previous one
+swap_callbacks: List[Callable[[], None]] = []
+swap_lock: Optional[asyncio.Lock] = None
+database_swaps = counter("taskpool_db_swaps_total", "Database files which were swapped in while the server runs.")
+# segmentations are keyed by content and stay correct, but would keep the sentences of the previous database alive
+swap_callbacks.append(segment_sentence.cache_clear)
+
+query_duration = histogram("taskpool_db_query_duration_seconds",
+                           "Time spent running a query and fetching its rows, by repository function.", ("function",))
+query_rows = histogram("taskpool_db_query_rows", "Rows returned per query, by repository function.", ("function",),
+                       buckets=ROW_BUCKETS)
+
+# rows fetched from SQLite per chunk of a streamed response
+stream_batch_size = 100
+
+# from this version on, exercises store the languages of their sentences, see schema.sql
+DENORMALISED_SCHEMA_VERSION = 1
+
+exercise_columns = """
     SELECT 
         e.id,
         e.translation_id,
@@ -23,32 +80,546 @@ async def get_exercises_by_translation_pair_and_word(base_url: str, translation_
         s1.text, 
         s1.language, 
         s2.text, 
-        s2.language
+        s2.language"""
+
+exercise_joins = """
     FROM exercise as e
     JOIN sentences s1 ON s1.id = e.source_sentence_id
     JOIN sentences s2 on s2.id = e.target_sentence_id
-    WHERE s1.language = :lang1 AND s2.language = :lang2 AND e.target_word = :word
-    """, {
+    """
+
+exercise_select = exercise_columns + exercise_joins
+
+
+def build_exercise_index(con: PooledConnection) -> ExerciseIndex:
+    data_version = query_data_version(con)
+    return ExerciseIndex(map(tuple_to_internal_exercise, con.execute(exercise_select)), data_version)
+
+
+def load_exercise_index() -> ExerciseIndex:
+    global exercise_index
+    with current_connection() as con:
+        index = build_exercise_index(con)
+    # a database swapped in meanwhile brought its own index
+    if pool is con.pool:
+        exercise_index = index
+    return index
+
+
+def build_exercise_sampler(con: PooledConnection, source: ConnectionPool) -> ExerciseSampler:
+    return ExerciseSampler(query_exercise_rowids(con), source, query_data_version(con))
+
+
+def load_exercise_sampler() -> ExerciseSampler:
+    global exercise_sampler
+    with current_connection() as con, sampler_lock:
+        sampler = build_exercise_sampler(con, con.pool)
+        if pool is con.pool:
+            exercise_sampler = sampler
+    return sampler
+
+
+def build_word_search(con: PooledConnection) -> WordSearchIndex:
+    data_version = query_data_version(con)
+    return WordSearchIndex(query_translation_pair_words(con), data_version)
+
+
+def load_word_search() -> WordSearchIndex:
+    global word_search
+    with current_connection() as con:
+        index = build_word_search(con)
+    if pool is con.pool:
+        word_search = index
+    return index
+
+
+def is_outdated(structure: Optional[object], data_version: Optional[int]) -> bool:
+    """Whether an in-memory structure is missing, or was built from other data than that of `data_version`."""
+    return structure is None or (data_version is not None and structure.data_version != data_version)
+
+
+def mutable_data_version() -> Optional[int]:
+    """
+    The data version of a database which may change while it is served, read in the calling thread. None if it is
+    immutable, its in-memory structures are then only replaced by a swap.
+    """
+    if settings.taskpool_db_immutable:
+        return None
+    return run_on_current_connection(query_data_version)
+
+
+def get_word_search(data_version: Optional[int] = None) -> WordSearchIndex:
+    """
+    The word search, built on first use and again once the data differs from `data_version`, e.g. after an
+    incremental import. Blocks while it is built, concurrent callers wait for the same build.
+    """
+    index = word_search
+    if is_outdated(index, data_version):
+        with word_search_lock:
+            index = word_search
+            if is_outdated(index, data_version):
+                index = load_word_search()
+    return index
+
+
+def get_exercise_index(data_version: Optional[int] = None) -> Optional[ExerciseIndex]:
+    """
+    The in-memory index if it is enabled, built on first use and again once the data differs from `data_version`.
+    While another thread builds it, None is returned and the caller queries SQLite, which serves the same exercises,
+    instead of waiting for the whole table to be read.
+    """
+    if not settings.taskpool_in_memory_index:
+        return None
+    index = exercise_index
+    if is_outdated(index, data_version):
+        if not index_lock.acquire(blocking=False):
+            return None
+        try:
+            index = exercise_index
+            if is_outdated(index, data_version):
+                index = load_exercise_index()
+        finally:
+            index_lock.release()
+    return index
+
+
+async def await_word_search() -> WordSearchIndex:
+    """Like get_word_search, but builds a missing or outdated word search in the threadpool."""
+    index = word_search
+    data_version = await get_current_data_version()
+    if is_outdated(index, data_version):
+        index = await run_in_threadpool(get_word_search, data_version)
+    return index
+
+
+async def await_exercise_index() -> Optional[ExerciseIndex]:
+    """Like get_exercise_index, but builds a missing or outdated index in the threadpool."""
+    if not settings.taskpool_in_memory_index:
+        return None
+    index = exercise_index
+    data_version = await get_current_data_version()
+    if not is_outdated(index, data_version):
+        return index
+    # the background build is about to build it or already does, SQLite serves the request meanwhile
+    if index_lock.locked() or (background_build is not None and not background_build.done()):
+        return None
+    return await run_in_threadpool(get_exercise_index, data_version)
+
+
+async def build_in_background():
+    """
+    Builds the word search and the in-memory index or the exercise sampler, so that the first requests which need
+    them do not have to. Searches which come earlier wait for the word search, exercises are read from SQLite until
+    the index is built.
+    """
+    try:
+        await await_word_search()
+        if settings.taskpool_in_memory_index:
+            await run_in_threadpool(get_exercise_index)
+        elif exercise_sampler is None:
+            await run_in_threadpool(load_exercise_sampler)
+    except Exception:
+        # the structures are built again on first use
+        logger.exception("Could not build the in-memory structures of the database")
+
+
+async def start_background_build():
+    """
+    Startup hook which builds the in-memory structures without delaying startup, they scan the whole exercise table.
+    """
+    global background_build
+    background_build = asyncio.create_task(build_in_background())
+
+
+async def stop_background_build():
+    global background_build
+    if background_build is not None:
+        # a build which already runs in the threadpool finishes, its connection is returned before the pool closes
+        background_build.cancel()
+        background_build = None
+
+
+def translation_pair_filter(con: PooledConnection) -> str:
+    if con.schema_version >= DENORMALISED_SCHEMA_VERSION:
+        return "e.source_language = :lang1 AND e.target_language = :lang2"
+    # databases which were not migrated yet
+    return "s1.language = :lang1 AND s2.language = :lang2"
+
+
+def query_exercises(con: PooledConnection, translation_pair: InternalTranslationPair, word: str,
+                    limit: Optional[int] = None, after: Optional[str] = None) -> sqlite3.Cursor:
+    return con.execute(exercise_select + """
+    WHERE {} AND e.target_word = :word {}
+    ORDER BY e.id
+    LIMIT :limit
+    """.format(translation_pair_filter(con), "AND e.id > :after" if after is not None else ""), {
+        "lang1": translation_pair.source_language.name.upper(),
+        "lang2": translation_pair.target_language.name.upper(),
+        "word": word,
+        "after": after,
+        "limit": -1 if limit is None else limit
+    })
+
+
+def query_exercises_for_words(con: PooledConnection, translation_pair: InternalTranslationPair,
+                              words: List[str]) -> sqlite3.Cursor:
+    params = {"word{}".format(i): word for i, word in enumerate(words)}
+    return con.execute(exercise_select + """
+    WHERE {} AND e.target_word IN ({})
+    """.format(translation_pair_filter(con), ", ".join(":" + name for name in params)), {
         "lang1": translation_pair.source_language.name.upper(),
         "lang2": translation_pair.target_language.name.upper(),
-        "word": word
-    }).fetchall()
-    cursor.close()
-    internal_exercises = list(map(tuple_to_internal_exercise, results))
-    return list(starmap(internal_exercise_to_exercise, map(lambda e: [e, exerciseType, base_url], internal_exercises)))
-
-
-async def get_learnable_words(translation_pair: InternalTranslationPair) -> List[LearnableWord]:
-    cursor = con.cursor()
-    results = cursor.execute("""
-        SELECT DISTINCT exercise.target_word
-        FROM exercise
-        JOIN sentences s1 ON s1.id = exercise.source_sentence_id
-        JOIN sentences s2 on s2.id = exercise.target_sentence_id
-        WHERE s1.language = :lang1 AND s2.language = :lang2
-        """, {
+        **params
+    })
+
+
+def query_learnable_words(con: PooledConnection, translation_pair: InternalTranslationPair,
+                          limit: Optional[int] = None, after: Optional[str] = None) -> sqlite3.Cursor:
+    if con.schema_version >= DENORMALISED_SCHEMA_VERSION:
+        # only reads idx_exercise_translation_pair_word
+        source = "exercise e"
+    else:
+        source = """exercise e
+        JOIN sentences s1 ON s1.id = e.source_sentence_id
+        JOIN sentences s2 on s2.id = e.target_sentence_id"""
+    return con.execute("""
+        SELECT DISTINCT e.target_word
+        FROM {}
+        WHERE {} {}
+        ORDER BY e.target_word
+        LIMIT :limit
+        """.format(source, translation_pair_filter(con), "AND e.target_word > :after" if after is not None else ""), {
         "lang1": translation_pair.source_language.name.upper(),
-        "lang2": translation_pair.target_language.name.upper()
-    }).fetchall()
-    cursor.close()
+        "lang2": translation_pair.target_language.name.upper(),
+        "after": after,
+        "limit": -1 if limit is None else limit
+    })
+
+
+def query_exercise_rowids(con: PooledConnection) -> sqlite3.Cursor:
+    if con.schema_version >= DENORMALISED_SCHEMA_VERSION:
+        return con.execute("SELECT e.source_language, e.target_language, e.rowid FROM exercise e ORDER BY e.id")
+    return con.execute("""
+    SELECT s1.language, s2.language, e.rowid
+    FROM exercise e
+    JOIN sentences s1 ON s1.id = e.source_sentence_id
+    JOIN sentences s2 on s2.id = e.target_sentence_id
+    ORDER BY e.id
+    """)
+
+
+def query_translation_pair_words(con: PooledConnection) -> sqlite3.Cursor:
+    if con.schema_version >= DENORMALISED_SCHEMA_VERSION:
+        return con.execute("SELECT DISTINCT e.source_language, e.target_language, e.target_word FROM exercise e")
+    return con.execute("""
+    SELECT DISTINCT s1.language, s2.language, e.target_word
+    FROM exercise e
+    JOIN sentences s1 ON s1.id = e.source_sentence_id
+    JOIN sentences s2 on s2.id = e.target_sentence_id
+    """)
+
+
+def query_exercises_by_rowids(con: PooledConnection, rowids: List[int]) -> sqlite3.Cursor:
+    # the rowid is appended to the columns of exercise_select to restore the order of `rowids`
+    return con.execute(exercise_columns + ", e.rowid" + exercise_joins + """
+    WHERE e.rowid IN ({})
+    """.format(", ".join("?" * len(rowids))), rowids)
+
+
+def pool_connections() -> Iterable[Tuple[Labels, float]]:
+    # a scrape does not open the database
+    if pool is None:
+        return []
+    stats = pool.stats()
+    return [(("idle",), stats.idle), (("in_use",), stats.in_use)]
+
+
+def pool_counters(name: str) -> Callable[[], Iterable[Tuple[Labels, float]]]:
+    return lambda: [((), getattr(pool.stats(), name))] if pool is not None else []
+
+
+callback_metric("taskpool_db_pool_connections", "Connections of the database pool by state.", "gauge", ("state",),
+                pool_connections)
+callback_metric("taskpool_db_pool_acquisitions_total", "Connections taken from the database pool.", "counter", (),
+                pool_counters("acquisitions"))
+callback_metric("taskpool_db_pool_waits_total", "Acquisitions which had to wait for a free connection.", "counter", (),
+                pool_counters("waits"))
+callback_metric("taskpool_db_pool_wait_seconds_total", "Time spent waiting for a free connection.", "counter", (),
+                pool_counters("wait_seconds_total"))
+
+
+def observe_query(query: Callable[..., sqlite3.Cursor], seconds: float, rows: int):
+    query_duration.observe(seconds, query.__name__)
+    query_rows.observe(rows, query.__name__)
+
+
+def query_data_version(con: PooledConnection) -> int:
+    try:
+        row = con.execute("SELECT version FROM data_version WHERE id = 1").fetchone()
+    except sqlite3.OperationalError:
+        # databases which were populated before the data_version table existed
+        return 0
+    return row[0] if row is not None else 0
+
+
+def fetch_all(con: PooledConnection, query: Callable[..., sqlite3.Cursor], *args) -> List[tuple]:
+    started = time.perf_counter()
+    rows = query(con, *args).fetchall()
+    observe_query(query, time.perf_counter() - started, len(rows))
+    return rows
+
+
+def stream_pages(query: Callable[..., sqlite3.Cursor], cursor_of: Callable[[tuple], str], *args,
+                 after: Optional[str] = None) -> Iterator[List[tuple]]:
+    """
+    Yields all rows of a query which is paginated by its last two arguments, `limit` and `after`, in batches. Every
+    batch is a query of its own, so that no connection is held while the consumer, e.g. a slow client, waits.
+    """
+    while True:
+        rows = run_on_current_connection(fetch_all, query, *args, stream_batch_size, after)
+        if rows:
+            yield rows
+        if len(rows) < stream_batch_size:
+            return
+        after = cursor_of(rows[-1])
+
+
+def batched(items: List, size: int) -> Iterator[List]:
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+async def get_data_version() -> int:
+    """Version of the exercise data, increased by every import which changes the exercises."""
+    return await run_query(query_data_version)
+
+
+async def get_current_data_version() -> int:
+    """
+    Like get_data_version, but reads the version only once per database file if the file is immutable, because it
+    can then only change by swapping in another file.
+    """
+    global data_version_cache
+    cached = data_version_cache
+    if cached is not None and cached[0] is get_pool():
+        return cached[1]
+    source, version = await run_query(lambda con: (con.pool, query_data_version(con)))
+    if settings.taskpool_db_immutable:
+        data_version_cache = (source, version)
+    return version
+
+
+def get_pool() -> ConnectionPool:
+    """The pool of the current database, opened on first use if the open_database startup hook did not run."""
+    if pool is None:
+        open_database()
+    return pool
+
+
+@contextmanager
+def current_connection() -> Iterator[PooledConnection]:
+    """
+    A connection of the current database. A thread which waited for a connection of a database that was swapped out
+    or closed meanwhile takes one of the new database instead.
+    """
+    while True:
+        with ExitStack() as stack:
+            try:
+                con = stack.enter_context(get_pool().connection())
+            except PoolClosedError:
+                continue
+            yield con
+            return
+
+
+def run_on_current_connection(fn: Callable[..., T], *args) -> T:
+    with current_connection() as con:
+        return fn(con, *args)
+
+
+async def run_query(fn: Callable[..., T], *args) -> T:
+    """Runs `fn(connection, *args)` in the threadpool with a connection of the current database."""
+    return await run_in_threadpool(run_on_current_connection, fn, *args)
+
+
+def open_database():
+    """Startup hook which opens the configured database, importing this module does not touch the file."""
+    global pool
+    with pool_lock:
+        if pool is None:
+            pool = open_pool(settings.taskpool_db_path)
+
+
+async def close_database():
+    """
+    Shutdown hook which closes the connections of the current database once they were returned. The database is
+    opened again if it is used afterwards.
+    """
+    global pool, exercise_index, exercise_sampler, word_search, data_version_cache
+    with pool_lock:
+        previous_pool = pool
+        pool, exercise_index, exercise_sampler, word_search, data_version_cache = None, None, None, None, None
+    if previous_pool is not None:
+        await run_in_threadpool(previous_pool.close)
+
+
+def on_database_swap(callback: Callable[[], None]) -> Callable[[], None]:
+    """Registers a callback which invalidates a cache of data read from the database."""
+    swap_callbacks.append(callback)
+    return callback
+
+
+def warm_up(new_pool: ConnectionPool) -> Tuple[Optional[ExerciseIndex], Optional[ExerciseSampler],
+                                              WordSearchIndex]:
+    """
+    Reads the new database before it serves requests: scanning the exercise table pulls its pages into the page cache
+    and fails early for files which are not a taskpool database. Builds the word search, and the in-memory index if it
+    is enabled or the exercise sampler otherwise.
+    """
+    with new_pool.connection() as con:
+        con.execute("SELECT COUNT(*) FROM exercise").fetchone()
+        query_data_version(con)
+        new_word_search = build_word_search(con)
+        if not settings.taskpool_in_memory_index:
+            return None, build_exercise_sampler(con, new_pool), new_word_search
+        return build_exercise_index(con), None, new_word_search
+
+
+async def swap_database(path: Optional[str] = None) -> ConnectionPool:
+    """
+    Opens and warms up the database at `path` (by default the configured one) in the threadpool and then switches
+    all new requests to it at once. Queries and streams which already run finish on the previous database, whose
+    connections are closed in the background once they were all returned.
+    """
+    global pool, exercise_index, exercise_sampler, word_search, swap_lock
+    if swap_lock is None:
+        swap_lock = asyncio.Lock()
+    async with swap_lock:
+        new_pool = await run_in_threadpool(open_pool, path or settings.taskpool_db_path)
+        try:
+            new_index, new_sampler, new_word_search = await run_in_threadpool(warm_up, new_pool)
+        except Exception:
+            await run_in_threadpool(new_pool.close)
+            raise
+        # the assignments run on the event loop without awaiting in between, no request sees one without the others
+        previous_pool = pool
+        pool, exercise_index, exercise_sampler, word_search = new_pool, new_index, new_sampler, new_word_search
+        for callback in swap_callbacks:
+            callback()
+        database_swaps.inc()
+    # waits for the connections which are still in use, however long their streams take
+    if previous_pool is not None:
+        threading.Thread(target=previous_pool.close, name="drain-database-pool", daemon=True).start()
+    return new_pool
+
+
+async def find_internal_exercises(translation_pair: InternalTranslationPair, word: str, limit: Optional[int] = None,
+                                  after: Optional[str] = None) -> List[InternalExercise]:
+    """Exercises of a word ordered by id. Only exercises with an id greater than `after` are returned."""
+    index = await await_exercise_index()
+    if index is not None:
+        return index.get_exercises(translation_pair, word, limit, after)
+    results = await run_query(fetch_all, query_exercises, translation_pair, word, limit, after)
+    return list(map(tuple_to_internal_exercise, results))
+
+
+def stream_internal_exercises(translation_pair: InternalTranslationPair, word: str,
+                              after: Optional[str] = None) -> Iterator[List[InternalExercise]]:
+    """All exercises of a word after `after` in batches, for responses which are not paginated."""
+    index = get_exercise_index(mutable_data_version())
+    if index is not None:
+        yield from batched(index.get_exercises(translation_pair, word, after=after), stream_batch_size)
+        return
+    for rows in stream_pages(query_exercises, lambda row: row[0], translation_pair, word, after=after):
+        yield list(map(tuple_to_internal_exercise, rows))
+
+
+def sample_exercise_rows(con: PooledConnection, translation_pair: InternalTranslationPair, n: int,
+                         seed: Optional[int] = None) -> List[tuple]:
+    """
+    Draws the rows of `n` random exercises. The rowids are read again if the data version changed since the sampler
+    was built, e.g. by an incremental import into the running database.
+    """
+    global exercise_sampler
+    source = con.pool
+    data_version = query_data_version(con)
+
+    def is_current(sampler: Optional[ExerciseSampler]) -> bool:
+        return sampler is not None and sampler.source is source and sampler.data_version == data_version
+
+    sampler = exercise_sampler
+    if not is_current(sampler):
+        with sampler_lock:
+            # another request may have rebuilt it in the meantime
+            sampler = exercise_sampler
+            if not is_current(sampler):
+                sampler = exercise_sampler = build_exercise_sampler(con, source)
+    rowids = sampler.sample(translation_pair, n, seed)
+    if len(rowids) == 0:
+        return []
+    rows_by_rowid = {row[-1]: row for row in fetch_all(con, query_exercises_by_rowids, rowids)}
+    return [rows_by_rowid[rowid] for rowid in rowids if rowid in rows_by_rowid]
+
+
+async def sample_internal_exercises(translation_pair: InternalTranslationPair, n: int,
+                                    seed: Optional[int] = None) -> List[InternalExercise]:
+    """`n` random exercises of a translation pair, the same ones for the same seed as long as the data is the same."""
+    index = await await_exercise_index()
+    if index is not None:
+        return index.sample(translation_pair, n, seed)
+    rows = await run_query(sample_exercise_rows, translation_pair, n, seed)
+    return list(map(tuple_to_internal_exercise, rows))
+
+
+async def find_internal_exercises_for_words(translation_pair: InternalTranslationPair,
+                                            words: List[str]) -> Dict[str, List[InternalExercise]]:
+    """Exercises of several words with a single query, grouped by word in the order of `words`."""
+    exercises_by_word: Dict[str, List[InternalExercise]] = {word: [] for word in words}
+
+    index = await await_exercise_index()
+    if index is not None:
+        for word in exercises_by_word:
+            exercises_by_word[word] = index.get_exercises(translation_pair, word)
+        return exercises_by_word
+
+    results = await run_query(fetch_all, query_exercises_for_words, translation_pair, list(exercises_by_word))
+    for exercise in map(tuple_to_internal_exercise, results):
+        exercises_by_word[exercise.target_word].append(exercise)
+    for internal_exercises in exercises_by_word.values():
+        internal_exercises.sort(key=lambda e: e.id)
+    return exercises_by_word
+
+
+async def get_learnable_words(translation_pair: InternalTranslationPair, limit: Optional[int] = None,
+                              after: Optional[str] = None) -> List[LearnableWord]:
+    """Learnable words in alphabetical order. Only words greater than `after` are returned."""
+    index = await await_exercise_index()
+    if index is not None:
+        return [LearnableWord(word=word) for word in index.get_words(translation_pair, limit, after)]
+
+    results = await run_query(fetch_all, query_learnable_words, translation_pair, limit, after)
     return list(map(tuple_to_learnable_word, results))
+
+
+def stream_learnable_words(translation_pair: InternalTranslationPair,
+                           after: Optional[str] = None) -> Iterator[List[LearnableWord]]:
+    """All learnable words after `after` in batches, for responses which are not paginated."""
+    index = get_exercise_index(mutable_data_version())
+    if index is not None:
+        for words in batched(index.get_words(translation_pair, after=after), stream_batch_size):
+            yield [LearnableWord(word=word) for word in words]
+        return
+    for rows in stream_pages(query_learnable_words, lambda row: row[0], translation_pair, after=after):
+        yield list(map(tuple_to_learnable_word, rows))
+
+
+async def search_learnable_words(translation_pair: InternalTranslationPair, prefix: Optional[str] = None,
+                                 fuzzy: Optional[str] = None, limit: int = 10) -> List[str]:
+    """
+    Learnable words starting with `prefix` or within a few typos of `fuzzy`, best matches first. Case and diacritics
+    are ignored. Served from memory, a search does not query SQLite.
+    """
+    index = await await_word_search()
+    if fuzzy is not None:
+        return index.fuzzy(translation_pair, fuzzy, limit)
+    return index.prefix(translation_pair, prefix or "", limit)
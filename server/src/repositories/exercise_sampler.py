@@ -0,0 +1,34 @@
+from array import array
+from typing import Dict, Iterable, List, Optional, Tuple
+from models.internal_models import InternalTranslationPair
+from repositories.exercise_index import translation_pair_key, sample_positions
+
+
+class ExerciseSampler:
+    """
+    Rowids of the exercises of every translation pair, ordered by exercise id. A random deck is drawn by sampling
+    positions of the array instead of sorting the exercise table by RANDOM(). Exercise ids do not depend on the
+    database file, so a seed draws the same deck from every database with the same exercises.
+    """
+
+    def __init__(self, rows: Iterable[Tuple[str, str, int]], source: object = None, data_version: int = 0):
+        """`rows` are the source language, target language and rowid of every exercise, ordered by id."""
+        self._rowids: Dict[Tuple[str, str], array] = {}
+        for source_language, target_language, rowid in rows:
+            key = (source_language.upper(), target_language.upper())
+            rowids = self._rowids.get(key)
+            if rowids is None:
+                rowids = self._rowids[key] = array("q")
+            rowids.append(rowid)
+        # what the rowids were read from, they have to be read again once either changed
+        self.source = source
+        self.data_version = data_version
+
+    def sample(self, translation_pair: InternalTranslationPair, n: int, seed: Optional[int] = None) -> List[int]:
+        rowids = self._rowids.get(translation_pair_key(translation_pair))
+        if rowids is None:
+            return []
+        return [rowids[i] for i in sample_positions(len(rowids), n, seed)]
+
+    def __len__(self) -> int:
+        return sum(len(rowids) for rowids in self._rowids.values())
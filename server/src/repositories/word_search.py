@@ -0,0 +1,144 @@
+import unicodedata
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Set, Tuple
+from models.internal_models import InternalTranslationPair
+from repositories.exercise_index import translation_pair_key
+
+
+def fold(word: str) -> str:
+    """The search key of a word, lower case without diacritics: "strasse" for "Straße" and "hutte" for "Hütte"."""
+    decomposed = unicodedata.normalize("NFKD", word.casefold())
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def max_distance(key: str) -> int:
+    """Typos tolerated in a search term, none in very short terms which would match almost anything."""
+    if len(key) < 3:
+        return 0
+    return 1 if len(key) < 6 else 2
+
+
+def deletions(key: str, distance: int) -> Set[str]:
+    """`key` and every string which is `key` with up to `distance` characters removed."""
+    results = {key}
+    level = {key}
+    for _ in range(distance):
+        level = {k[:i] + k[i + 1:] for k in level for i in range(len(k))}
+        results |= level
+    return results
+
+
+def edit_distance(a: str, b: str, bound: int) -> int:
+    """
+    Optimal string alignment distance: insertions, deletions, substitutions and transpositions of adjacent characters
+    cost 1. Returns `bound + 1` as soon as the distance is known to exceed `bound`. Only the cells within `bound` of
+    the diagonal are computed, the others cannot be on a path within the bound.
+    """
+    if abs(len(a) - len(b)) > bound:
+        return bound + 1
+    if a == b:
+        return 0
+    beyond = bound + 1
+    previous_previous = previous = [j if j <= bound else beyond for j in range(len(b) + 1)]
+    for i in range(1, len(a) + 1):
+        ca = a[i - 1]
+        low = max(1, i - bound)
+        high = min(len(b), i + bound)
+        current = [beyond] * (len(b) + 1)
+        if low == 1:
+            current[0] = i if i <= bound else beyond
+        row_min = current[0]
+        for j in range(low, high + 1):
+            cb = b[j - 1]
+            value = previous[j - 1] + (ca != cb)
+            if previous[j] + 1 < value:
+                value = previous[j] + 1
+            if current[j - 1] + 1 < value:
+                value = current[j - 1] + 1
+            if i > 1 and j > 1 and ca == b[j - 2] and a[i - 2] == cb and previous_previous[j - 2] + 1 < value:
+                value = previous_previous[j - 2] + 1
+            current[j] = value
+            if value < row_min:
+                row_min = value
+        if row_min > bound:
+            return beyond
+        previous_previous, previous = previous, current
+    return min(previous[-1], beyond)
+
+
+class WordList:
+    """
+    The learnable words of one translation pair.
+
+    Words are kept sorted by search key, so that the words with a prefix are a contiguous range found with bisect.
+    For typos, every word is also stored under each of its keys with one character removed. A search term looks up
+    its own deletions, which finds the words within one edit of it and, for longer terms, the words within two edits
+    as long as at most one of them is a missing, wrong or swapped character in the term. The candidates are then
+    checked with the exact distance.
+    """
+
+    def __init__(self, words: Iterable[str]):
+        entries = sorted((fold(word), word) for word in set(words))
+        self.keys = [key for key, _ in entries]
+        self.words = [word for _, word in entries]
+        # positions in self.words by key with up to one character removed
+        self.deletions: Dict[str, List[int]] = {}
+        for position, key in enumerate(self.keys):
+            for deletion in deletions(key, 1):
+                self.deletions.setdefault(deletion, []).append(position)
+
+    def prefix(self, prefix: str, limit: int) -> List[str]:
+        """Words starting with `prefix` in alphabetical order, an exact match first."""
+        key = fold(prefix)
+        start = bisect_left(self.keys, key)
+        results = []
+        for position in range(start, len(self.keys)):
+            if len(results) == limit or not self.keys[position].startswith(key):
+                break
+            results.append(position)
+        # words which only differ in case or diacritics share a key, the one spelled like the prefix goes first
+        results.sort(key=lambda p: (self.keys[p] != key, self.words[p] != prefix))
+        return [self.words[p] for p in results]
+
+    def fuzzy(self, term: str, limit: int) -> List[str]:
+        """Words within a few typos of `term`, closest first, then words with the term's first letter."""
+        key = fold(term)
+        bound = max_distance(key)
+        candidates = set()
+        for deletion in deletions(key, bound):
+            candidates.update(self.deletions.get(deletion, ()))
+        ranked = []
+        for position in candidates:
+            distance = edit_distance(key, self.keys[position], bound)
+            if distance <= bound:
+                ranked.append((distance, self.words[position] != term, not self.keys[position].startswith(key[:1]),
+                               abs(len(self.keys[position]) - len(key)), self.keys[position], self.words[position]))
+        ranked.sort()
+        return [entry[-1] for entry in ranked[:limit]]
+
+    def __len__(self) -> int:
+        return len(self.words)
+
+
+class WordSearchIndex:
+    """Prefix and typo tolerant search over the learnable words, by translation pair."""
+
+    def __init__(self, rows: Iterable[Tuple[str, str, str]], data_version: int = 0):
+        """`rows` are the source language, target language and target word of the exercises."""
+        words: Dict[Tuple[str, str], List[str]] = {}
+        for source_language, target_language, word in rows:
+            words.setdefault((source_language.upper(), target_language.upper()), []).append(word)
+        self._word_lists = {key: WordList(pair_words) for key, pair_words in words.items()}
+        # the data version the words were read at
+        self.data_version = data_version
+
+    def prefix(self, translation_pair: InternalTranslationPair, prefix: str, limit: int) -> List[str]:
+        word_list = self._word_lists.get(translation_pair_key(translation_pair))
+        return word_list.prefix(prefix, limit) if word_list is not None else []
+
+    def fuzzy(self, translation_pair: InternalTranslationPair, term: str, limit: int) -> List[str]:
+        word_list = self._word_lists.get(translation_pair_key(translation_pair))
+        return word_list.fuzzy(term, limit) if word_list is not None else []
+
+    def __len__(self) -> int:
+        return sum(len(word_list) for word_list in self._word_lists.values())
@@ -0,0 +1,163 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+from metrics import callback_metric, Labels
+
+# bytes counted for an entry besides its body, roughly what the entry, its key and its headers take
+ENTRY_OVERHEAD = 512
+
+
+class CachedResponse:
+    """
+    A serialised response body and the headers which belong to it. `encoded` holds the body compressed with content
+    codings by name, so that hits do not compress it again.
+    """
+
+    def __init__(self, body: bytes, headers: Optional[Dict[str, str]] = None,
+                 encoded: Optional[Dict[str, bytes]] = None):
+        self.body = body
+        self.headers = headers or {}
+        self.encoded = encoded or {}
+        self.expires = 0.0
+
+    @property
+    def size(self) -> int:
+        return len(self.body) + sum(len(body) for body in self.encoded.values()) + ENTRY_OVERHEAD
+
+
+class CacheStats:
+    def __init__(self, entries: int, bytes: int, max_bytes: int, hits: int, misses: int, coalesced: int,
+                 evictions: int, expirations: int):
+        self.entries = entries
+        self.bytes = bytes
+        self.max_bytes = max_bytes
+        self.hits = hits
+        self.misses = misses
+        self.coalesced = coalesced
+        self.evictions = evictions
+        self.expirations = expirations
+
+
+class ResponseCache:
+    """
+    Least recently used cache of serialised responses, bounded by the total size of their bodies in bytes. Entries
+    expire `ttl` seconds after they were computed.
+
+    Misses are coalesced: while the response of a key is computed, further requests for the key wait for that
+    computation instead of starting their own. The computation runs in a task of its own, so that it completes for
+    the waiting requests even if the request which started it is cancelled. The cache is only used from the event
+    loop and needs no locks.
+    """
+
+    def __init__(self, max_bytes: int, ttl: float):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, CachedResponse]" = OrderedDict()
+        self._in_flight: Dict[Hashable, asyncio.Task] = {}
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._coalesced = 0
+        self._evictions = 0
+        self._expirations = 0
+
+    async def get_or_compute(self, key: Hashable, compute: Callable[[], Awaitable[CachedResponse]]) -> CachedResponse:
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry.expires > time.monotonic():
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return entry
+            self._remove(key)
+            self._expirations += 1
+
+        task = self._in_flight.get(key)
+        if task is None:
+            self._misses += 1
+            task = self._in_flight[key] = asyncio.ensure_future(self._compute(key, compute))
+        else:
+            self._coalesced += 1
+        return await asyncio.shield(task)
+
+    async def _compute(self, key: Hashable, compute: Callable[[], Awaitable[CachedResponse]]) -> CachedResponse:
+        task = asyncio.current_task()
+        try:
+            entry = await compute()
+        finally:
+            # the cache may have been cleared meanwhile, then the key belongs to another computation or none
+            stored = self._in_flight.get(key) is task
+            if stored:
+                del self._in_flight[key]
+        if stored:
+            self._store(key, entry)
+        return entry
+
+    def _store(self, key: Hashable, entry: CachedResponse):
+        if entry.size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._remove(key)
+        entry.expires = time.monotonic() + self.ttl
+        self._entries[key] = entry
+        self._bytes += entry.size
+        while self._bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self._evictions += 1
+
+    def _remove(self, key: Hashable):
+        self._bytes -= self._entries.pop(key).size
+
+    def clear(self):
+        """Drops all entries. Computations which are still running finish, but their results are not stored."""
+        self._entries.clear()
+        self._in_flight = {}
+        self._bytes = 0
+
+    def stats(self) -> CacheStats:
+        return CacheStats(
+            entries=len(self._entries),
+            bytes=self._bytes,
+            max_bytes=self.max_bytes,
+            hits=self._hits,
+            misses=self._misses,
+            coalesced=self._coalesced,
+            evictions=self._evictions,
+            expirations=self._expirations
+        )
+
+
+# the caches exposed in /metrics, by name
+caches: Dict[str, ResponseCache] = {}
+
+
+def register_cache(name: str, cache: ResponseCache) -> ResponseCache:
+    """Exposes the stats of a cache in /metrics, replacing a previous cache of the same name."""
+    caches[name] = cache
+    return cache
+
+
+def cache_samples(*fields: str) -> Callable[[], List[Tuple[Labels, float]]]:
+    """Samples of every cache, labelled with its name and, for several fields, the name of the field."""
+
+    def samples():
+        results = []
+        for name, cache in caches.items():
+            stats = cache.stats()
+            for field in fields:
+                labels = (name, field) if len(fields) > 1 else (name,)
+                results.append((labels, getattr(stats, field)))
+        return results
+
+    return samples
+
+
+callback_metric("taskpool_response_cache_lookups_total", "Lookups of the response caches by result.", "counter",
+                ("cache", "result"), cache_samples("hits", "misses", "coalesced"))
+callback_metric("taskpool_response_cache_removals_total", "Entries removed from the response caches by reason.",
+                "counter", ("cache", "reason"), cache_samples("evictions", "expirations"))
+callback_metric("taskpool_response_cache_entries", "Responses in the response caches.", "gauge", ("cache",),
+                cache_samples("entries"))
+callback_metric("taskpool_response_cache_bytes", "Size of the responses in the response caches.", "gauge",
+                ("cache",), cache_samples("bytes"))
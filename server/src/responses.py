@@ -0,0 +1,40 @@
+import json
+from typing import Any
+from fastapi.responses import JSONResponse
+from metrics import histogram
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+serialization_duration = histogram("taskpool_response_serialization_seconds",
+                                   "Time spent encoding JSON response bodies.")
+
+
+def dumps(content: Any) -> bytes:
+    """Encodes JSON in the same compact form as `JSONResponse`, with orjson if it is installed."""
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+@serialization_duration.time()
+def render_json(content: Any) -> bytes:
+    return dumps(content)
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    # If-None-Match uses the weak comparison
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or etag in tags or "W/" + etag in tags
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSON response for content which is already made of plain dicts and lists, e.g. from `exercise_renderer`.
+    Unlike returning models from an endpoint, the content is neither validated nor run through `jsonable_encoder`.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return render_json(content)
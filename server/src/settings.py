@@ -1,8 +1,42 @@
+from typing import Optional
 from pydantic import BaseSettings
 
 
 class Settings(BaseSettings):
     taskpool_db_path: str = "taskpool.db"
+    # number of read-only SQLite connections shared by all requests
+    taskpool_db_pool_size: int = 4
+    # the database file is not modified while the server runs, see https://www.sqlite.org/uri.html#uriimmutable
+    taskpool_db_immutable: bool = True
+    # bytes of the database file which SQLite reads through memory-mapped I/O
+    taskpool_db_mmap_size: int = 256 * 1024 * 1024
+    # seconds between checks whether the database file was replaced, 0 disables watching. The file can also be swapped
+    # in with SIGHUP or POST /admin/database/reload
+    taskpool_db_watch_interval: float = 0
+    # token expected in the X-Admin-Token header of admin endpoints, which are disabled without one
+    taskpool_admin_token: Optional[str] = None
+    # load all exercises into memory at startup and serve /exercises and /words without querying SQLite
+    taskpool_in_memory_index: bool = False
+    # directory of the sentence audio clips, named {LANGUAGE}-{sentence id}.mp3
+    taskpool_audio_directory: str = "audio-generated"
+    # audio bundle written by scripts/pack_audio.py, served instead of taskpool_audio_directory if set
+    taskpool_audio_bundle: Optional[str] = None
+    taskpool_audio_cache_control: str = "public, max-age=2592000"
+    # order the choices of multiple choice exercises by exercise id instead of shuffling them on every request, which
+    # makes all /exercises responses cacheable. A seed parameter orders them reproducibly either way
+    taskpool_deterministic_choices: bool = False
+    # Cache-Control of /exercises responses which carry an ETag, i.e. whose content only changes with the data
+    taskpool_exercises_cache_control: str = "public, max-age=3600"
+    # bytes of serialised /exercises responses kept in memory, 0 disables the cache. Only responses with an ETag are
+    # cached, the cache is cleared when the database is swapped
+    taskpool_response_cache_bytes: int = 64 * 1024 * 1024
+    # seconds after which a cached response is computed again
+    taskpool_response_cache_ttl: float = 3600
+    # response bodies with fewer bytes are sent uncompressed, even to clients which accept gzip or brotli
+    taskpool_compression_min_size: int = 1024
+    # directory in which the OpenAPI document is cached by app version, so that only the first process of a version
+    # builds it. Without one it is built on the first request of /openapi.json by every process
+    taskpool_openapi_cache_dir: Optional[str] = None
 
 
 settings = Settings()
@@ -3,6 +3,7 @@ from fastapi import FastAPI
 from fastapi.testclient import TestClient
 
 from ..src.main import taskpool_app
+from response_cache import caches
 
 
 @pytest.fixture
@@ -14,4 +15,7 @@ def app() -> FastAPI:
 
 @pytest.fixture
 def client(app) -> TestClient:
+    # every test sees the responses of its own requests, not those cached by earlier tests
+    for cache in caches.values():
+        cache.clear()
     return TestClient(app)
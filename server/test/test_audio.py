@@ -0,0 +1,143 @@
+import os
+from fastapi.testclient import TestClient
+from controllers.audio_controller import parse_range, UnsatisfiableRange
+from repositories import audio_repository
+from repositories.audio_repository import get_audio_manifest, AudioManifest
+from pack_audio import pack
+from settings import settings
+from . import client, app
+import pytest
+
+clip_url = "/audio/DE-2.mp3"
+
+
+def clip_content() -> bytes:
+    with open(os.path.join(settings.taskpool_audio_directory, "DE-2.mp3"), "rb") as f:
+        return f.read()
+
+
+def test_audio(client: TestClient):
+    response = client.get(clip_url)
+    assert response.status_code == 200
+    assert response.content == clip_content()
+    assert response.headers["content-type"] == "audio/mpeg"
+    assert response.headers["content-length"] == str(len(clip_content()))
+    assert response.headers["accept-ranges"] == "bytes"
+    assert response.headers["cache-control"].startswith("public, max-age=")
+    assert response.headers["etag"].startswith('"')
+
+
+def test_audio_missing(client: TestClient):
+    assert client.get("/audio/DE-1.mp3").status_code == 404
+    assert client.get("/audio/..%2Fpytest.ini").status_code == 404
+
+
+def test_audio_not_modified(client: TestClient):
+    etag = client.get(clip_url).headers["etag"]
+
+    response = client.get(clip_url, headers={"If-None-Match": f'"other", W/{etag}'})
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == etag
+
+    assert client.get(clip_url, headers={"If-None-Match": '"other"'}).status_code == 200
+
+
+def test_audio_range(client: TestClient):
+    content = clip_content()
+
+    response = client.get(clip_url, headers={"Range": "bytes=10-19"})
+    assert response.status_code == 206
+    assert response.content == content[10:20]
+    assert response.headers["content-range"] == f"bytes 10-19/{len(content)}"
+
+    response = client.get(clip_url, headers={"Range": "bytes=-5"})
+    assert response.status_code == 206
+    assert response.content == content[-5:]
+
+    response = client.get(clip_url, headers={"Range": f"bytes={len(content)}-"})
+    assert response.status_code == 416
+    assert response.headers["content-range"] == f"bytes */{len(content)}"
+
+    response = client.get(clip_url, headers={"Range": "bytes=10-19", "If-Range": '"outdated"'})
+    assert response.status_code == 200
+    assert response.content == content
+
+
+def test_audio_head(client: TestClient):
+    response = client.head(clip_url, headers={"Range": "bytes=0-99"})
+    assert response.status_code == 206
+    assert response.headers["content-length"] == "100"
+    assert response.content == b""
+
+
+def test_parse_range():
+    assert parse_range("bytes=0-0", 10) == (0, 0)
+    assert parse_range("bytes=5-", 10) == (5, 9)
+    assert parse_range("bytes=5-100", 10) == (5, 9)
+    assert parse_range("bytes=-100", 10) == (0, 9)
+    assert parse_range("bytes=0-1,5-6", 10) is None
+    assert parse_range("items=0-1", 10) is None
+    assert parse_range("bytes=5-1", 10) is None
+    assert parse_range("bytes=a-b", 10) is None
+    with pytest.raises(UnsatisfiableRange):
+        parse_range("bytes=10-", 10)
+    with pytest.raises(UnsatisfiableRange):
+        parse_range("bytes=-0", 10)
+
+
+def test_exercise_without_audio_has_no_resource(client: TestClient, monkeypatch):
+    monkeypatch.setattr(get_audio_manifest(), "_clips", {})
+    response = client.get("/exercises?translationPair=uk->de&word=stark&exerciseType=bitmark.essay")
+    assert "resource" not in response.json()[0]["bitmark"]["essay"]
+
+
+@pytest.fixture
+def bundled_manifest(tmp_path, monkeypatch) -> AudioManifest:
+    bundle_file = str(tmp_path / "audio.bundle")
+    pack(settings.taskpool_audio_directory, bundle_file)
+    manifest = AudioManifest.from_bundle(bundle_file)
+    monkeypatch.setattr(audio_repository, "audio_manifest", manifest)
+    return manifest
+
+
+def test_audio_bundle(client: TestClient, bundled_manifest: AudioManifest):
+    content = clip_content()
+    clip = bundled_manifest.get("DE-2.mp3")
+    directory_manifest = AudioManifest.from_directory(settings.taskpool_audio_directory)
+    assert bundled_manifest.is_bundled
+    assert len(bundled_manifest) == len(directory_manifest)
+    assert bytes(bundled_manifest.read(clip, 0, clip.size)) == content
+
+    response = client.get(clip_url)
+    assert response.status_code == 200
+    assert response.content == content
+    assert response.headers["etag"] == directory_manifest.get("DE-2.mp3").etag
+    assert response.headers["content-type"] == "audio/mpeg"
+
+    response = client.get(clip_url, headers={"Range": "bytes=1000-"})
+    assert response.status_code == 206
+    assert response.content == content[1000:]
+
+    assert client.get("/audio/DE-1.mp3").status_code == 404
+
+
+def test_audio_bundle_keeps_its_index(tmp_path):
+    bundle_file = str(tmp_path / "audio.bundle")
+    clips = pack(settings.taskpool_audio_directory, bundle_file)
+    assert sorted(os.listdir(tmp_path)) == ["audio.bundle"]
+    manifest = AudioManifest.from_bundle(bundle_file)
+    assert {name: (clip.offset, clip.size, clip.content_hash) for name, clip in manifest._clips.items()} == clips
+
+
+def test_invalid_audio_bundle(tmp_path):
+    bundle_file = tmp_path / "audio.bundle"
+    bundle_file.write_bytes(clip_content())
+    with pytest.raises(ValueError, match="not an audio bundle"):
+        AudioManifest.from_bundle(str(bundle_file))
+
+    pack(settings.taskpool_audio_directory, str(bundle_file))
+    # clips which were cut off
+    bundle_file.write_bytes(bundle_file.read_bytes()[1:])
+    with pytest.raises(ValueError, match="does not match its index"):
+        AudioManifest.from_bundle(str(bundle_file))
@@ -0,0 +1,153 @@
+import argparse
+import asyncio
+import json
+import sqlite3
+from types import SimpleNamespace
+from models.internal_models import InternalTranslationPair, Language
+from repositories.connection_pool import ConnectionPool
+from repositories.exercise_repository import fetch_all, query_exercises, query_learnable_words
+from server.benchmark import driver
+from server.benchmark.__main__ import run_in_subprocess
+from server.benchmark.driver import Request, call, run_scenario, peak_rss_mb
+from server.benchmark.generate import generate_database
+from server.benchmark.report import build_report, compare, percentile
+from server.benchmark.scenarios import SCENARIOS, sample_words
+from server.benchmark.startup import PHASES, measure_startup, startup_results
+from . import app
+
+
+def test_generate_database(tmp_path):
+    path = str(tmp_path / "benchmark.db")
+    generate_database(path, exercises=500, words=40, seed=1)
+
+    conn = sqlite3.connect(path)
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == 1
+    assert conn.execute("SELECT COUNT(*) FROM exercise").fetchone()[0] == 500
+    assert conn.execute("SELECT COUNT(*) FROM sentences").fetchone()[0] == 1000
+    # every target sentence contains its word and the languages match the sentences
+    rows = conn.execute("""
+    SELECT e.target_word, s2.text, s1.language = e.source_language AND s2.language = e.target_language
+    FROM exercise e
+    JOIN sentences s1 ON s1.id = e.source_sentence_id
+    JOIN sentences s2 ON s2.id = e.target_sentence_id
+    """).fetchall()
+    assert len(rows) == 500
+    assert all(word in text.lower() and languages_match for word, text, languages_match in rows)
+    similar_words, target_word = conn.execute("SELECT similar_words, target_word FROM exercise").fetchone()
+    assert target_word not in json.loads(similar_words)
+    conn.close()
+
+    pool = ConnectionPool(path, size=1)
+    uk_de = InternalTranslationPair(Language.uk, Language.de)
+    with pool.connection() as con:
+        words = fetch_all(con, query_learnable_words, uk_de)
+        assert 0 < len(words) <= 40
+        assert len(fetch_all(con, query_exercises, uk_de, words[0][0])) > 0
+    pool.close()
+
+
+def test_generate_database_is_deterministic(tmp_path):
+    dumps = []
+    for name in ["a.db", "b.db"]:
+        generate_database(str(tmp_path / name), exercises=100, seed=7)
+        conn = sqlite3.connect(str(tmp_path / name))
+        dumps.append(conn.execute("SELECT * FROM exercise ORDER BY id").fetchall())
+        conn.close()
+    assert dumps[0] == dumps[1]
+
+
+def test_scenarios_on_test_database(app):
+    words = sample_words("test.db", 4)
+    assert words == ["stark"] * 4
+
+    async def run():
+        await app.router.startup()
+        return {name: await run_scenario(app, scenario(words), requests=4, concurrency=2, warmup=1)
+                for name, scenario in SCENARIOS.items()}
+
+    results = asyncio.run(run())
+    for result in results.values():
+        assert result.requests == 4
+        assert result.errors == 0
+
+    report = build_report({"database": "test.db"}, results)
+    assert set(report["scenarios"]) == set(SCENARIOS)
+    assert report["scenarios"]["exercises-all"]["latency_ms"]["p99"] > 0
+
+
+def test_call(app):
+    response = asyncio.run(call(app, Request("GET", "/exercises", {
+        "translationPair": "uk->de",
+        "word": "stark",
+        "exerciseType": "bitmark.essay"
+    }, headers={"Accept": "application/x-ndjson"})))
+    assert response.status == 200
+    assert json.loads(response.body.splitlines()[0])["targetSentence"]["word"] == "stark"
+
+
+def test_peak_rss_units(monkeypatch):
+    usage = SimpleNamespace(ru_maxrss=3 * 1024 * 1024)
+    monkeypatch.setattr(driver, "resource", SimpleNamespace(RUSAGE_SELF=0, getrusage=lambda who: usage))
+    monkeypatch.setattr(driver.sys, "platform", "darwin")
+    assert peak_rss_mb() == 3
+    monkeypatch.setattr(driver.sys, "platform", "linux")
+    assert peak_rss_mb() == 3 * 1024
+
+
+def test_run_in_subprocess():
+    args = argparse.Namespace(database="test.db", requests=4, warmup=1, concurrency=2, seed=0, in_memory_index=False,
+                              response_cache=False)
+    summary = run_in_subprocess(args, "words")
+    assert summary["requests"] == 4
+    assert summary["errors"] == 0
+    assert summary["peak_rss_mb"] > 0
+
+
+def test_percentile():
+    values = [float(i) for i in range(1, 101)]
+    assert percentile(values, 50) == 50
+    assert percentile(values, 99) == 99
+    assert percentile(values, 100) == 100
+    assert percentile([], 50) == 0
+
+
+def test_compare():
+    def report(throughput: float, p50: float, p99: float) -> dict:
+        return {"scenarios": {"words": {
+            "throughput": throughput,
+            "latency_ms": {"p50": p50, "p99": p99},
+            "peak_rss_mb": None
+        }}}
+
+    comparisons = {c.metric: c for c in compare(report(100, 10, 20), report(80, 10.5, 30))}
+    assert set(comparisons) == {"throughput", "latency_ms.p50", "latency_ms.p99"}
+    assert comparisons["throughput"].is_regression(0.1)
+    assert not comparisons["latency_ms.p50"].is_regression(0.1)
+    assert comparisons["latency_ms.p99"].is_regression(0.1)
+    assert not any(c.is_regression(0.1) for c in compare(report(100, 10, 20), report(120, 5, 20)))
+
+
+def test_startup_results():
+    def sample(seconds: float, status: int = 200) -> dict:
+        return {
+            "seconds": {phase: seconds for phase in PHASES},
+            "statuses": {"first-healthcheck": 200, "first-exercises": status, "first-openapi": 200},
+            "peak_rss_mb": 50.0
+        }
+
+    results = startup_results([sample(0.1), sample(0.2, status=500)])
+    assert set(results) == set(PHASES) | {"first-200", "total"}
+    assert results["import"].latencies == [0.1, 0.2]
+    assert results["first-200"].latencies == [0.4, 0.8]
+    assert results["first-200"].errors == 0
+    assert results["total"].errors == 1
+    assert results["total"].peak_rss_mb == 50.0
+    assert results["import"].peak_rss_mb is None
+
+
+def test_measure_startup():
+    samples = measure_startup("test.db", runs=1, in_memory_index=False, word="stark")
+    assert len(samples) == 1
+    assert set(samples[0]["seconds"]) == set(PHASES)
+    assert all(status == 200 for status in samples[0]["statuses"].values())
+    assert all(seconds >= 0 for seconds in samples[0]["seconds"].values())
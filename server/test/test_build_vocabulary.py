@@ -0,0 +1,82 @@
+import pandas as pd
+from build_vocabulary import read_sentences, write_vocabulary, write_lemmata, r_nonalpha, r_whitespace
+
+sentences_tsv = """id\tlanguage\ttext\ttranslated_from\tword_count
+1\tUK\tЯ люблю свій дім.\t-1\t4
+2\tDE\tIch liebe mein Haus!\t1\t4
+3\tDE\t"Das Haus ist ""groß"" - sehr groß."\t-1\t7
+4\tUK\tМій дім.\t2\t2
+5\tDE\tHäuser, Häuser und Häuschen.\t-1\t4
+"""
+
+# lower case lemmas of the alphabetic tokens, as returned by the spaCy models
+LEMMAS = {
+    1: ["я", "любити", "свій", "дім"],
+    2: ["ich", "lieben", "mein", "haus"],
+    3: ["der", "haus", "sein", "groß", "sehr", "groß"],
+    4: ["мій", "дім"],
+    5: ["haus", "haus", "und", "häuschen"],
+}
+
+
+def notebook_vocabulary(df_sentences: pd.DataFrame, output_dir):
+    """build_vocabulary of generate_data.ipynb"""
+    word_links = set()
+    n_word = 0
+    v2id = {}
+    for _, sentence in df_sentences.iterrows():
+        sentence_id = sentence.name
+        words = [r_nonalpha.sub("", x) for x in r_whitespace.split(sentence.text)]
+        for word in words:
+            v = (sentence.language, word)
+            if v not in v2id:
+                v2id[v] = n_word
+                n_word += 1
+            word_links.add((sentence_id, v2id[v]))
+    pd.DataFrame(word_links, columns=["sentence_id", "vocabulary_id"]) \
+        .to_csv(output_dir / "sentence-vocabulary.tsv", sep="\t", index=False)
+    pd.DataFrame([{"language": language, "word": word, "length": len(word)} for language, word in v2id.keys()],
+                 index=v2id.values()) \
+        .rename_axis("id") \
+        .to_csv(output_dir / "vocabulary.tsv", sep="\t", index=True)
+
+
+def notebook_lemmata(df_sentences: pd.DataFrame, output_dir):
+    """build_lemmata of generate_data.ipynb with the tokens of the models replaced by LEMMAS"""
+    links = set()
+    n_lemma = 0
+    lemma2id = {}
+    for _, sentence in df_sentences.iterrows():
+        for lemma_text in LEMMAS[sentence.id]:
+            lemma = (sentence.language, lemma_text)
+            if lemma not in lemma2id:
+                lemma2id[lemma] = n_lemma
+                n_lemma += 1
+            links.add((sentence.id, lemma2id[lemma]))
+    pd.DataFrame(links, columns=["sentence_id", "lemma_id"]) \
+        .to_csv(output_dir / "sentence-lemma.tsv", sep="\t", index=False)
+    pd.DataFrame([{"language": language, "word": word} for language, word in lemma2id.keys()],
+                 index=lemma2id.values()) \
+        .rename_axis("id") \
+        .to_csv(output_dir / "lemmata.tsv", sep="\t", index=True)
+
+
+def test_outputs_match_notebook(tmp_path):
+    sentences_path = tmp_path / "sentences.tsv"
+    sentences_path.write_text(sentences_tsv)
+    expected = tmp_path / "notebook"
+    actual = tmp_path / "script"
+    expected.mkdir()
+    actual.mkdir()
+
+    notebook_vocabulary(pd.read_csv(sentences_path, sep="\t", index_col="id"), expected)
+    notebook_lemmata(pd.read_csv(sentences_path, sep="\t"), expected)
+    sentences = read_sentences(str(sentences_path))
+    assert write_vocabulary(sentences, str(actual)) == 17
+    lemmatized = ((sentence_id, language, LEMMAS[sentence_id])
+                  for sentence_id, language in zip(sentences["id"], sentences["language"]))
+    assert write_lemmata(lemmatized, str(actual)) == 15
+
+    for name in ["vocabulary.tsv", "sentence-vocabulary.tsv", "lemmata.tsv", "sentence-lemma.tsv"]:
+        assert (actual / name).read_text() == (expected / name).read_text(), name
+    assert "DE\tgroß\t4" in (actual / "vocabulary.tsv").read_text()
@@ -0,0 +1,105 @@
+import gzip
+import zlib
+import pytest
+from fastapi.testclient import TestClient
+import compression
+from compression import negotiate_encoding, parse_accept_encoding, encoded_etag, StreamCompressor, compress_all
+from controllers.exercise_controller import exercises_cache
+from settings import settings
+from . import client, app
+
+# exercises of all types are larger than the minimum size of compressed responses
+url = "/exercises?translationPair=uk->de&word=stark&exerciseType=all&seed=1"
+
+
+@pytest.fixture
+def without_brotli(monkeypatch):
+    monkeypatch.setattr(compression, "brotli", None)
+
+
+def test_parse_accept_encoding():
+    assert parse_accept_encoding("gzip, br;q=0.5, *;q=0, identity;q=x") == {"gzip": 1.0, "br": 0.5, "*": 0.0,
+                                                                             "identity": 0.0}
+
+
+def test_negotiate_encoding(without_brotli):
+    assert negotiate_encoding(None) is None
+    assert negotiate_encoding("") is None
+    assert negotiate_encoding("gzip, deflate") == "gzip"
+    assert negotiate_encoding("GZIP;q=0.5") == "gzip"
+    assert negotiate_encoding("deflate") is None
+    assert negotiate_encoding("*") == "gzip"
+    assert negotiate_encoding("gzip;q=0") is None
+    assert negotiate_encoding("gzip;q=0.5, identity") is None
+    assert negotiate_encoding("br") is None
+
+
+def test_negotiate_brotli():
+    pytest.importorskip("brotli")
+    assert negotiate_encoding("gzip, br") == "br"
+    assert negotiate_encoding("gzip, br;q=0.5") == "gzip"
+
+
+def test_encoded_etag():
+    assert encoded_etag('"abc"', "gzip") == '"abc-gzip"'
+    assert encoded_etag('W/"abc"', "br") == 'W/"abc-br"'
+
+
+def test_stream_compressor(without_brotli):
+    compressor = StreamCompressor("gzip")
+    chunks = [compressor.compress(b'{"word":"stark"}\n' * 10) for _ in range(3)]
+    # every chunk can be decoded as soon as it arrives
+    decoder = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    assert decoder.decompress(chunks[0]) == b'{"word":"stark"}\n' * 10
+    body = b"".join(chunks) + compressor.finish()
+    assert gzip.decompress(body) == b'{"word":"stark"}\n' * 30
+
+
+def test_compress_all(without_brotli):
+    assert compress_all(b"x" * 10, 100) == {}
+    encoded = compress_all(b"x" * 1000, 100)
+    assert list(encoded) == ["gzip"]
+    assert gzip.decompress(encoded["gzip"]) == b"x" * 1000
+
+
+def test_small_responses_are_not_compressed(client: TestClient):
+    response = client.get("/words?translationPair=uk->de", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in response.headers
+    assert response.headers["vary"] == "Accept-Encoding"
+
+
+def test_compressed_responses(client: TestClient, without_brotli):
+    plain = client.get(url, headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in plain.headers
+    assert len(plain.content) >= settings.taskpool_compression_min_size
+
+    # served from the cache, which stored the compressed body
+    hits = exercises_cache.stats().hits
+    compressed = client.get(url, headers={"Accept-Encoding": "gzip"})
+    assert exercises_cache.stats().hits == hits + 1
+    assert compressed.headers["content-encoding"] == "gzip"
+    assert compressed.content == plain.content
+    assert compressed.headers["etag"] == encoded_etag(plain.headers["etag"], "gzip")
+    assert int(compressed.headers["content-length"]) < len(plain.content)
+
+    not_modified = client.get(url, headers={"Accept-Encoding": "gzip", "If-None-Match": compressed.headers["etag"]})
+    assert not_modified.status_code == 304
+    assert not_modified.headers["etag"] == compressed.headers["etag"]
+
+    # compressed on the fly by the middleware
+    random_choices = client.get(url.replace("&seed=1", ""), headers={"Accept-Encoding": "gzip"})
+    assert random_choices.headers["content-encoding"] == "gzip"
+    assert random_choices.json()[0]["targetSentence"]["word"] == "stark"
+
+
+def test_streamed_responses_are_compressed(client: TestClient, without_brotli):
+    response = client.get(url, headers={"Accept-Encoding": "gzip", "Accept": "application/x-ndjson"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert "content-length" not in response.headers
+    assert response.text.endswith("\n")
+
+
+def test_audio_is_not_compressed(client: TestClient):
+    response = client.get("/audio/DE-2.mp3", headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert "content-encoding" not in response.headers
@@ -0,0 +1,69 @@
+import sqlite3
+import threading
+import time
+import pytest
+from repositories.connection_pool import ConnectionPool, PoolClosedError
+from settings import settings
+
+
+def test_connections_are_read_only():
+    pool = ConnectionPool(settings.taskpool_db_path, size=1)
+    with pool.connection() as con:
+        assert con.execute("SELECT count(*) FROM exercise").fetchone() == (1,)
+        with pytest.raises(sqlite3.OperationalError):
+            con.execute("DELETE FROM exercise")
+    pool.close()
+
+
+def test_waits_for_free_connection():
+    pool = ConnectionPool(settings.taskpool_db_path, size=1, immutable=False)
+    acquired = threading.Event()
+
+    def wait_for_connection():
+        acquired.set()
+        with pool.connection():
+            pass
+
+    with pool.connection():
+        waiting = threading.Thread(target=wait_for_connection)
+        waiting.start()
+        acquired.wait()
+        # give the thread time to block on the empty pool
+        time.sleep(0.05)
+        assert pool.stats().idle == 0
+    waiting.join()
+
+    stats = pool.stats()
+    assert stats.idle == 1
+    assert stats.acquisitions == 2
+    assert stats.waits == 1
+    assert stats.wait_seconds_max > 0
+    pool.close()
+
+
+def test_close_fails_waiting_threads():
+    pool = ConnectionPool(settings.taskpool_db_path, size=1, immutable=False)
+    errors = []
+
+    def wait_for_connection():
+        try:
+            with pool.connection():
+                pass
+        except PoolClosedError as e:
+            errors.append(e)
+
+    with pool.connection() as con:
+        waiting = threading.Thread(target=wait_for_connection)
+        waiting.start()
+        time.sleep(0.05)
+        closing = threading.Thread(target=pool.close)
+        closing.start()
+        waiting.join(5)
+        assert len(errors) == 1
+        # the connection in use is only closed once it was returned
+        assert closing.is_alive()
+        assert con.execute("SELECT count(*) FROM exercise").fetchone() == (1,)
+    closing.join(5)
+    assert not closing.is_alive()
+    with pytest.raises(sqlite3.ProgrammingError):
+        con.execute("SELECT 1")
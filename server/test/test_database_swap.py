@@ -0,0 +1,155 @@
+import asyncio
+import os
+import shutil
+import sqlite3
+import threading
+import pytest
+from fastapi.testclient import TestClient
+from repositories import exercise_repository
+from repositories.database_watcher import watch_database
+from repositories.connection_pool import PoolClosedError
+from repositories.exercise_repository import swap_database, get_pool, on_database_swap, close_database, \
+    run_on_current_connection, query_data_version
+from settings import settings
+from . import client, app
+
+exercises_url = "/exercises?translationPair=uk->de&word=stark&exerciseType=bitmark.essay"
+
+
+def create_updated_database(path: str):
+    """test.db with a second exercise for "stark" and a data version."""
+    shutil.copy("test.db", path)
+    with sqlite3.connect(path) as conn:
+        conn.executescript("""
+        INSERT INTO sentences (id, language, text, author, translated_from, word_count)
+        VALUES (3, 'UK', 'Він сильний.', 'test_author', -1, 2), (4, 'DE', 'Er ist stark.', 'test_author', 3, 3);
+        INSERT INTO translations (id, s1, s2) VALUES (2, 3, 4);
+        INSERT INTO exercise VALUES ('second-id', 2, 'stark', '["schwach"]', 3, 4, 'UK', 'DE');
+        CREATE TABLE data_version (id INTEGER PRIMARY KEY, version INTEGER NOT NULL, updated_at TEXT NOT NULL);
+        INSERT INTO data_version VALUES (1, 7, '2022-10-01T00:00:00+00:00');
+        """)
+
+
+@pytest.fixture
+def updated_database(tmp_path) -> str:
+    path = str(tmp_path / "taskpool.db")
+    create_updated_database(path)
+    yield path
+    # back to the database of the other tests
+    asyncio.run(swap_database("test.db"))
+
+
+def drain_threads():
+    return [thread for thread in threading.enumerate() if thread.name == "drain-database-pool"]
+
+
+def test_swap_database(client: TestClient, updated_database: str):
+    assert len(client.get(exercises_url).json()) == 1
+    previous_pool = get_pool()
+    invalidated = []
+    callback = on_database_swap(lambda: invalidated.append(True))
+
+    try:
+        # a query of the previous database which is still running during the swap
+        with previous_pool.connection() as con:
+            asyncio.run(swap_database(updated_database))
+            assert get_pool() is not previous_pool
+            assert con.execute("SELECT COUNT(*) FROM exercise").fetchone()[0] == 1
+            # the previous pool is only closed once the query returned its connection
+            assert len(drain_threads()) == 1
+    finally:
+        exercise_repository.swap_callbacks.remove(callback)
+
+    assert invalidated == [True]
+    for thread in drain_threads():
+        thread.join(5)
+    assert drain_threads() == []
+    assert [e["targetSentence"]["text"] for e in client.get(exercises_url).json()] == [
+        "Es regnet sehr stark.", "Er ist stark."
+    ]
+    assert client.get("/healthcheck/database").json()["dataVersion"] == 7
+
+
+def test_connection_after_swap(client: TestClient, updated_database: str, monkeypatch):
+    previous_pool = get_pool()
+    asyncio.run(swap_database(updated_database))
+    for thread in drain_threads():
+        thread.join(5)
+
+    # fails at once instead of waiting for a connection which is never returned
+    with pytest.raises(PoolClosedError):
+        with previous_pool.connection():
+            pass
+
+    # a request which got the previous pool before the swap, but no connection of it
+    pools = iter([previous_pool])
+    monkeypatch.setattr(exercise_repository, "get_pool", lambda: next(pools, exercise_repository.pool))
+    assert run_on_current_connection(query_data_version) == 7
+
+
+def test_database_is_reopened_after_close(client: TestClient):
+    previous_pool = get_pool()
+    asyncio.run(close_database())
+    assert exercise_repository.pool is None
+    assert client.get(exercises_url).status_code == 200
+    assert get_pool() is not previous_pool
+
+
+def test_swap_keeps_database_if_new_one_is_broken(client: TestClient, tmp_path):
+    path = tmp_path / "broken.db"
+    path.write_bytes(b"this is not a database")
+    previous_pool = get_pool()
+    with pytest.raises(sqlite3.DatabaseError):
+        asyncio.run(swap_database(str(path)))
+    assert get_pool() is previous_pool
+    assert client.get(exercises_url).status_code == 200
+
+
+def test_admin_reload(client: TestClient, updated_database: str, monkeypatch):
+    assert client.post("/admin/database/reload").status_code == 404
+
+    monkeypatch.setattr(settings, "taskpool_admin_token", "secret")
+    monkeypatch.setattr(settings, "taskpool_db_path", updated_database)
+    assert client.post("/admin/database/reload").status_code == 403
+    assert client.post("/admin/database/reload", headers={"X-Admin-Token": "wrong"}).status_code == 403
+
+    response = client.post("/admin/database/reload", headers={"X-Admin-Token": "secret"})
+    assert response.status_code == 200
+    assert response.json()["dataVersion"] == 7
+    assert len(client.get(exercises_url).json()) == 2
+
+
+def test_admin_reload_of_broken_database(client: TestClient, tmp_path, monkeypatch):
+    path = tmp_path / "broken.db"
+    path.write_bytes(b"this is not a database")
+    monkeypatch.setattr(settings, "taskpool_admin_token", "secret")
+    monkeypatch.setattr(settings, "taskpool_db_path", str(path))
+    previous_pool = get_pool()
+
+    response = client.post("/admin/database/reload", headers={"X-Admin-Token": "secret"})
+    assert response.status_code == 503
+    assert "previous one" in response.json()["detail"]
+    assert get_pool() is previous_pool
+    assert client.get(exercises_url).status_code == 200
+
+
+def test_watch_database(tmp_path, updated_database: str, monkeypatch):
+    path = str(tmp_path / "watched.db")
+    shutil.copy("test.db", path)
+    monkeypatch.setattr(settings, "taskpool_db_path", path)
+
+    async def replace_database():
+        watcher = asyncio.create_task(watch_database(path, interval=0.02))
+        await asyncio.sleep(0.05)
+        previous_pool = get_pool()
+        os.replace(updated_database, path)
+        for _ in range(100):
+            await asyncio.sleep(0.02)
+            if get_pool() is not previous_pool:
+                break
+        watcher.cancel()
+
+    asyncio.run(replace_database())
+    assert get_pool().path == path
+    with get_pool().connection() as con:
+        assert con.execute("SELECT COUNT(*) FROM exercise").fetchone()[0] == 2
@@ -1,4 +1,7 @@
+import json
 from fastapi.testclient import TestClient
+from repositories import exercise_repository
+from settings import settings
 from . import client, app
 
 # expected common data
@@ -219,3 +222,83 @@ def test_exercises_bitmark_content(client: TestClient):
             "text": "."
         }
     ]
+
+
+def test_exercises_batch(client: TestClient):
+    response = client.post("/exercises/batch", json={
+        "translationPair": "uk->de",
+        "words": [target_word, "unknown", target_word],
+        "exerciseType": "bitmark.cloze"
+    })
+    single = client.get(f"/exercises?translationPair=uk->de&word={target_word}&exerciseType=bitmark.cloze")
+
+    assert response.status_code == 200
+    assert response.json() == [
+        {
+            "word": target_word,
+            "exercises": single.json()
+        },
+        {
+            "word": "unknown",
+            "exercises": []
+        }
+    ]
+
+
+def test_exercises_batch_without_words(client: TestClient):
+    response = client.post("/exercises/batch", json={"translationPair": "uk->de", "words": []})
+    assert response.status_code == 422
+
+
+def test_words_pagination(client: TestClient):
+    first_page = client.get("/words?translationPair=uk->de&limit=1")
+    assert first_page.status_code == 200
+    assert first_page.json() == [{"word": target_word}]
+    assert first_page.headers["X-Next-Cursor"] == target_word
+
+    next_page = client.get(f"/words?translationPair=uk->de&limit=1&after={first_page.headers['X-Next-Cursor']}")
+    assert next_page.status_code == 200
+    assert next_page.json() == []
+    assert "X-Next-Cursor" not in next_page.headers
+
+
+def test_exercises_pagination(client: TestClient):
+    url = f"/exercises?translationPair=uk->de&word={target_word}&exerciseType=bitmark.cloze"
+    first_page = client.get(url + "&limit=1")
+    assert first_page.json() == client.get(url).json()
+
+    next_page = client.get(url + f"&limit=1&after={first_page.headers['X-Next-Cursor']}")
+    assert next_page.json() == []
+
+
+def test_ndjson_streaming(client: TestClient):
+    ndjson = {"Accept": "application/x-ndjson"}
+
+    words = client.get("/words?translationPair=uk->de", headers=ndjson)
+    assert words.status_code == 200
+    assert words.headers["content-type"] == "application/x-ndjson"
+    assert words.text == '{"word":"stark"}\n'
+
+    url = f"/exercises?translationPair=uk->de&word={target_word}&exerciseType=bitmark.cloze"
+    exercises = client.get(url, headers=ndjson)
+    assert exercises.status_code == 200
+    assert [json.loads(line) for line in exercises.text.splitlines()] == client.get(url).json()
+
+
+def test_ndjson_pages(client: TestClient, monkeypatch):
+    ndjson = {"Accept": "application/x-ndjson"}
+    url = f"/exercises?translationPair=uk->de&word={target_word}&exerciseType=bitmark.cloze"
+
+    words = client.get("/words?translationPair=uk->de&limit=1", headers=ndjson)
+    assert words.text == '{"word":"stark"}\n'
+    assert words.headers["X-Next-Cursor"] == "stark"
+    exercises = client.get(url + "&limit=1", headers=ndjson)
+    assert exercises.headers["X-Next-Cursor"] == client.get(url + "&limit=1").headers["X-Next-Cursor"]
+    assert "X-Next-Cursor" not in client.get(url + "&limit=2", headers=ndjson).headers
+
+    # without a limit every batch is a query of its own
+    monkeypatch.setattr(settings, "taskpool_in_memory_index", False)
+    monkeypatch.setattr(exercise_repository, "stream_batch_size", 1)
+    assert client.get("/words?translationPair=uk->de", headers=ndjson).text == '{"word":"stark"}\n'
+    assert [json.loads(line) for line in client.get(url, headers=ndjson).text.splitlines()] == \
+           client.get(url).json()
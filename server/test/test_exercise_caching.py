@@ -0,0 +1,92 @@
+import asyncio
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from fastapi.testclient import TestClient
+from models.api_models import ExerciseType, internal_exercise_to_exercise
+from models.exercise_renderer import render_exercise
+from repositories import exercise_repository
+from responses import FastJSONResponse
+from settings import settings
+from .test_exercise_renderer import exercises, base_url, audio_clips
+from . import client, app
+
+url = "/exercises?translationPair=uk->de&word=stark"
+
+
+def choice_order(response) -> list:
+    bit = response.json()[0]["bitmark"]["multipleChoiceText"]
+    gap = next(element for element in bit["body"] if element["type"] == "choices")
+    return [choice["choice"] for choice in gap["choices"]]
+
+
+def test_not_modified(client: TestClient):
+    response = client.get(url)
+    etag = response.headers["etag"]
+    assert response.headers["cache-control"] == settings.taskpool_exercises_cache_control
+    assert response.headers["vary"] == "Accept, Accept-Encoding"
+
+    not_modified = client.get(url, headers={"If-None-Match": etag})
+    assert not_modified.status_code == 304
+    assert not_modified.content == b""
+    assert not_modified.headers["etag"] == etag
+    assert client.get(url, headers={"If-None-Match": '"other", ' + etag}).status_code == 304
+    assert client.get(url, headers={"If-None-Match": '"other"'}).status_code == 200
+
+
+def test_etag_depends_on_request(client: TestClient):
+    etag = client.get(url).headers["etag"]
+    assert client.get(url).headers["etag"] == etag
+    assert client.get(url + "&exerciseType=bitmark.cloze").headers["etag"] != etag
+    assert client.get(url + "&limit=1").headers["etag"] != etag
+    ndjson = client.get(url, headers={"Accept": "application/x-ndjson"})
+    assert ndjson.headers["etag"] != etag
+    assert client.get(url, headers={"Accept": "application/x-ndjson", "If-None-Match": ndjson.headers["etag"]}) \
+        .status_code == 304
+
+
+def test_etag_depends_on_data_version(client: TestClient, monkeypatch):
+    etag = client.get(url).headers["etag"]
+    monkeypatch.setattr(exercise_repository, "data_version_cache", (exercise_repository.get_pool(), 99))
+    assert client.get(url).headers["etag"] != etag
+
+
+def test_data_version_is_cached_for_immutable_databases(monkeypatch):
+    monkeypatch.setattr(exercise_repository, "data_version_cache", None)
+    monkeypatch.setattr(settings, "taskpool_db_immutable", False)
+    version = asyncio.run(exercise_repository.get_current_data_version())
+    assert exercise_repository.data_version_cache is None
+
+    monkeypatch.setattr(settings, "taskpool_db_immutable", True)
+    assert asyncio.run(exercise_repository.get_current_data_version()) == version
+    assert exercise_repository.data_version_cache == (exercise_repository.get_pool(), version)
+
+
+def test_shuffled_choices_are_not_cached(client: TestClient):
+    response = client.get(url + "&exerciseType=bitmark.multiple-choice-text")
+    assert "etag" not in response.headers
+    assert "cache-control" not in response.headers
+
+
+def test_seeded_choices(client: TestClient):
+    seeded = url + "&exerciseType=all&seed={}"
+    first = client.get(seeded.format(1))
+    assert "etag" in first.headers
+    assert client.get(seeded.format(1)).content == first.content
+    orders = {tuple(choice_order(client.get(seeded.format(seed)))) for seed in range(10)}
+    assert len(orders) > 1
+    assert all(sorted(order) == ["hart", "krank", "scharf", "stark"] for order in orders)
+
+
+def test_deterministic_choices(client: TestClient, monkeypatch):
+    monkeypatch.setattr(settings, "taskpool_deterministic_choices", True)
+    response = client.get(url + "&exerciseType=all")
+    assert "etag" in response.headers
+    assert client.get(url + "&exerciseType=all").content == response.content
+
+
+def test_seeded_render_is_byte_equivalent():
+    for exercise in exercises:
+        expected = JSONResponse(jsonable_encoder(internal_exercise_to_exercise(exercise, ExerciseType.ALL, base_url, audio_clips,
+                                                                               seed=3)))
+        actual = FastJSONResponse(render_exercise(exercise, ExerciseType.ALL, base_url, audio_clips, seed=3))
+        assert actual.body == expected.body
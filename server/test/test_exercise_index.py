@@ -0,0 +1,108 @@
+import asyncio
+import sqlite3
+from typing import List
+from models.internal_models import InternalTranslationPair, Language, InternalExercise
+from repositories import exercise_repository
+from repositories.exercise_index import ExerciseIndex
+from settings import settings
+from .test_database_swap import create_updated_database
+from . import client, app
+
+uk_de = InternalTranslationPair(Language.uk, Language.de)
+de_en = InternalTranslationPair(Language.de, Language.en)
+
+
+def test_index_contains_pool():
+    index = exercise_repository.load_exercise_index()
+    assert len(index) == 1
+    assert index.get_words(uk_de) == ["stark"]
+    assert index.get_words(de_en) == []
+    assert index.get_exercises(uk_de, "stark")[0].similar_words == ["scharf", "krank", "hart"]
+    assert index.get_exercises(uk_de, "unknown") == []
+
+
+def fields(exercises: List[InternalExercise]) -> List[dict]:
+    # without the segments, which are cached once they were used
+    return [{k: v for k, v in vars(e).items() if k != "segments"} for e in exercises]
+
+
+def test_index_matches_sqlite(monkeypatch):
+    def fetch():
+        words = asyncio.run(exercise_repository.get_learnable_words(uk_de))
+        exercises = asyncio.run(exercise_repository.find_internal_exercises(uk_de, "stark"))
+        page = asyncio.run(exercise_repository.find_internal_exercises(uk_de, "stark", limit=1, after=""))
+        batch = asyncio.run(exercise_repository.find_internal_exercises_for_words(uk_de, ["stark", "unknown"]))
+        return words, fields(exercises), fields(page), {word: fields(e) for word, e in batch.items()}
+
+    monkeypatch.setattr(settings, "taskpool_in_memory_index", False)
+    from_sqlite = fetch()
+    monkeypatch.setattr(settings, "taskpool_in_memory_index", True)
+    from_index = fetch()
+
+    assert exercise_repository.exercise_index is not None
+    assert from_index == from_sqlite
+    assert [e["target_word"] for e in from_index[1]] == ["stark"]
+
+
+def test_exercises_are_read_from_sqlite_while_the_index_is_built(monkeypatch):
+    monkeypatch.setattr(settings, "taskpool_in_memory_index", True)
+    monkeypatch.setattr(exercise_repository, "exercise_index", None)
+
+    async def run():
+        await exercise_repository.start_background_build()
+        # answered by SQLite, the request does not wait for the index
+        exercises = await exercise_repository.find_internal_exercises(uk_de, "stark")
+        assert exercise_repository.exercise_index is None
+        await exercise_repository.background_build
+        return exercises
+
+    assert [e.target_word for e in asyncio.run(run())] == ["stark"]
+    assert exercise_repository.exercise_index is not None
+
+
+def test_index_and_word_search_follow_incremental_imports(client, tmp_path, monkeypatch):
+    path = str(tmp_path / "taskpool.db")
+    create_updated_database(path)
+    monkeypatch.setattr(settings, "taskpool_db_immutable", False)
+    monkeypatch.setattr(settings, "taskpool_in_memory_index", True)
+    asyncio.run(exercise_repository.swap_database(path))
+    try:
+        assert client.get("/words?translationPair=uk->de&prefix=s").json() == [{"word": "stark"}]
+        assert client.get("/exercises?translationPair=uk->de&word=schwach").json() == []
+
+        # what populate_exercise_table.py --incremental does to the database of a running server
+        with sqlite3.connect(path) as conn:
+            conn.executescript("""
+            INSERT INTO exercise VALUES ('third-id', 2, 'schwach', '["stark"]', 3, 4, 'UK', 'DE');
+            UPDATE data_version SET version = 8 WHERE id = 1;
+            """)
+        conn.close()
+
+        words = client.get("/words?translationPair=uk->de&prefix=s").json()
+        assert sorted(word["word"] for word in words) == ["schwach", "stark"]
+        assert len(client.get("/exercises?translationPair=uk->de&word=schwach").json()) == 1
+        assert exercise_repository.exercise_index.data_version == 8
+        assert exercise_repository.word_search.data_version == 8
+    finally:
+        # the database of the other tests is opened as configured for them
+        monkeypatch.undo()
+        asyncio.run(exercise_repository.swap_database("test.db"))
+
+
+def exercise(id: str, word: str) -> InternalExercise:
+    return InternalExercise(id=id, translation_id=1, target_word=word, similar_words=[], source_sentence_id=1,
+                            source_sentence_text="", source_sentence_language="uk", target_sentence_id=2,
+                            target_sentence_text="", target_sentence_language="de")
+
+
+def test_index_pagination():
+    index = ExerciseIndex([exercise("c", "Haus"), exercise("a", "Maus"), exercise("b", "Haus"), exercise("d", "Baum")])
+
+    assert index.get_words(uk_de) == ["Baum", "Haus", "Maus"]
+    assert index.get_words(uk_de, limit=2) == ["Baum", "Haus"]
+    assert index.get_words(uk_de, limit=2, after="Haus") == ["Maus"]
+    assert index.get_words(uk_de, after="Hau") == ["Haus", "Maus"]
+
+    assert [e.id for e in index.get_exercises(uk_de, "Haus")] == ["b", "c"]
+    assert [e.id for e in index.get_exercises(uk_de, "Haus", limit=1)] == ["b"]
+    assert [e.id for e in index.get_exercises(uk_de, "Haus", after="b")] == ["c"]
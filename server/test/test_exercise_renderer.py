@@ -0,0 +1,51 @@
+import random
+import pytest
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from fastapi.testclient import TestClient
+import responses
+from models.api_models import ExerciseType, internal_exercise_to_exercise
+from models.exercise_renderer import render_exercise
+from models.internal_models import InternalExercise
+from responses import FastJSONResponse
+from . import client, app
+
+base_url = "http://testserver/"
+# the clips of server/test/audio, the second exercise has no audio
+audio_clips = {"DE-2.mp3"}
+
+exercises = [
+    InternalExercise(id="feedback-id", translation_id=1, target_word="stark", similar_words=["scharf", "krank", "hart"],
+                     source_sentence_id=1, source_sentence_text="дуже сильний дощ.", source_sentence_language="uk",
+                     target_sentence_id=2, target_sentence_text="Es regnet sehr stark.", target_sentence_language="de"),
+    InternalExercise(id="0cc175b9c0f1b6a831c399e269772661", translation_id=7, target_word="z.B.", similar_words=[],
+                     source_sentence_id=10, source_sentence_text="Er sagt: \"z.B.\"\tund\nmehr\\",
+                     source_sentence_language="de", target_sentence_id=11,
+                     target_sentence_text="He says \"z.B.\", z.B. ä € 😀   \x01", target_sentence_language="en"),
+]
+
+
+@pytest.fixture(params=[True, False], ids=["orjson", "json"])
+def encoder(request, monkeypatch):
+    if not request.param:
+        monkeypatch.setattr(responses, "orjson", None)
+
+
+@pytest.mark.parametrize("exercise_type", list(ExerciseType))
+def test_render_exercise_is_byte_equivalent(encoder, exercise_type: ExerciseType):
+    for exercise in exercises:
+        random.seed(exercise.id)
+        expected = JSONResponse(jsonable_encoder(internal_exercise_to_exercise(exercise, exercise_type, base_url, audio_clips)))
+        random.seed(exercise.id)
+        actual = FastJSONResponse(render_exercise(exercise, exercise_type, base_url, audio_clips))
+
+        assert actual.body == expected.body
+
+
+def test_exercises_endpoint_is_byte_equivalent(client: TestClient):
+    random.seed(1)
+    response = client.get("/exercises?translationPair=uk->de&word=stark&exerciseType=all")
+    random.seed(1)
+    expected = JSONResponse(jsonable_encoder([internal_exercise_to_exercise(exercises[0], ExerciseType.ALL, base_url, audio_clips)]))
+
+    assert response.content == expected.body
@@ -0,0 +1,117 @@
+import json
+import os
+import threading
+import time
+import pytest
+from generate_sentence_audio import (Clip, RateLimiter, StubBackend, TtsBackend, generate_audio, read_clips,
+                                     MANIFEST_FILE)
+
+exercise_tsv = """translation_id\tword\tsource_sentence_id\tsource_sentence\ttarget_language\ttarget_sentence_id\ttarget_sentence\tdifficulty
+1\tHaus\t1\tЦе мій дім.\tDE\t2\tDas ist mein Haus.\t0
+2\tHaus\t1\tЦе мій дім.\tDE\t2\tDas ist mein Haus.\t0
+3\tdім\t2\tDas ist mein Haus.\tUK\t1\tЦе мій дім.\t0
+4\tMaus\t3\tЦе миша.\tDE\t4\tDas ist eine Maus.\t0
+"""
+
+
+class FlakyBackend(StubBackend):
+    """Fails the first requests of every text, permanently for texts containing "Fehler"."""
+
+    def __init__(self, failures: int):
+        self.failures = failures
+        self.attempts = {}
+        self.concurrent = 0
+        self.max_concurrent = 0
+        self.lock = threading.Lock()
+
+    def synthesize(self, text: str, voice: str, language_code: str) -> bytes:
+        with self.lock:
+            self.attempts[text] = self.attempts.get(text, 0) + 1
+            self.concurrent += 1
+            self.max_concurrent = max(self.max_concurrent, self.concurrent)
+        try:
+            time.sleep(0.01)
+            if "Fehler" in text:
+                raise ValueError("invalid text")
+            if self.attempts[text] <= self.failures:
+                raise ConnectionError("throttled")
+            return super().synthesize(text, voice, language_code)
+        finally:
+            with self.lock:
+                self.concurrent -= 1
+
+    def is_retryable(self, error: Exception) -> bool:
+        return not isinstance(error, ValueError)
+
+
+def clips(count: int):
+    return [Clip("DE-{}.mp3".format(i), "Satz {}".format(i), "Daniel", "de-DE") for i in range(count)]
+
+
+def test_read_clips(tmp_path):
+    path = tmp_path / "exercise-import.tsv"
+    path.write_text(exercise_tsv)
+    # Ukrainian has no voice, the first sentence appears twice
+    assert [(clip.filename, clip.text, clip.voice, clip.language_code) for clip in read_clips(str(path))] == [
+        ("DE-2.mp3", "Das ist mein Haus.", "Daniel", "de-DE"),
+        ("DE-4.mp3", "Das ist eine Maus.", "Daniel", "de-DE"),
+    ]
+
+
+def test_generation_is_incremental(tmp_path):
+    output_dir = str(tmp_path / "audio")
+    assert generate_audio(clips(5), output_dir, StubBackend(), rate=0) == {"generated": 5, "skipped": 0, "failed": 0}
+    assert (tmp_path / "audio" / "DE-3.mp3").read_bytes() == b"de-DE|Daniel|Satz 3"
+    with open(os.path.join(output_dir, MANIFEST_FILE)) as f:
+        assert len(json.load(f)["clips"]) == 5
+
+    assert generate_audio(clips(5), output_dir, StubBackend(), rate=0) == {"generated": 0, "skipped": 5, "failed": 0}
+
+    changed = clips(6)
+    changed[1].text = "Ein anderer Satz"
+    os.remove(os.path.join(output_dir, "DE-2.mp3"))
+    # clips without an entry in the manifest are kept
+    (tmp_path / "audio" / "DE-5.mp3").write_bytes(b"from the notebook")
+    assert generate_audio(changed, output_dir, StubBackend(), rate=0) == {"generated": 2, "skipped": 4, "failed": 0}
+    assert (tmp_path / "audio" / "DE-1.mp3").read_bytes() == b"de-DE|Daniel|Ein anderer Satz"
+    assert (tmp_path / "audio" / "DE-5.mp3").read_bytes() == b"from the notebook"
+    assert sorted(os.listdir(output_dir)) == ["DE-{}.mp3".format(i) for i in range(6)] + [MANIFEST_FILE]
+
+
+def test_failed_requests_are_retried(tmp_path):
+    output_dir = str(tmp_path / "audio")
+    backend = FlakyBackend(failures=2)
+    requested = clips(8)
+    requested[3].text = "Fehler"
+    assert generate_audio(requested, output_dir, backend, workers=3, rate=0, retries=2, backoff=0.001) == {
+        "generated": 7, "skipped": 0, "failed": 1}
+    assert backend.attempts["Satz 0"] == 3
+    assert backend.attempts["Fehler"] == 1
+    assert backend.max_concurrent <= 3
+    assert not os.path.exists(os.path.join(output_dir, "DE-3.mp3"))
+
+    # the failed clip is generated by the next run
+    requested[3].text = "Satz 3"
+    assert generate_audio(requested, output_dir, StubBackend(), rate=0) == {"generated": 1, "skipped": 7, "failed": 0}
+
+    backend = FlakyBackend(failures=3)
+    assert generate_audio(clips(1), str(tmp_path / "other"), backend, rate=0, retries=2, backoff=0.001) == {
+        "generated": 0, "skipped": 0, "failed": 1}
+
+
+def test_rate_limiter():
+    limiter = RateLimiter(100)
+    started = time.monotonic()
+    for _ in range(6):
+        limiter.acquire()
+    assert time.monotonic() - started >= 0.05
+
+
+def test_backend_interface():
+    class IncompleteBackend(TtsBackend):
+        name = "incomplete"
+
+    # a backend without synthesize fails when it is created, not in the workers
+    with pytest.raises(TypeError):
+        IncompleteBackend()
+    assert StubBackend().is_retryable(ConnectionError())
@@ -1,4 +1,6 @@
+import json
 from fastapi.testclient import TestClient
+from settings import settings
 from . import client, app
 
 
@@ -9,3 +11,31 @@ def test_healthcheck(client: TestClient):
     response_json = response.json()
     assert response_json["healthy"]
     assert response_json["status"] == "Up and running!"
+
+
+def test_database_pool_status(client: TestClient):
+    client.get("/words?translationPair=uk->de")
+    response = client.get("/healthcheck/database")
+    assert response.status_code == 200
+
+    response_json = response.json()
+    assert response_json["size"] == response_json["idle"] + response_json["inUse"]
+    assert response_json["acquisitions"] >= 1
+    # test.db was not populated by the import script
+    assert response_json["dataVersion"] == 0
+
+
+def test_openapi_is_built_lazily_and_cached(client: TestClient, app, monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "taskpool_openapi_cache_dir", str(tmp_path))
+    monkeypatch.setattr(app, "openapi_schema", None)
+    response = client.get("/openapi.json")
+    assert response.status_code == 200
+    assert "/exercises" in response.json()["paths"]
+
+    cached = tmp_path / "openapi-{}.json".format(response.json()["info"]["version"])
+    assert json.loads(cached.read_text()) == response.json()
+
+    # a new process reads the cached document instead of building it
+    cached.write_text(json.dumps({**response.json(), "info": {"title": "cached", "version": "0"}}))
+    app.openapi_schema = None
+    assert client.get("/openapi.json").json()["info"]["title"] == "cached"
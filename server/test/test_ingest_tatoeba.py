@@ -0,0 +1,78 @@
+import pandas as pd
+import pytest
+import ingest_tatoeba
+from ingest_tatoeba import read_chunks, build_tatoeba_sentences, build_translations
+
+LANGUAGES = ["deu", "ukr", "eng"]
+SENTENCES = 1000
+# long enough that a megabyte holds a few hundred rows
+TEXT = " ".join(["Wort"] * 400)
+
+
+def language(sentence_id: int) -> str:
+    return LANGUAGES[sentence_id % len(LANGUAGES)]
+
+
+@pytest.fixture
+def tatoeba(tmp_path, monkeypatch):
+    """Small dumps in the format of the Tatoeba exports, read in chunks of a few hundred rows."""
+    tatoeba_dir = tmp_path / "data-tatoeba"
+    output_dir = tmp_path / "data-generated"
+    tatoeba_dir.mkdir()
+    output_dir.mkdir()
+    with open(tatoeba_dir / "sentences_detailed.csv", "w") as f:
+        for i in range(1, SENTENCES + 1):
+            f.write(f"{i}\t{language(i)}\t\u201e{i}\u201c {TEXT}\tauthor\t2020-01-01\t2020-01-01\n")
+    with open(tatoeba_dir / "sentences_base.csv", "w") as f:
+        # the base of the last sentence is missing
+        for i in range(1, SENTENCES):
+            f.write("{}\t{}\n".format(i, i - 1 if i % 2 == 0 else "\\N"))
+    with open(tatoeba_dir / "links.csv", "w") as f:
+        # both directions of every link, as in the export
+        for s1, s2 in [(1, 2), (2, 4), (1, 3), (998, 997), (2, 5)]:
+            f.write(f"{s1}\t{s2}\n{s2}\t{s1}\n")
+
+    monkeypatch.setattr(ingest_tatoeba, "TATOEBA_DIR", str(tatoeba_dir))
+    monkeypatch.setattr(ingest_tatoeba, "OUTPUT_DIR", str(output_dir))
+    monkeypatch.setattr(ingest_tatoeba, "INITIAL_CHUNK_ROWS", 7)
+    monkeypatch.setattr(ingest_tatoeba, "MIN_CHUNK_ROWS", 1)
+    return tmp_path
+
+
+def test_chunks_stay_within_the_memory_limit(tatoeba):
+    chunks = list(read_chunks(str(tatoeba / "data-tatoeba" / "sentences_detailed.csv"), 1,
+                              usecols=range(4), names=["id", "language", "text", "author"], index_col="id"))
+
+    assert len(chunks[0]) == 7
+    assert len(chunks) > 3
+    assert sum(len(chunk) for chunk in chunks) == SENTENCES
+    # half of the limit, the rest is left for the filtered copy
+    assert all(chunk.memory_usage(deep=True).sum() <= 1024 * 1024 // 2 for chunk in chunks)
+
+
+def test_sentences_are_filtered_by_language(tatoeba):
+    sentence_ids = build_tatoeba_sentences({"deu": "DE", "ukr": "UK"}, [], 1)
+    sentences = pd.read_csv(tatoeba / "data-generated" / "sentences.tsv", sep="\t", index_col="id")
+
+    expected = [i for i in range(1, SENTENCES + 1) if language(i) != "eng"]
+    assert sorted(sentence_ids) == expected
+    # the header is only written with the first chunk
+    assert list(sentences.index) == expected
+    assert list(sentences.language) == [{"deu": "DE", "ukr": "UK"}[language(i)] for i in expected]
+    assert sentences.text[4] == f"\"4\" {TEXT}"
+    assert sentences.translated_from[4] == 3
+    assert sentences.translated_from[7] == -1
+    assert sentences.translated_from[SENTENCES] == -2
+    assert sentences.word_count[4] == 401
+
+
+def test_translations_are_deduplicated(tatoeba):
+    build_translations({1, 2, 4, 5, 997, 998})
+    translations = pd.read_csv(tatoeba / "data-generated" / "translations.tsv", sep="\t")
+
+    # one row per link in ascending order, links to sentences which were not kept are dropped
+    assert list(translations.itertuples(index=False, name=None)) == [(1, 2), (2, 4), (997, 998), (2, 5)]
+
+    build_translations({1, 2}, dedup=False)
+    translations = pd.read_csv(tatoeba / "data-generated" / "translations.tsv", sep="\t")
+    assert list(translations.itertuples(index=False, name=None)) == [(1, 2), (2, 1)]
@@ -0,0 +1,33 @@
+from models.internal_models import segment_sentence
+
+
+def test_segment_sentence():
+    assert segment_sentence("Es regnet sehr stark.", "stark") == (
+        ("Es regnet sehr ", False),
+        ("stark", True),
+        (".", False)
+    )
+
+
+def test_segment_sentence_multiple_occurrences():
+    assert segment_sentence("stark und stark", "stark") == (
+        ("stark", True),
+        (" und ", False),
+        ("stark", True)
+    )
+    # whitespace between two gaps is dropped
+    assert segment_sentence("Ja ja", "ja") == (("Ja ", False), ("ja", True))
+
+
+def test_segment_sentence_with_regex_metacharacters():
+    assert segment_sentence("Das ist z.B. ein Beispiel.", "z.B.") == (
+        ("Das ist ", False),
+        ("z.B.", True),
+        (" ein Beispiel.", False)
+    )
+    assert segment_sentence("Ein Wort (mit) Klammern", "(mit)") == (
+        ("Ein Wort ", False),
+        ("(mit)", True),
+        (" Klammern", False)
+    )
+    assert segment_sentence("zxB. ist kein z.B.", "z.B.") == (("zxB. ist kein ", False), ("z.B.", True))
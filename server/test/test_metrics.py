@@ -0,0 +1,77 @@
+from fastapi.testclient import TestClient
+from metrics import Registry, Counter, Histogram, Gauge, registry
+from . import client, app
+
+
+def sample(text: str, line_prefix: str) -> float:
+    for line in text.splitlines():
+        if line.startswith(line_prefix + " "):
+            return float(line.rsplit(" ", 1)[1])
+    return 0.0
+
+
+def test_histogram_rendering():
+    histogram = Histogram("test_duration_seconds", "Test.", ("route",), buckets=(0.1, 1.0))
+    histogram.observe(0.05, "/a")
+    histogram.observe(0.1, "/a")
+    histogram.observe(5, "/a")
+
+    assert histogram.render() == [
+        "# HELP test_duration_seconds Test.",
+        "# TYPE test_duration_seconds histogram",
+        'test_duration_seconds_bucket{route="/a",le="0.1"} 2',
+        'test_duration_seconds_bucket{route="/a",le="1"} 2',
+        'test_duration_seconds_bucket{route="/a",le="+Inf"} 3',
+        'test_duration_seconds_sum{route="/a"} 5.15',
+        'test_duration_seconds_count{route="/a"} 3',
+    ]
+
+
+def test_registry_rendering():
+    test_registry = Registry()
+    counter = test_registry.register(Counter("test_total", "Test.", ("name",)))
+    gauge = test_registry.register(Gauge("test_in_flight", "Test."))
+    counter.inc('say "hi"\n')
+    gauge.inc()
+    gauge.inc()
+    gauge.dec()
+
+    assert test_registry.render() == "\n".join([
+        "# HELP test_total Test.",
+        "# TYPE test_total counter",
+        'test_total{name="say \\"hi\\"\\n"} 1',
+        "# HELP test_in_flight Test.",
+        "# TYPE test_in_flight gauge",
+        "test_in_flight 1",
+    ]) + "\n"
+
+
+def test_metrics(client: TestClient):
+    request_prefix = 'taskpool_http_request_duration_seconds_count{method="GET",route="/exercises",status="200",' \
+                     'exercise_type="bitmark.cloze"}'
+    query_prefix = 'taskpool_db_query_rows_count{function="query_exercises"}'
+    bit_prefix = 'taskpool_bit_build_duration_seconds_count{bit_type="cloze"}'
+    before = registry.render()
+
+    response = client.get("/exercises?translationPair=uk->de&word=stark&exerciseType=bitmark.cloze")
+    assert response.status_code == 200
+    exercises = len(response.json())
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    after = response.text
+    assert sample(after, request_prefix) == sample(before, request_prefix) + 1
+    assert sample(after, bit_prefix) == sample(before, bit_prefix) + exercises
+    assert sample(after, query_prefix) == sample(before, query_prefix) + 1
+    # the scrape itself is in flight
+    assert sample(after, "taskpool_http_requests_in_flight") == 1
+    assert 'taskpool_db_pool_connections{state="idle"}' in after
+
+
+def test_metrics_unmatched_route(client: TestClient):
+    prefix = 'taskpool_http_request_duration_seconds_count{method="GET",route="unmatched",status="404",' \
+             'exercise_type=""}'
+    before = sample(registry.render(), prefix)
+    assert client.get("/no-such-route/123").status_code == 404
+    assert sample(registry.render(), prefix) == before + 1
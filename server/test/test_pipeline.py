@@ -0,0 +1,134 @@
+import os
+import pytest
+from pipeline import Pipeline, Stage, STAGES, DEFAULT_CONFIG, format_results, load_config
+
+runs = []
+
+
+def write(path: str, text: str):
+    with open(path, "w") as f:
+        f.write(text)
+
+
+def read(path: str) -> str:
+    with open(path, "r") as f:
+        return f.read()
+
+
+def words(config: dict):
+    runs.append("words")
+    write("words.txt", read("input.txt").upper())
+
+
+def selection(config: dict):
+    runs.append("selection")
+    write("selection.txt", "\n".join(read("words.txt").split()[:config["LIMIT"]]))
+
+
+def report(config: dict):
+    runs.append("report")
+    os.makedirs("report", exist_ok=True)
+    write("report/count.txt", str(len(read("selection.txt").split())))
+
+
+TOY_STAGES = [
+    Stage("report", report, inputs=["selection.txt"], outputs=["report"]),
+    Stage("selection", selection, inputs=["words.txt"], outputs=["selection.txt"], params=["LIMIT"]),
+    Stage("words", words, inputs=["input.txt"], outputs=["words.txt"]),
+]
+
+
+def run(config: dict, targets=("report",), **kwargs):
+    runs.clear()
+    results = Pipeline(TOY_STAGES, config, "cache").run(targets, **kwargs)
+    return {result.stage: result.status for result in results}
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    write("input.txt", "a b c d")
+    return tmp_path
+
+
+def test_stages_are_cached(workdir):
+    assert run({"LIMIT": 2}) == {"words": "ran", "selection": "ran", "report": "ran"}
+    assert runs == ["words", "selection", "report"]
+    assert read("report/count.txt") == "2"
+
+    assert run({"LIMIT": 2}) == {"words": "cached", "selection": "cached", "report": "cached"}
+    assert runs == []
+
+    # a changed parameter reruns its stage and the stages whose inputs changed
+    assert run({"LIMIT": 3}) == {"words": "cached", "selection": "ran", "report": "ran"}
+    assert read("report/count.txt") == "3"
+    assert run({"LIMIT": 5}) == {"words": "cached", "selection": "ran", "report": "ran"}
+    # the same selection as with 5 words
+    assert run({"LIMIT": 4}) == {"words": "cached", "selection": "ran", "report": "cached"}
+    assert read("report/count.txt") == "4"
+
+    # outputs of known keys are restored from the cache
+    assert run({"LIMIT": 2}) == {"words": "cached", "selection": "restored", "report": "restored"}
+    assert runs == []
+    assert read("selection.txt") == "A\nB"
+    assert read("report/count.txt") == "2"
+
+    os.remove("words.txt")
+    assert run({"LIMIT": 2}) == {"words": "restored", "selection": "cached", "report": "cached"}
+
+    write("input.txt", "e f g")
+    assert run({"LIMIT": 2}) == {"words": "ran", "selection": "ran", "report": "ran"}
+    assert read("selection.txt") == "E\nF"
+
+
+def test_targets_force_and_dry_run(workdir):
+    assert run({"LIMIT": 2}, targets=["selection"]) == {"words": "ran", "selection": "ran"}
+    assert run({"LIMIT": 2}, dry_run=True) == {"words": "cached", "selection": "cached", "report": "would run"}
+    assert run({"LIMIT": 3}, dry_run=True) == {"words": "cached", "selection": "would run", "report": "would run"}
+    assert runs == []
+    assert run({"LIMIT": 2}, force=["words"]) == {"words": "ran", "selection": "cached", "report": "ran"}
+
+    with pytest.raises(ValueError):
+        run({"LIMIT": 2}, targets=["unknown"])
+    os.remove("input.txt")
+    with pytest.raises(FileNotFoundError, match="input.txt"):
+        run({"LIMIT": 2})
+
+
+def test_uncached_stage(workdir):
+    stages = [Stage("words", words, inputs=["input.txt"], outputs=["words.txt"], cached=False)] + TOY_STAGES[:2]
+    for _ in range(2):
+        runs.clear()
+        results = Pipeline(stages, {"LIMIT": 2}, "cache").run(["selection"])
+        assert results[0].status == "ran"
+    # the stages after it are still cached by the hash of its outputs
+    assert [result.status for result in results] == ["ran", "cached"]
+    assert runs == ["words"]
+    assert not os.path.exists(os.path.join("cache", "words"))
+    assert [result.status for result in Pipeline(stages, {"LIMIT": 2}, "cache").run(["selection"], dry_run=True)] \
+           == ["would run", "cached"]
+
+
+def test_timings_are_reported(workdir):
+    pipeline = Pipeline(TOY_STAGES, {"LIMIT": 2}, "cache")
+    ran = pipeline.run(["report"])
+    cached = pipeline.run(["report"])
+    assert [result.run_seconds for result in cached] == pytest.approx([result.seconds for result in ran])
+    assert format_results(cached).splitlines()[1].split()[:2] == ["words", "cached"]
+
+
+def test_exercise_pipeline(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    pipeline = Pipeline(STAGES, DEFAULT_CONFIG)
+    assert pipeline.plan(["populate"]) == ["tatoeba", "vocabulary", "lemmata", "import_sql", "precursors",
+                                           "similar_words", "populate"]
+    assert pipeline.dependencies["audio_bundle"] == ["audio"]
+
+    # reviewed files replace the generated ones
+    config = load_config(None, ["EXERCISE_IMPORT=data-import/exercise-import.tsv", "IN_MIN_WORDS=5"])
+    assert config["IN_MIN_WORDS"] == 5
+    pipeline = Pipeline(STAGES, config)
+    assert pipeline.dependencies["populate"] == ["import_sql", "similar_words"]
+    assert pipeline.dependencies["audio"] == []
+    with pytest.raises(ValueError):
+        load_config(None, ["IN_WORD=Haus"])
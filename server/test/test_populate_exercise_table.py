@@ -0,0 +1,184 @@
+import hashlib
+import json
+import sqlite3
+import pytest
+from populate_exercise_table import populate, populate_incremental, load_similar_words_data, bump_data_version, \
+    InvalidPrecursors
+from migrate_exercise_schema import SCHEMA_FILE
+from repositories.connection_pool import ConnectionPool
+from repositories.exercise_repository import query_data_version
+
+exercise_tsv = """word\ttranslation_id\ttarget_sentence_id\tsource_sentence_id
+Haus\t1\t2\t1
+Haus\t2\t3\t1
+Maus\t3\t4\t1
+Baum\t4\t5\t1
+Haus\t5\t99\t1
+"""
+
+similar_words_tsv = """word\tsimilar_0\tsimilar_1\tsimilar_2
+Haus\tMaus\tLaus\t
+Maus\tHaus\t\t
+Haus\tBaum\t\t
+Tisch\t\t\t
+"""
+
+
+def write_inputs(tmp_path):
+    exercise_path = tmp_path / "exercise-import.tsv"
+    similar_words_path = tmp_path / "similar-words-import.tsv"
+    exercise_path.write_text(exercise_tsv)
+    similar_words_path.write_text(similar_words_tsv)
+    return str(exercise_path), str(similar_words_path)
+
+
+def create_database(path: str, legacy: bool = False):
+    with sqlite3.connect(path) as conn:
+        if legacy:
+            # as created by pandas' to_sql, without keys, indexes or languages
+            conn.executescript("""
+            CREATE TABLE sentences (id INTEGER PRIMARY KEY, language VARCHAR(255), text TEXT);
+            CREATE TABLE exercise (id TEXT, translation_id INTEGER, target_word TEXT, similar_words TEXT,
+                                   source_sentence_id INTEGER, target_sentence_id INTEGER);
+            INSERT INTO exercise VALUES ('old', 1, 'alt', '[]', 1, 2);
+            """)
+        else:
+            with open(SCHEMA_FILE, "r") as f:
+                conn.executescript(f.read())
+            conn.execute("INSERT INTO exercise VALUES ('old', 1, 'alt', '[]', 1, 2, 'UK', 'DE')")
+        conn.executemany("INSERT INTO sentences (id, language, text) VALUES (?, ?, ?)", [
+            (1, "UK", "Це мій дім."), (2, "DE", "Das ist mein Haus."), (3, "DE", "Das Haus ist groß."),
+            (4, "DE", "Die Maus ist klein."), (5, "DE", "Der Baum ist grün.")
+        ])
+
+
+def run_populate(path: str, exercise_path: str, similar_words_path: str, skip_invalid: bool = True) -> int:
+    conn = sqlite3.connect(path, isolation_level=None)
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        imported = populate(conn, exercise_path, similar_words_path, skip_invalid)
+    except Exception:
+        conn.execute("ROLLBACK")
+        conn.close()
+        raise
+    conn.execute("COMMIT")
+    conn.close()
+    return imported
+
+
+def test_load_similar_words_data(tmp_path):
+    _, similar_words_path = write_inputs(tmp_path)
+    assert load_similar_words_data(similar_words_path) == {
+        "Haus": '["Maus", "Laus"]',
+        "Maus": '["Haus"]',
+        "Tisch": "[]"
+    }
+
+
+def test_populate_keeps_schema(tmp_path):
+    for legacy in [False, True]:
+        path = str(tmp_path / "taskpool-{}.db".format(legacy))
+        create_database(path, legacy)
+        assert run_populate(path, *write_inputs(tmp_path)) == 3
+
+        conn = sqlite3.connect(path)
+        rows = conn.execute("SELECT * FROM exercise ORDER BY translation_id").fetchall()
+        # Baum has no similar words entry and sentence 99 does not exist
+        assert rows == [
+            (hashlib.md5(b"1_2").hexdigest(), 1, "Haus", '["Maus", "Laus"]', 1, 2, "UK", "DE"),
+            (hashlib.md5(b"1_3").hexdigest(), 2, "Haus", '["Maus", "Laus"]', 1, 3, "UK", "DE"),
+            (hashlib.md5(b"1_4").hexdigest(), 3, "Maus", '["Haus"]', 1, 4, "UK", "DE"),
+        ]
+        assert json.loads(rows[0][3]) == ["Maus", "Laus"]
+        assert conn.execute("PRAGMA user_version").fetchone()[0] == 1
+        indexes = [name for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index' "
+                                                     "AND tbl_name = 'exercise'")]
+        assert "idx_exercise_translation_pair_word" in indexes
+        assert any(name.startswith("sqlite_autoindex_exercise") for name in indexes)
+        conn.close()
+
+
+def test_populate_incremental(tmp_path):
+    path = str(tmp_path / "taskpool.db")
+    create_database(path)
+    exercise_path, similar_words_path = write_inputs(tmp_path)
+    run_populate(path, exercise_path, similar_words_path)
+    conn = sqlite3.connect(path, isolation_level=None)
+    before = dict(conn.execute("SELECT id, rowid FROM exercise"))
+
+    # Baum gets similar words, Maus new ones and the second Haus exercise is removed
+    (tmp_path / "exercise-import.tsv").write_text(exercise_tsv.replace("Haus\t2\t3\t1\n", ""))
+    (tmp_path / "similar-words-import.tsv").write_text(similar_words_tsv.replace("Maus\tHaus", "Maus\tLaus") +
+                                                      "Baum\tRaum\t\t\n")
+    conn.execute("BEGIN IMMEDIATE")
+    assert populate_incremental(conn, exercise_path, similar_words_path, skip_invalid=True) == (1, 1, 1)
+    conn.execute("COMMIT")
+
+    assert conn.execute("SELECT target_word, similar_words FROM exercise ORDER BY translation_id").fetchall() == [
+        ("Haus", '["Maus", "Laus"]'), ("Maus", '["Laus"]'), ("Baum", '["Raum"]')
+    ]
+    # the unchanged exercise was not rewritten
+    assert conn.execute("SELECT rowid FROM exercise WHERE translation_id = 1").fetchone()[0] == \
+           before[hashlib.md5(b"1_2").hexdigest()]
+
+    conn.execute("BEGIN IMMEDIATE")
+    assert populate_incremental(conn, exercise_path, similar_words_path, skip_invalid=True) == (0, 0, 0)
+    conn.execute("ROLLBACK")
+    conn.close()
+
+
+def test_populate_fails_on_invalid_precursors(tmp_path, capsys):
+    path = str(tmp_path / "taskpool.db")
+    create_database(path)
+    exercise_path, similar_words_path = write_inputs(tmp_path)
+    # Maus and Haus share the sentence pair 1_2, and therefore its id
+    (tmp_path / "exercise-import.tsv").write_text(exercise_tsv + "Maus\t6\t2\t1\n")
+    shared_id = hashlib.md5(b"1_2").hexdigest()
+
+    with pytest.raises(InvalidPrecursors) as error:
+        run_populate(path, exercise_path, similar_words_path, skip_invalid=False)
+    assert sorted(error.value.rows) == [
+        ("Haus", hashlib.md5(b"1_99").hexdigest(), "unknown sentence"),
+        ("Maus", shared_id, "duplicate id")
+    ]
+    # nothing was imported
+    with sqlite3.connect(path) as conn:
+        assert conn.execute("SELECT id FROM exercise").fetchall() == [("old",)]
+
+    assert run_populate(path, exercise_path, similar_words_path, skip_invalid=True) == 3
+    with sqlite3.connect(path) as conn:
+        assert conn.execute("SELECT target_word FROM exercise WHERE id = ?", (shared_id,)).fetchall() == [("Haus",)]
+    output = capsys.readouterr().out
+    assert "skipped Maus {}: duplicate id".format(shared_id) in output
+    assert "skipped Haus {}: unknown sentence".format(hashlib.md5(b"1_99").hexdigest()) in output
+
+    conn = sqlite3.connect(path, isolation_level=None)
+    conn.execute("BEGIN IMMEDIATE")
+    with pytest.raises(InvalidPrecursors):
+        populate_incremental(conn, exercise_path, similar_words_path)
+    conn.execute("ROLLBACK")
+    conn.close()
+
+
+def test_populate_incremental_needs_current_schema(tmp_path):
+    path = str(tmp_path / "taskpool.db")
+    create_database(path, legacy=True)
+    conn = sqlite3.connect(path)
+    with pytest.raises(ValueError):
+        populate_incremental(conn, *write_inputs(tmp_path))
+    conn.close()
+
+
+def test_data_version(tmp_path):
+    path = str(tmp_path / "taskpool.db")
+    create_database(path, legacy=True)
+    pool = ConnectionPool(path, size=1, immutable=False)
+    with pool.connection() as con:
+        assert query_data_version(con) == 0
+
+    with sqlite3.connect(path) as conn:
+        assert bump_data_version(conn) == 1
+        assert bump_data_version(conn) == 2
+    with pool.connection() as con:
+        assert query_data_version(con) == 2
+    pool.close()
@@ -0,0 +1,59 @@
+import asyncio
+from models.internal_models import InternalTranslationPair, Language, InternalExercise
+from repositories import exercise_repository
+from repositories.exercise_index import ExerciseIndex
+from repositories.exercise_sampler import ExerciseSampler
+from settings import settings
+from . import client, app
+
+uk_de = InternalTranslationPair(Language.uk, Language.de)
+
+
+def test_random_exercises(client, monkeypatch):
+    monkeypatch.setattr(settings, "taskpool_in_memory_index", False)
+    response = client.get("/exercises/random?translationPair=uk->de&n=5&seed=1")
+    assert response.status_code == 200
+    exercises = response.json()
+    # the test pool has a single exercise
+    assert len(exercises) == 1
+    assert exercises == client.get("/exercises?translationPair=uk->de&word=stark").json()
+    assert client.get("/exercises/random?translationPair=de->en&n=5").json() == []
+
+
+def test_random_exercises_validation(client):
+    assert client.get("/exercises/random?translationPair=uk->de&n=0").status_code == 422
+    assert client.get("/exercises/random?translationPair=uk->de&n=101").status_code == 422
+
+
+def test_sampler_rebuilt_when_data_version_changes(monkeypatch):
+    monkeypatch.setattr(settings, "taskpool_in_memory_index", False)
+    stale = ExerciseSampler([], exercise_repository.get_pool(), data_version=-1)
+    monkeypatch.setattr(exercise_repository, "exercise_sampler", stale)
+
+    exercises = asyncio.run(exercise_repository.sample_internal_exercises(uk_de, 3))
+    assert [e.target_word for e in exercises] == ["stark"]
+    assert exercise_repository.exercise_sampler is not stale
+    assert len(exercise_repository.exercise_sampler) == 1
+
+
+def exercise(id: str, word: str) -> InternalExercise:
+    return InternalExercise(id=id, translation_id=1, target_word=word, similar_words=[], source_sentence_id=1,
+                            source_sentence_text="", source_sentence_language="uk", target_sentence_id=2,
+                            target_sentence_text="", target_sentence_language="de")
+
+
+def test_seeded_decks_match():
+    exercises = [exercise("e{:02}".format(i), "word{}".format(i % 7)) for i in range(40)]
+    # rowids in another order than the ids, like after exercises were deleted and inserted again
+    rowids = {e.id: 100 - i for i, e in enumerate(exercises)}
+    index = ExerciseIndex(reversed(exercises))
+    sampler = ExerciseSampler(("UK", "DE", rowids[e.id]) for e in exercises)
+
+    deck = [e.id for e in index.sample(uk_de, 10, seed=42)]
+    assert len(set(deck)) == 10
+    assert deck == [e.id for e in index.sample(uk_de, 10, seed=42)]
+    assert deck != [e.id for e in index.sample(uk_de, 10, seed=43)]
+    assert [rowids[id] for id in deck] == sampler.sample(uk_de, 10, seed=42)
+
+    assert len(index.sample(uk_de, 100)) == 40
+    assert sorted(sampler.sample(uk_de, 100)) == sorted(rowids.values())
@@ -0,0 +1,136 @@
+import asyncio
+import pytest
+from fastapi.testclient import TestClient
+from controllers.exercise_controller import exercises_cache
+from repositories import exercise_repository
+from response_cache import ResponseCache, CachedResponse, ENTRY_OVERHEAD
+from . import client, app
+
+url = "/exercises?translationPair=uk->de&word=stark"
+
+
+def response(size: int) -> CachedResponse:
+    return CachedResponse(b"x" * (size - ENTRY_OVERHEAD))
+
+
+def run(cache: ResponseCache, key: str, entry: CachedResponse) -> CachedResponse:
+    async def compute():
+        return entry
+
+    return asyncio.run(cache.get_or_compute(key, compute))
+
+
+def test_least_recently_used_are_evicted():
+    cache = ResponseCache(max_bytes=3000, ttl=60)
+    a, b, c = response(1000), response(1000), response(1000)
+    run(cache, "a", a)
+    run(cache, "b", b)
+    assert run(cache, "a", response(1000)) is a
+    run(cache, "c", c)
+    run(cache, "d", response(1000))
+
+    stats = cache.stats()
+    assert (stats.entries, stats.bytes, stats.evictions) == (3, 3000, 1)
+    assert (stats.hits, stats.misses) == (1, 4)
+    # b was used least recently
+    assert run(cache, "a", response(1000)) is a
+    assert run(cache, "b", response(1000)) is not b
+    # responses larger than the cache are not stored
+    run(cache, "e", response(4000))
+    assert cache.stats().entries == 3
+
+
+def test_entries_expire():
+    cache = ResponseCache(max_bytes=3000, ttl=0)
+    a = response(1000)
+    run(cache, "a", a)
+    assert run(cache, "a", response(1000)) is not a
+    assert cache.stats().expirations == 1
+
+
+def test_concurrent_misses_are_coalesced():
+    cache = ResponseCache(max_bytes=3000, ttl=60)
+    calls = 0
+
+    async def main():
+        release = asyncio.Event()
+
+        async def compute():
+            nonlocal calls
+            calls += 1
+            await release.wait()
+            return response(1000)
+
+        first = asyncio.ensure_future(cache.get_or_compute("a", compute))
+        others = [asyncio.ensure_future(cache.get_or_compute("a", compute)) for _ in range(3)]
+        await asyncio.sleep(0)
+        # the request which started the computation goes away, the others still get the response
+        first.cancel()
+        release.set()
+        return await asyncio.gather(*others)
+
+    results = asyncio.run(main())
+    assert calls == 1
+    assert all(result is results[0] for result in results)
+    stats = cache.stats()
+    assert (stats.misses, stats.coalesced, stats.entries) == (1, 3, 1)
+
+
+def test_failures_are_not_cached():
+    cache = ResponseCache(max_bytes=3000, ttl=60)
+
+    async def fail():
+        await asyncio.sleep(0)
+        raise ValueError("query failed")
+
+    async def main():
+        return await asyncio.gather(cache.get_or_compute("a", fail), cache.get_or_compute("a", fail),
+                                    return_exceptions=True)
+
+    assert [type(result) for result in asyncio.run(main())] == [ValueError, ValueError]
+    assert cache.stats().entries == 0
+    entry = response(1000)
+    assert run(cache, "a", entry) is entry
+
+
+def test_results_computed_before_clear_are_dropped():
+    cache = ResponseCache(max_bytes=3000, ttl=60)
+
+    async def main():
+        async def compute():
+            cache.clear()
+            return response(1000)
+
+        await cache.get_or_compute("a", compute)
+
+    asyncio.run(main())
+    assert cache.stats().entries == 0
+
+
+def test_exercises_are_cached(client: TestClient):
+    before = exercises_cache.stats()
+    first = client.get(url + "&limit=1")
+    second = client.get(url + "&limit=1")
+    assert second.content == first.content
+    assert second.headers["x-next-cursor"] == first.headers["x-next-cursor"]
+    assert second.headers["etag"] == first.headers["etag"]
+
+    status, = client.get("/healthcheck/cache").json()
+    assert status["name"] == "exercises"
+    assert (status["hits"], status["misses"], status["entries"]) == (before.hits + 1, before.misses + 1, 1)
+    assert 'taskpool_response_cache_lookups_total{{cache="exercises",result="hits"}} {}'.format(status["hits"]) \
+           in client.get("/metrics").text
+
+
+def test_shuffled_exercises_are_not_cached(client: TestClient):
+    client.get(url + "&exerciseType=all")
+    client.get(url + "&exerciseType=all")
+    assert exercises_cache.stats().entries == 0
+
+
+def test_cache_is_cleared_when_database_is_swapped(client: TestClient):
+    client.get(url)
+    assert exercises_cache.stats().entries == 1
+    for callback in exercise_repository.swap_callbacks:
+        callback()
+    assert exercises_cache.stats().entries == 0
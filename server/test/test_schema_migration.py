@@ -0,0 +1,55 @@
+import asyncio
+import sqlite3
+from models.internal_models import InternalTranslationPair, Language
+from repositories import exercise_repository
+from repositories.connection_pool import ConnectionPool
+from migrate_exercise_schema import migrate, get_schema_version
+
+uk_de = InternalTranslationPair(Language.uk, Language.de)
+
+
+def create_legacy_database(path: str):
+    with sqlite3.connect(path) as con:
+        con.executescript("""
+        CREATE TABLE sentences (id INTEGER PRIMARY KEY, language VARCHAR(255), text TEXT);
+        CREATE TABLE exercise (id TEXT, translation_id INTEGER, target_word TEXT, similar_words TEXT,
+                               source_sentence_id INTEGER, target_sentence_id INTEGER);
+        INSERT INTO sentences VALUES (1, 'UK', 'Це мій дім.'), (2, 'DE', 'Das ist mein Haus.'),
+                                     (3, 'DE', 'Das Haus ist groß.'), (4, 'EN', 'The house is big.');
+        INSERT INTO exercise VALUES ('b', 1, 'Haus', '["Maus"]', 1, 2), ('a', 2, 'Haus', '[]', 1, 2),
+                                    ('c', 3, 'house', '[]', 3, 4);
+        """)
+
+
+def query(path: str):
+    pool = ConnectionPool(path, size=1)
+    with pool.connection() as con:
+        words = exercise_repository.fetch_all(con, exercise_repository.query_learnable_words, uk_de)
+        exercises = exercise_repository.fetch_all(con, exercise_repository.query_exercises, uk_de, "Haus")
+        schema_version = con.schema_version
+    pool.close()
+    return schema_version, words, exercises
+
+
+def test_migration_keeps_query_results(tmp_path):
+    path = str(tmp_path / "taskpool.db")
+    create_legacy_database(path)
+    legacy_version, legacy_words, legacy_exercises = query(path)
+
+    with sqlite3.connect(path) as con:
+        migrate(con)
+    version, words, exercises = query(path)
+
+    assert (legacy_version, version) == (0, 1)
+    assert words == legacy_words == [("Haus",)]
+    assert exercises == legacy_exercises
+    assert [e[0] for e in exercises] == ["a", "b"]
+
+    with sqlite3.connect(path) as con:
+        assert get_schema_version(con) == 1
+        assert con.execute("SELECT id, source_language, target_language FROM exercise ORDER BY id").fetchall() == [
+            ("a", "UK", "DE"), ("b", "UK", "DE"), ("c", "DE", "EN")
+        ]
+        plan = con.execute("EXPLAIN QUERY PLAN SELECT DISTINCT target_word FROM exercise "
+                           "WHERE source_language = 'UK' AND target_language = 'DE'").fetchall()
+        assert "COVERING INDEX idx_exercise_translation_pair_word" in plan[0][3]
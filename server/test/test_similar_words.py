@@ -0,0 +1,104 @@
+import numpy as np
+import pytest
+import similar_words
+from populate_exercise_table import load_similar_words_data
+from similar_words import (VectorTable, BruteForceIndex, find_similar_words, lookup_words, write_similar_words,
+                           load_or_export_vectors, vocabulary_digest)
+
+# word, vector, pos, tag, lemma
+VOCABULARY = [
+    ("Haus", [1.0, 0.0, 0.0], "NOUN", "NN", "Haus"),
+    ("Gebäude", [0.9, 0.1, 0.0], "NOUN", "NN", "Gebäude"),
+    ("Hütte", [0.8, 0.3, 0.0], "NOUN", "NN", "Hütte"),
+    ("Häuser", [0.95, 0.0, 0.05], "NOUN", "NN", "Haus"),
+    ("Hausboot", [0.9, 0.0, 0.1], "NOUN", "NN", "Hausboot"),
+    ("haus", [1.0, 0.0, 0.0], "NOUN", "NN", "haus"),
+    ("Wohnungsbaugenossenschaft", [0.9, 0.05, 0.0], "NOUN", "NN", "Wohnungsbaugenossenschaft"),
+    ("Villa", [0.0, 1.0, 0.0], "NOUN", "NN", "Villa"),
+    ("Bau", [0.7, 0.0, 0.0], "NOUN", "NE", "Bau"),
+    ("wohnen", [0.9, 0.0, 0.0], "VERB", "VVINF", "wohnen"),
+    ("Leer", [0.0, 0.0, 0.0], "NOUN", "NN", "Leer"),
+]
+
+
+def vocabulary_table() -> VectorTable:
+    words, vectors, pos, tags, lemmas = zip(*VOCABULARY)
+    return VectorTable(words, np.array(vectors), pos, tags, lemmas)
+
+
+class PipelineLoaded(Exception):
+    pass
+
+
+def unavailable_pipeline():
+    raise AssertionError("all words are in the vocabulary")
+
+
+def test_find_similar_words_applies_filters():
+    vocabulary = vocabulary_table()
+    words = lookup_words(vocabulary, ["Haus"], unavailable_pipeline)
+    results = find_similar_words(vocabulary, words, length_difference=10, min_similarity=0.0, stop_after=5)
+    # same lemma, contained words, other case, other length, other pos or tag and missing vectors are left out
+    assert results == {"Haus": ["Gebäude", "Hütte", "Villa"]}
+
+    assert find_similar_words(vocabulary, words, stop_after=1) == {"Haus": ["Gebäude"]}
+    assert find_similar_words(vocabulary, words, min_similarity=0.5) == {"Haus": ["Gebäude", "Hütte"]}
+    assert find_similar_words(vocabulary, words, length_difference=1) == {"Haus": ["Hütte", "Villa"]}
+
+
+def test_batches_match_single_words():
+    vocabulary = vocabulary_table()
+    words = lookup_words(vocabulary, [word for word, *_ in VOCABULARY], unavailable_pipeline)
+    batched = find_similar_words(vocabulary, words, batch_size=4)
+    for word in words.words:
+        single = lookup_words(vocabulary, [word], unavailable_pipeline)
+        assert batched[word] == find_similar_words(vocabulary, single)[word]
+    assert batched["Leer"] == []
+
+
+def test_matches_pairwise_comparison():
+    rng = np.random.default_rng(0)
+    words = ["Wort{}".format(i) for i in range(200)]
+    vectors = rng.normal(size=(200, 16))
+    vocabulary = VectorTable(words, vectors, ["NOUN"] * 200, ["NN"] * 200, words)
+    queries = lookup_words(vocabulary, words[:20], unavailable_pipeline)
+    results = find_similar_words(vocabulary, queries, index=BruteForceIndex(vocabulary.vectors), stop_after=3,
+                                 min_similarity=-1.0, batch_size=7)
+
+    unit = vectors / np.linalg.norm(vectors, axis=1)[:, None]
+    for i, word in enumerate(words[:20]):
+        # the numbered words contain each other, e.g. Wort1 and Wort12
+        candidates = [j for j in range(200) if words[j] not in word and word not in words[j]]
+        expected = sorted(candidates, key=lambda j: -unit[i] @ unit[j])[:3]
+        assert results[word] == [words[j] for j in expected]
+
+
+def test_output_is_imported_by_populate(tmp_path):
+    path = tmp_path / "similar-words.tsv"
+    write_similar_words({"Haus": ["Gebäude", "Hütte"], "Baum": []}, ["Haus", "Baum", "Tisch"], str(path))
+    assert path.read_text().splitlines() == ["word\tsimilar_0\tsimilar_1", "Haus\tGebäude\tHütte", "Baum\t\t",
+                                             "Tisch\t\t"]
+    assert load_similar_words_data(str(path)) == {"Haus": '["Geb\\u00e4ude", "H\\u00fctte"]', "Baum": "[]",
+                                                  "Tisch": "[]"}
+
+
+def test_vectors_are_cached(tmp_path, monkeypatch):
+    path = str(tmp_path / "vectors.npz")
+    vocabulary = vocabulary_table()
+    vocabulary.save(path, "de_core_news_lg", vocabulary_digest(vocabulary.words))
+
+    cached = load_or_export_vectors(path, "de_core_news_lg", vocabulary.words)
+    assert cached.words == vocabulary.words
+    assert np.allclose(cached.vectors, vocabulary.vectors)
+    words = lookup_words(cached, ["Haus"], unavailable_pipeline)
+    assert find_similar_words(cached, words) == find_similar_words(vocabulary, words)
+
+    # another vocabulary or model is exported again
+    def load_spacy(model: str):
+        raise PipelineLoaded(model)
+
+    monkeypatch.setattr(similar_words, "load_spacy", load_spacy)
+    with pytest.raises(PipelineLoaded):
+        load_or_export_vectors(path, "de_core_news_lg", vocabulary.words + ["Garten"])
+    with pytest.raises(PipelineLoaded, match="de_core_news_sm"):
+        load_or_export_vectors(path, "de_core_news_sm", vocabulary.words)
@@ -0,0 +1,93 @@
+import asyncio
+from models.internal_models import InternalTranslationPair, Language
+from repositories import exercise_repository
+from repositories.word_search import WordList, WordSearchIndex, edit_distance, fold
+from . import client, app
+
+uk_de = InternalTranslationPair(Language.uk, Language.de)
+de_en = InternalTranslationPair(Language.de, Language.en)
+
+words = WordList(["Haus", "haus", "Hausaufgabe", "Häuser", "Hütte", "Hut", "heute", "Straße", "Strand", "stark",
+                  "Maus", "Bus"])
+
+
+def test_fold():
+    assert fold("Hütte") == "hutte"
+    assert fold("Straße") == "strasse"
+    assert fold("ÉCOLE") == "ecole"
+
+
+def test_edit_distance():
+    assert edit_distance("stark", "stark", 2) == 0
+    assert edit_distance("stark", "strak", 2) == 1
+    assert edit_distance("stark", "start", 2) == 1
+    assert edit_distance("stark", "star", 2) == 1
+    assert edit_distance("stark", "sterk", 0) == 1
+    assert edit_distance("stark", "strand", 2) == 3
+    assert edit_distance("haus", "hausaufgabe", 2) == 3
+
+
+def test_prefix():
+    assert words.prefix("hau", 10) == ["Haus", "haus", "Hausaufgabe", "Häuser"]
+    assert words.prefix("haus", 10) == ["haus", "Haus", "Hausaufgabe", "Häuser"]
+    # the word spelled like the prefix first
+    assert words.prefix("haus", 2) == ["haus", "Haus"]
+    assert words.prefix("Hau", 2) == ["Haus", "haus"]
+    assert words.prefix("strass", 10) == ["Straße"]
+    assert words.prefix("x", 10) == []
+
+
+def test_fuzzy():
+    assert words.fuzzy("Hutte", 10) == ["Hütte"]
+    assert words.fuzzy("strak", 10) == ["stark"]
+    assert words.fuzzy("Haus", 3) == ["Haus", "haus", "Maus"]
+    assert words.fuzzy("Straase", 10) == ["Straße"]
+    # two typos in a longer word
+    assert words.fuzzy("Hausaufgbea", 10) == ["Hausaufgabe"]
+    # short terms only match exactly
+    assert words.fuzzy("hu", 10) == []
+    assert words.fuzzy("Hut", 10) == ["Hut"]
+
+
+def test_index_by_translation_pair():
+    index = WordSearchIndex([("UK", "DE", "stark"), ("uk", "de", "Haus"), ("DE", "EN", "house"), ("UK", "DE", "stark")])
+    assert len(index) == 3
+    assert index.prefix(uk_de, "", 10) == ["Haus", "stark"]
+    assert index.fuzzy(de_en, "hose", 10) == ["house"]
+    assert index.prefix(InternalTranslationPair(Language.de, Language.uk), "h", 10) == []
+
+
+def test_words_search(client):
+    response = client.get("/words?translationPair=uk->de&prefix=ST")
+    assert response.status_code == 200
+    assert response.json() == [{"word": "stark"}]
+    assert client.get("/words?translationPair=uk->de&fuzzy=strak").json() == [{"word": "stark"}]
+    assert client.get("/words?translationPair=uk->de&prefix=x").json() == []
+
+    response = client.get("/words?translationPair=uk->de&prefix=s", headers={"Accept": "application/x-ndjson"})
+    assert response.text == '{"word":"stark"}\n'
+
+
+def test_words_search_validation(client):
+    assert client.get("/words?translationPair=uk->de&prefix=").status_code == 422
+    assert client.get("/words?translationPair=uk->de&prefix=s&fuzzy=s").status_code == 400
+    assert client.get("/words?translationPair=uk->de&prefix=s&after=a").status_code == 400
+
+
+def test_word_search_is_built_after_startup(monkeypatch):
+    monkeypatch.setattr(exercise_repository, "word_search", None)
+
+    async def run():
+        await exercise_repository.start_background_build()
+        # startup does not wait for the scan of the exercise table
+        assert exercise_repository.word_search is None
+        await exercise_repository.background_build
+        return exercise_repository.word_search
+
+    assert len(asyncio.run(run())) > 0
+
+
+def test_missing_word_search_is_built_on_first_search(monkeypatch):
+    monkeypatch.setattr(exercise_repository, "word_search", None)
+    assert asyncio.run(exercise_repository.search_learnable_words(uk_de, prefix="sta")) == ["stark"]
+    assert exercise_repository.word_search is not None